@@ -1,18 +1,34 @@
+import sys
+
 import Gene
 import Memory
 import params as p
 
+"""
+The drawings produced by Cell.draw, indexed by rule class.
+Rule class 0 is reserved for an empty spot on the Surface, so
+that a grid of rule classes fits into unsigned bytes.
+"""
+rule_classes = [None] + [first + rule
+                         for first in ['o', 'x']
+                         for rule in ['tft', 't2t', 'ftf',
+                                      'ddd', 'ddc', 'dcd', 'dcc',
+                                      'cdd', 'cdc', 'ccd', 'ccc']]
+rule_class_index = { drawing: i for i, drawing in enumerate(rule_classes) }
+
 class Cell:
     """ 
     The Cell is the entity which contains the rule-defining Gene.
     The Cell hosts the Gene, and explicitly defines the viability of the
     rule through realizing associated scores and health metrics. 
     """
+    __slots__ = ('_id', '_age', '_score', '_gene', '_memory', '_position')
 
-    def __init__(self, id, position, parent_a=None, parent_b=None):
+    def __init__(self, id, position, parent_a=None, parent_b=None, gene=None):
         """
-        Generate a Cell with a new Gene.  The Gene is formed
-        through recombination if parent cells are provided.
+        Generate a Cell with a new Gene, see Gene.make_gene.
+        The Gene is formed through recombination if parent cells
+        are provided, unless the Gene 'gene' is given.
         """
         """ int: For uniquely identifying cells """
         self._id = 0
@@ -22,15 +38,17 @@ class Cell:
         self._score =  p.params['initial_score']
         """ Gene: The decision making entity of the cell."""
         self._gene = None
-        """ dict(Cell,Memory): To hold the memory of past interactions with other cells"""
-        self._memory = {}
+        """ MemoryStore: To hold the memory of past interactions with other cells, by ID """
+        self._memory = Memory.MemoryStore(p.params['memory_capacity'])
         """ Position: The location of the Cell within the toroidal world. """
         self._position = None
 
-        if parent_a is not None and parent_b is not None:
-            self._gene = Gene.Gene(parent_a.get_gene(), parent_b.get_gene())
+        if gene is not None:
+            self._gene = gene
+        elif parent_a is not None and parent_b is not None:
+            self._gene = Gene.make_gene(parent_a.get_gene(), parent_b.get_gene())
         else:
-            self._gene = Gene.Gene()
+            self._gene = Gene.make_gene()
         self._position = position
         self._id = id
 
@@ -59,22 +77,66 @@ class Cell:
         """
         for neighbour in neighbours:
             if not self.__eq__(neighbour):
-                my_choice = self._get_my_decision(neighbour)
-                their_choice = neighbour._get_my_decision(self)
+                self.play(neighbour)
+
+    def play(self, neighbour):
+        """
+        Play a single round of the prisoner's dilemma with a neighbour.
+        This Cell and its neighbour trade decisions, adjust scores,
+        and adjust memories.
+        :param neighbour: Another cell to play with
+        :type neighbour: Cell
+        """
+        my_choice = self._get_my_decision(neighbour)
+        their_choice = neighbour._get_my_decision(self)
 
-                self._adjust_score(my_choice, their_choice)
-                neighbour._adjust_score(their_choice, my_choice)
+        self._adjust_score(my_choice, their_choice)
+        neighbour._adjust_score(their_choice, my_choice)
 
-                self._adjust_memory(neighbour, their_choice)
-                neighbour._adjust_memory(self, my_choice)
+        self._adjust_memory(neighbour, their_choice)
+        neighbour._adjust_memory(self, my_choice)
 
     def clear_interactions(self):
         """
         Clear the memory of previous tick's
         interactions with other Cells.
         """
-        for key in self._memory.keys():
-            self._memory[key].clear_interaction()
+        self._memory.clear_interactions()
+
+    def forget_all_but(self, ids):
+        """
+        Forget every Cell whose ID is not in 'ids'.
+        :param ids: The IDs of the Cells to remember
+        :type ids: set(int)
+        """
+        self._memory.retain(ids)
+
+    def forget_all(self):
+        """
+        Forget every Cell.
+        """
+        self._memory.forget_all()
+
+    def compact_memory(self):
+        """
+        Compact every memory of this Cell, see Memory.compact.
+        """
+        self._memory.compact()
+
+    def get_footprint(self):
+        """
+        :return: An estimate of the bytes this Cell takes, without
+                 its Gene and its memories
+        :rtype: int
+        """
+        return sys.getsizeof(self) + sys.getsizeof(self._position)
+
+    def get_memory_footprint(self):
+        """
+        :return: An estimate of the bytes the memories of this Cell take
+        :rtype: int
+        """
+        return self._memory.get_footprint()
 
     def is_dead(self):
         """
@@ -100,10 +162,9 @@ class Cell:
         of the neighbour cell.
         :rtype: char
         """
-        if neighbour not in self._memory:
-            self._memory[neighbour] = Memory.Memory()
-        my_choice = self.get_gene().get_decision(self.get_memory_of(neighbour))
-        self.get_memory_of(neighbour).record_interaction()
+        memory = self._memory.get_or_create(neighbour.get_id())
+        my_choice = self.get_gene().get_decision(memory)
+        memory.record_interaction()
         return my_choice
 
     def get_position(self):
@@ -159,8 +220,9 @@ class Cell:
         :param neighbour_choice: a choice 'c' or 'd' from the other cell
         :type neighbour_choice: char
         """
-        if neighbour in self._memory:
-            self.get_memory_of(neighbour).add_choice_to_memory(
+        memory = self._memory.get(neighbour.get_id())
+        if memory is not None:
+            memory.add_choice_to_memory(
                     neighbour_choice, self.get_gene().get_mem_size())
         else:
             print ("err: getMemory: no memory of subjectID "
@@ -185,10 +247,7 @@ class Cell:
                  or None if no memory of 'cell' exists
         :rtype: Memory || None
         """
-        if cell not in self._memory:
-            return None
-        else:
-            return self._memory[cell]
+        return self._memory.get(cell.get_id())
 
     def age(self):
         """
@@ -219,16 +278,7 @@ class Cell:
                  False if it is not.
         :rtype: boolean
         """
-        g = self.get_gene().get_seq()
-        if 'c' != g[1]:
-            return False
-        if not len(g) >= 4:
-            return False
-        for x in range(2, len(g)):
-            dec = 'c' if x % 2 == 0 else 'd'
-            if dec != g[x]:
-                return False
-        return True
+        return self.get_gene().is_tft()
 
     def is_ftf(self):
         """
@@ -236,16 +286,7 @@ class Cell:
         :return: True if this Cell is a mean TFT, false otherwise.
         :rtype: boolean
         """
-        g = self.get_gene().get_seq()
-        if 'd' != g[1]:
-            return False
-        if not len(g) >= 4:
-            return False
-        for x in range(2, len(g)):
-            dec = 'c' if x % 2 == 0 else 'd'
-            if dec != g[x]:
-                return False
-        return True
+        return self.get_gene().is_ftf()
 
     def is_t2t(self):
         """
@@ -254,19 +295,7 @@ class Cell:
                  False if it is not.
         :rtype: boolean
         """
-        g = self.get_gene().get_seq()
-        if 'c' != g[1]:
-            return False
-        if not len(g) >= 8:
-            return False
-        for x in range(2, 4):
-            if g[x] is not 'c':
-                return False
-        for x in range(1, len(g)-3):
-            dec = 'd' if x % 4 == 0 else 'c'
-            if g[x+3] is not dec:
-                return False
-        return True
+        return self.get_gene().is_t2t()
 
     def is_alld(self):
         """
@@ -275,11 +304,7 @@ class Cell:
                  False if it does not.
         :rtype: boolean
         """
-        g = self.get_gene().get_seq()
-        for i in range(1, len(g)):
-            if g[i] is 'c':
-                return False
-        return True
+        return self.get_gene().is_alld()
     
     def is_allc(self):
         """
@@ -288,11 +313,7 @@ class Cell:
                  False if it does not.
         :rtype: boolean
         """
-        g = self.get_gene().get_seq()
-        for i in range(1, len(g)):
-            if g[i] is 'd':
-                return False
-        return True
+        return self.get_gene().is_allc()
 
     def draw(self):
         """
@@ -339,6 +360,15 @@ class Cell:
 
         return drawing
 
+    def get_rule_class(self):
+        """
+        Get the rule class of this Cell, which is the index
+        of its drawing in 'rule_classes'.
+        :return: The rule class of this Cell, between 1 and len(rule_classes) - 1
+        :rtype: int
+        """
+        return rule_class_index[self.draw()]
+
     def __str__(self):
         return "ID: {}\nPosition: {}{}\nScore: {}\nMemory: {}".format(
                 self._id,
@@ -391,7 +421,7 @@ class Cell:
                  interacted with, False otherwise.
         :rtype: boolean
         """
-        if other in self._memory:
+        if other.get_id() in self._memory:
             if self.get_memory_of(other).has_interacted():
                 return True
             else:
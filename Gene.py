@@ -5,34 +5,79 @@ by a binary decision tree, encoded as a string of 'c's and 'd's.
 The logic of a rule's decision making is within this class.
 """
 import auxiliaryGenetics as ag
+import hashlib
 import random
 import math
+import sys
 
+from SparseGene import SparseGene
 from params import params
 
+def hash_code(code):
+    """
+    :param code: A genetic sequence
+    :type code: list(char)
+    :return: A 64 bit hash of the sequence, the same in every process
+    :rtype: int
+    """
+    digest = hashlib.blake2b("".join(code[1:]).encode('ascii'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def make_gene(gene_a=None, gene_b=None, code=None, nodes=None):
+    """
+    Make the Gene of a new Cell, a SparseGene if 'sparse_genes'
+    is set, with the arguments of Gene.
+    :rtype: Gene or SparseGene
+    """
+    if params['sparse_genes']:
+        return SparseGene(gene_a, gene_b, code, nodes)
+    return Gene(gene_a, gene_b, code, nodes)
+
+
 class Gene():
-    
-    def __init__(self, gene_a=None, gene_b=None):
+    __slots__ = ('_code', '_size_mem', '_hash', '_canonical_hash')
+
+    def __init__(self, gene_a=None, gene_b=None, code=None, nodes=None):
         """
         :type gene_a: Gene Parent A's Gene
         :type gene_b: Gene Parent B's Gene
+        :param code: A genetic sequence to copy as it is, without
+                     mutation, such as the sequence of a migrant
+        :type code: list(char)
+        :param nodes: The nodes of a decision tree, expanded to the
+                      code with the same decisions, see
+                      auxiliaryGenetics.code_from_nodes
+        :type nodes: dict(int, char)
         """
 
         """ list(char): The genetic sequence """
         self._code = list()
         """ int: the depth of the genetic sequence tree, or log2(len(_code)) """
         self._size_mem = params['default_memory_size']
+        """ int: the hash of the genetic sequence, computed when first needed """
+        self._hash = None
+        """ int: the hash of the canonical genetic sequence, computed when first needed """
+        self._canonical_hash = None
+
+        if nodes is not None:
+            code = ag.code_from_nodes(nodes)
+        # a given code is copied as it is
+        if code is not None:
+            self._code = list(code)
+            self.update_mem_size()
+            return
 
         # produce a new genetic code if this Gene does not have 2 parents
         # If it has parents, produce the code through recombination
         if gene_a is None or gene_b is None:
             self._code = ag.produce_random_gene(self._size_mem)
             ag.mutate(self._code)
-            self.update_mem_size()
         else:
             self._code = ag.recombine(gene_a, gene_b)
             ag.mutate(self._code)
-            self.update_mem_size()
+        ag.prune(self._code)
+        self.update_mem_size()
 
     def get_seq(self):
         """
@@ -42,6 +87,14 @@ class Gene():
         """
         return self._code
 
+    def get_nodes(self):
+        """
+        :return: The choice of every position of this Gene's code,
+                 as the nodes of a SparseGene
+        :rtype: dict(int, char)
+        """
+        return ag.nodes_from_code(self._code)
+
     def get_decision(self, history):
         """
         Find the choice of this Gene's Cell depending on the
@@ -86,6 +139,13 @@ class Gene():
         """
         self._size_mem = int(math.log(len(self._code), 2))
 
+    def get_length(self):
+        """
+        :return: The number of choices of this Gene's code
+        :rtype: int
+        """
+        return len(self._code) - 1
+
     def get_defect_fraction(self):
         """
         :return: The percentage of this Gene which is 'd'
@@ -105,6 +165,115 @@ class Gene():
         """
         return self._size_mem
 
+    def is_tft(self):
+        """
+        Is this Gene's rule a perfect Tit-For-Tat?
+        :rtype: boolean
+        """
+        g = self._code
+        if 'c' != g[1]:
+            return False
+        if not len(g) >= 4:
+            return False
+        for x in range(2, len(g)):
+            dec = 'c' if x % 2 == 0 else 'd'
+            if dec != g[x]:
+                return False
+        return True
+
+    def is_ftf(self):
+        """
+        Is this Gene's rule a mean tit for tat?
+        :rtype: boolean
+        """
+        g = self._code
+        if 'd' != g[1]:
+            return False
+        if not len(g) >= 4:
+            return False
+        for x in range(2, len(g)):
+            dec = 'c' if x % 2 == 0 else 'd'
+            if dec != g[x]:
+                return False
+        return True
+
+    def is_t2t(self):
+        """
+        Is this Gene's rule a perfect Tit-For-Two-Tats?
+        :rtype: boolean
+        """
+        g = self._code
+        if 'c' != g[1]:
+            return False
+        if not len(g) >= 8:
+            return False
+        for x in range(2, 4):
+            if g[x] != 'c':
+                return False
+        for x in range(1, len(g)-3):
+            dec = 'd' if x % 4 == 0 else 'c'
+            if g[x+3] != dec:
+                return False
+        return True
+
+    def is_alld(self):
+        """
+        Is this Gene's rule strictly defect?
+        :rtype: boolean
+        """
+        return 'c' not in self._code
+
+    def is_allc(self):
+        """
+        Is this Gene's rule strictly cooperate?
+        :rtype: boolean
+        """
+        return 'd' not in self._code
+
+    def get_footprint(self):
+        """
+        :return: An estimate of the bytes this Gene takes
+        :rtype: int
+        """
+        return sys.getsizeof(self) + sys.getsizeof(self._code)
+
+    def get_hash(self):
+        """
+        Get a 64 bit hash of this Gene's code which, unlike hash(),
+        is the same in every process and every run.
+        :return: The hash of this Gene's code
+        :rtype: int
+        """
+        if self._hash is None:
+            self._hash = hash_code(self._code)
+        return self._hash
+
+    def get_canonical_hash(self):
+        """
+        Get a 64 bit hash of the canonical form of this Gene's code
+        (see auxiliaryGenetics.canonicalize), which is the same for
+        all Genes which make the same decisions with the same memory
+        size.  It is the same as get_hash when genes are canonicalized
+        at birth.
+        :return: The hash of this Gene's canonical code
+        :rtype: int
+        """
+        if self._canonical_hash is None:
+            code = list(self._code)
+            ag.canonicalize(code)
+            self._canonical_hash = hash_code(code)
+        return self._canonical_hash
+
+    def get_canonical_form(self):
+        """
+        :return: The canonical code of this Gene as 'c's and 'd's,
+                 see auxiliaryGenetics.canonicalize
+        :rtype: str
+        """
+        code = list(self._code)
+        ag.canonicalize(code)
+        return "".join(code[1:])
+
     def __str__(self):
         """
         Prints a string representation of all
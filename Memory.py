@@ -1,8 +1,13 @@
+import sys
+from collections import OrderedDict
+
+
 class Memory():
     """
     This object behaves as a tuple of a Boolean and a List of Choices.
     It is the member which is held in the _memory dictionary of a Cell.
     """
+    __slots__ = ('_has_interacted', '_sequence', '_full_sequence')
 
     def __init__(self, sequence=None):
         """
@@ -66,7 +71,182 @@ class Memory():
         """Clear the interaction from memory"""
         self._has_interacted = False
 
+    def compact(self):
+        """
+        Forget the sequence of all the moves that occurred,
+        which no decision depends on.
+        """
+        self._full_sequence = list()
+
+    def reset(self):
+        """
+        Make this memory empty, as a new Memory, keeping its lists.
+        """
+        self._has_interacted = False
+        if self._full_sequence is self._sequence:
+            self._full_sequence = list()
+        else:
+            del self._full_sequence[:]
+        del self._sequence[:]
+
+    def get_footprint(self):
+        """
+        :return: An estimate of the bytes this memory takes
+        :rtype: int
+        """
+        size = sys.getsizeof(self) + sys.getsizeof(self._sequence)
+        if self._full_sequence is not self._sequence:
+            size += sys.getsizeof(self._full_sequence)
+        return size
+
     def __str__(self):
         return "".join(self._sequence)
 
 
+class MemoryPool():
+    """
+    A free list of the memories Cells forgot, so that new memories
+    reuse them rather than being allocated.  A memory is only given
+    back to the pool when nothing else refers to it: when a Cell
+    forgets a memory, not when a full MemoryStore drops its least
+    recently used memory, which may still be marked as used.
+    """
+    __slots__ = ('limit', '_free')
+
+    def __init__(self, limit=0):
+        """
+        :param limit: The most memories to keep for reuse, 0 for none
+        :type limit: int
+        """
+        self.limit = limit
+        """ list(Memory): The memories ready for reuse """
+        self._free = []
+
+    def acquire(self):
+        """
+        :return: An empty memory
+        :rtype: Memory
+        """
+        if self._free:
+            return self._free.pop()
+        return Memory()
+
+    def release(self, memory):
+        """
+        Give back a memory which nothing refers to any more.
+        :type memory: Memory
+        """
+        if len(self._free) < self.limit:
+            memory.reset()
+            self._free.append(memory)
+
+    def set_limit(self, limit):
+        """
+        :param limit: The most memories to keep for reuse, 0 for none
+        :type limit: int
+        """
+        self.limit = limit
+        del self._free[limit:]
+
+
+""" MemoryPool: The memories forgotten by all Cells, for reuse """
+pool = MemoryPool()
+
+
+class MemoryStore():
+    """
+    The memories a Cell has of other Cells, keyed by their IDs.
+    With a capacity, the memory used least recently is forgotten
+    when a new memory would exceed it.  The memories which were
+    used since the last clear_interactions are tracked, so that
+    clearing does not walk every memory.
+    """
+    __slots__ = ('_capacity', '_memories', '_touched')
+
+    def __init__(self, capacity=None):
+        """
+        :param capacity: The most memories to keep, or None for no limit
+        :type capacity: int
+        """
+        self._capacity = capacity
+        """ dict(int,Memory): The memories, by the ID of the other Cell """
+        self._memories = OrderedDict() if capacity is not None else dict()
+        """ list(Memory): The memories used since the last clear_interactions """
+        self._touched = []
+
+    def get(self, id):
+        """
+        :param id: The ID of the other Cell
+        :type id: int
+        :return: The memory of the other Cell, or None
+        :rtype: Memory || None
+        """
+        return self._memories.get(id)
+
+    def get_or_create(self, id):
+        """
+        Get the memory of another Cell, creating an empty one if there
+        is none, and mark it as used.
+        :param id: The ID of the other Cell
+        :type id: int
+        :rtype: Memory
+        """
+        memory = self._memories.get(id)
+        if memory is None:
+            memory = pool.acquire()
+            self._memories[id] = memory
+            if self._capacity is not None and len(self._memories) > self._capacity:
+                self._memories.popitem(last=False)
+        elif self._capacity is not None:
+            self._memories.move_to_end(id)
+        self._touched.append(memory)
+        return memory
+
+    def retain(self, ids):
+        """
+        Forget the Cells whose IDs are not in 'ids'.  This must not
+        be called between a use of a memory and clear_interactions.
+        :param ids: The IDs of the Cells to remember
+        :type ids: set(int)
+        """
+        for id in [id for id in self._memories if id not in ids]:
+            pool.release(self._memories.pop(id))
+
+    def forget_all(self):
+        for memory in self._memories.values():
+            pool.release(memory)
+        self._memories.clear()
+        self._touched = []
+
+    def clear_interactions(self):
+        """
+        Clear the interaction of every memory used since the last call.
+        """
+        for memory in self._touched:
+            memory.clear_interaction()
+        self._touched = []
+
+    def values(self):
+        return self._memories.values()
+
+    def compact(self):
+        """
+        Compact every memory, see Memory.compact.
+        """
+        for memory in self._memories.values():
+            memory.compact()
+
+    def get_footprint(self):
+        """
+        :return: An estimate of the bytes the memories take
+        :rtype: int
+        """
+        return sys.getsizeof(self) \
+                + sys.getsizeof(self._memories) + sys.getsizeof(self._touched) \
+                + sum(memory.get_footprint() for memory in self._memories.values())
+
+    def __contains__(self, id):
+        return id in self._memories
+
+    def __len__(self):
+        return len(self._memories)
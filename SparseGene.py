@@ -0,0 +1,267 @@
+"""
+This class is a Gene which only holds the nodes of its decision
+tree that it defines, so that the size of a Gene does not double
+with every choice of memory.  The decision of a history is the
+choice of the deepest node along its path that the Gene defines,
+as with the code of a Gene, where a path ends at the first node
+past the end of the code.  See the nodes functions of
+auxiliaryGenetics.
+
+A SparseGene with the nodes of every position of a code makes
+the same decisions as the Gene of that code, and has the same
+memory size, that of a code as long as its last node and 1.
+"""
+import auxiliaryGenetics as ag
+import hashlib
+import sys
+
+from params import params
+
+
+def hash_nodes(nodes):
+    """
+    :param nodes: The nodes of a SparseGene
+    :type nodes: dict(int, char)
+    :return: A 64 bit hash of the nodes, the same in every process
+    :rtype: int
+    """
+    digest = hashlib.blake2b(format_nodes(nodes).encode('ascii'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def format_nodes(nodes):
+    """
+    :param nodes: The nodes of a SparseGene
+    :type nodes: dict(int, char)
+    :return: The nodes as text, such as '1:c,3:d,6:c'
+    :rtype: str
+    """
+    return ",".join("{}:{}".format(x, nodes[x]) for x in sorted(nodes))
+
+
+class SparseGene():
+    __slots__ = ('_nodes', '_size_mem', '_hash', '_canonical_hash')
+
+    def __init__(self, gene_a=None, gene_b=None, code=None, nodes=None):
+        """
+        :type gene_a: SparseGene Parent A's Gene
+        :type gene_b: SparseGene Parent B's Gene
+        :param code: A genetic sequence, whose nodes are copied as
+                     they are, without mutation
+        :type code: list(char)
+        :param nodes: Nodes to copy as they are, without mutation,
+                      such as the nodes of a migrant
+        :type nodes: dict(int, char)
+        """
+
+        """ dict(int, char): The choices defined, by position in the decision tree """
+        self._nodes = dict()
+        """ int: the memory size of the nodes, see auxiliaryGenetics.get_nodes_mem_size """
+        self._size_mem = params['default_memory_size']
+        """ int: the hash of the nodes, computed when first needed """
+        self._hash = None
+        """ int: the hash of the canonical nodes, computed when first needed """
+        self._canonical_hash = None
+
+        if nodes is not None:
+            self._nodes = dict(nodes)
+            self.update_mem_size()
+            return
+        if code is not None:
+            self._nodes = ag.nodes_from_code(code)
+            self.update_mem_size()
+            return
+
+        if gene_a is None or gene_b is None:
+            self._nodes = ag.produce_random_nodes(self._size_mem, params['sparse_gene_nodes'])
+        else:
+            self._nodes = ag.recombine_nodes(gene_a.get_nodes(), gene_b.get_nodes())
+        ag.mutate_nodes(self._nodes)
+        ag.prune_nodes(self._nodes)
+        self.update_mem_size()
+
+    def get_nodes(self):
+        """
+        :return: The choices this Gene defines, by position
+        :rtype: dict(int, char)
+        """
+        return self._nodes
+
+    def get_seq(self):
+        """
+        Get the genetic sequence with the same memory size and
+        decisions as this Gene, see auxiliaryGenetics.code_from_nodes.
+        It takes up to 2^(m+1) choices for a memory size m, so it is
+        for the code which needs a sequence rather than for every
+        decision.
+        :rtype: list(char)
+        """
+        return ag.code_from_nodes(self._nodes)
+
+    def get_decision(self, history):
+        """
+        Find the choice of this Gene's Cell depending on the
+        history provided, going down the left child for a 'c'
+        and the right child for a 'd', and keeping the choice
+        of the deepest node defined along the way.
+        :param history: The history or moves provided
+        :type history: Memory
+        :return: the choice dictated by the gene and history provided
+        :rtype: char
+        """
+        nodes = self._nodes
+        offset = 1
+        choice = nodes[1]
+        for x in history.get_mem_seq():
+            offset = 2*offset if 'c' == x else 2*offset + 1
+            choice = nodes.get(offset, choice)
+        return choice
+
+    def get_choice_at(self, x):
+        """
+        :param x: A position in the decision tree
+        :type x: int
+        :return: The choice of the node at 'x', or of its closest
+                 defined ancestor
+        :rtype: char
+        """
+        return ag.get_inherited_choice(self._nodes, x)
+
+    def update_mem_size(self):
+        """
+        Update the size of the Gene's memory to that of its nodes
+        """
+        self._size_mem = ag.get_nodes_mem_size(self._nodes)
+
+    def get_length(self):
+        """
+        :return: The number of choices this Gene defines
+        :rtype: int
+        """
+        return len(self._nodes)
+
+    def get_defect_fraction(self):
+        """
+        :return: The percentage of the nodes of this Gene which are 'd'
+        :rtype: float Between 0.0 and 1.0
+        """
+        count_defect = sum(1 for x in self._nodes.values() if 'd' == x)
+        return float(count_defect) / float(len(self._nodes))
+
+    def get_mem_size(self):
+        """
+        Retrieve and return the size of this Gene's memory
+        :return: This Gene's memory size
+        :rtype: int
+        """
+        return self._size_mem
+
+    def is_tft(self):
+        """
+        :return: Whether every position but a 'c' root plays the
+                 last move, with a memory of 2 or more
+        :rtype: boolean
+        """
+        return 'c' == self._nodes[1] and self._size_mem >= 2 and self.__plays_last_move()
+
+    def is_ftf(self):
+        """
+        :return: Whether every position but a 'd' root plays the
+                 last move, with a memory of 2 or more
+        :rtype: boolean
+        """
+        return 'd' == self._nodes[1] and self._size_mem >= 2 and self.__plays_last_move()
+
+    def __plays_last_move(self):
+        """
+        :return: Whether every position but the root, defined or
+                 not, plays the move which leads to it
+        :rtype: boolean
+        """
+        root = self._nodes[1]
+        return ag.nodes_follow(self._nodes,
+                               lambda x: root if x == 1 else ('c' if x % 2 == 0 else 'd'))
+
+    def is_t2t(self):
+        """
+        :return: Whether every position, defined or not, defects
+                 after two defections and cooperates otherwise, with
+                 a memory of 3 or more
+        :rtype: boolean
+        """
+        if self._size_mem < 3:
+            return False
+        return ag.nodes_follow(self._nodes, lambda x: 'd' if x >= 4 and x % 4 == 3 else 'c')
+
+    def is_alld(self):
+        """
+        :return: Whether every node defects
+        :rtype: boolean
+        """
+        return 'c' not in self._nodes.values()
+
+    def is_allc(self):
+        """
+        :return: Whether every node cooperates
+        :rtype: boolean
+        """
+        return 'd' not in self._nodes.values()
+
+    def get_footprint(self):
+        """
+        :return: An estimate of the bytes this Gene takes
+        :rtype: int
+        """
+        return sys.getsizeof(self) + sys.getsizeof(self._nodes)
+
+    def get_canonical_form(self):
+        """
+        :return: The canonical nodes of this Gene as text, see
+                 auxiliaryGenetics.canonicalize_nodes
+        :rtype: str
+        """
+        nodes = dict(self._nodes)
+        ag.canonicalize_nodes(nodes)
+        return format_nodes(nodes)
+
+    def get_hash(self):
+        """
+        Get a 64 bit hash of this Gene's nodes which, unlike hash(),
+        is the same in every process and every run.
+        :return: The hash of this Gene's nodes
+        :rtype: int
+        """
+        if self._hash is None:
+            self._hash = hash_nodes(self._nodes)
+        return self._hash
+
+    def get_canonical_hash(self):
+        """
+        Get a 64 bit hash of the canonical nodes of this Gene, which
+        is the same for all SparseGenes which make the same decisions
+        with the same memory size.
+        :return: The hash of this Gene's canonical nodes
+        :rtype: int
+        """
+        if self._canonical_hash is None:
+            nodes = dict(self._nodes)
+            ag.canonicalize_nodes(nodes)
+            self._canonical_hash = hash_nodes(nodes)
+        return self._canonical_hash
+
+    def __str__(self):
+        """
+        Prints a string representation of all
+        important information of the Gene
+        :return: str
+        """
+        display = "\nmemory size: "
+        display += str(self._size_mem)
+        display += "\npercent defect: "
+        display += str(self.get_defect_fraction())
+        display += "\ninitial move: "
+        display += self._nodes[1]
+        display += "\nnodes: "
+        display += format_nodes(self._nodes)
+
+        return display
@@ -4,6 +4,7 @@ import random
 
 import my_stats as s 
 import params as p
+from topology import make_topology
 
 """
 These are the 9 offsets on the surface which represent
@@ -15,6 +16,8 @@ top to bottom, these include:
     (2, 6), (3, 6), (4, 6)
 When used to get the neighbours of any cell for its interactions,
 the position which is the cell's position must be ignored.
+These are the offsets of the default 'moore' topology; the
+neighbours of a cell are looked up in the Surface's topology.
 """
 neighbour_offsets = [Position(-1,-1), Position( 0,-1), Position( 1,-1),
                      Position(-1, 0), Position( 0, 0), Position( 1, 0),
@@ -27,12 +30,15 @@ class Surface:
     runs.  The highest level method for this class is "tick()",
     which processes a single simulation time-step.
     """
-    def __init__(self, width, height):
+    def __init__(self, width, height, topology=None):
         """
         :param width: The width of the surface in open spots.
         :type width: int
         :param height: The height of the surface in open spots.
         :type height: int
+        :param topology: The neighbours of every spot, or None for
+                         the topology chosen by the parameters.
+        :type topology: Topology
         """
         self.population = 0
         self.width = width
@@ -42,6 +48,15 @@ class Surface:
         self.ID = 0
         self.total_alive = width * height
         self.total_dead = 0
+        """ int: The number of ticks run so far """
+        self.generation = 0
+        """ LineageRecorder: Records every birth, if lineage recording is on """
+        self.lineage = None
+        """ Census: Counts the Cells of every species, if the census is on """
+        self.census = None
+        """ Topology: The neighbours of every spot """
+        self.topology = topology if topology is not None \
+                        else make_topology(width, height)
         for i in range(height):
             self.map.append([ None ] * width)
 
@@ -58,6 +73,29 @@ class Surface:
                     living_cells.append(self.get(Position(x, y)))
         return living_cells
 
+    def get_all_cells(self):
+        """
+        Get every Cell this Surface has held which it still keeps,
+        dead Cells included, as the reproduction tick ranks them.
+        :rtype: set(Cell)
+        """
+        return self._all_cells
+
+    def compact(self):
+        """
+        Free the memory which no decision depends on: the sequences
+        of all the moves of every memory, the memories of dead Cells,
+        and the memories living Cells have of dead Cells.  Dead Cells
+        are kept, as the reproduction tick still ranks them.
+        """
+        living = set(c.get_id() for c in self.get_all())
+        for c in self._all_cells:
+            c.compact_memory()
+            if c.get_id() in living:
+                c.forget_all_but(living)
+            else:
+                c.forget_all()
+
     def get(self, pos):
         """
         Retrieve the Cell at position 'pos' in this Surface's map.
@@ -67,6 +105,20 @@ class Surface:
         """
         return self.map[(self.height + pos.y) % self.height][(self.width + pos.x) % self.width]
 
+    def get_node(self, pos):
+        """
+        Get the node of the topology at position 'pos'.
+        :rtype: int
+        """
+        return (pos.y % self.height) * self.width + pos.x % self.width
+
+    def get_at_node(self, node):
+        """
+        Retrieve the Cell at a node of the topology, or None.
+        :rtype: Cell, None
+        """
+        return self.map[node // self.width][node % self.width]
+
     def set(self, pos, c):
         """
         Set the position 'pos' to the cell 'c'.  This means
@@ -106,37 +158,129 @@ class Surface:
         :rtype: set(Cell)
         """
         neighbours = set()
-        for offset in neighbour_offsets:
-            neighbour = self.get(cell.get_position() + offset)
+        for node in self.topology.neighbourhoods[self.get_node(cell.get_position())]:
+            neighbour = self.get_at_node(node)
             if neighbour is not None:
                 neighbours.add(neighbour)
         return neighbours
-    
+
+    def get_lowest_neighbour(self, cell):
+        """
+        Get the Cell with the lowest score in the neighbourhood of
+        the cell 'cell', its own spot included, the partner the
+        reproduction ticks choose.  The neighbourhood is walked
+        without allocating anything, and only a tie for the lowest
+        score builds the set of get_neighbours, whose order breaks
+        ties as it always has.
+        :param cell: A Cell, which may have died since it was ranked
+        :type cell: Cell
+        :return: The Cell with the lowest score, or None if the
+                 neighbourhood is empty
+        :rtype: Cell
+        """
+        lowest = None
+        tied = False
+        for node in self.topology.neighbourhoods[self.get_node(cell.get_position())]:
+            neighbour = self.get_at_node(node)
+            if neighbour is None or neighbour is lowest:
+                continue
+            if lowest is None or neighbour.get_score() < lowest.get_score():
+                lowest = neighbour
+                tied = False
+            elif neighbour.get_score() == lowest.get_score():
+                tied = True
+        if tied:
+            return max(self.get_neighbours(cell), key=lambda c: -c.get_score())
+        return lowest
+
+    def get_empty_neighbour_node(self, c):
+        """
+        Return the node of a neighbouring empty spot, counting the
+        empty spots of the neighbourhood of 'c' and then walking to a
+        random one, so that nothing is allocated.  A spot appears as
+        often as in the neighbourhood, in its order, so that the pick
+        is the same as random.choice among the empty spots.
+        :param c: The Cell for which we want to find an empty adjacent spot.
+        :type c: Cell
+        :return: A random open node from among the neighbouring
+                 open nodes, or None if there are no open nodes.
+        :rtype: int
+        """
+        neighbourhood = self.topology.neighbourhoods[self.get_node(c.get_position())]
+        empty = 0
+        for node in neighbourhood:
+            if self.get_at_node(node) is None:
+                empty += 1
+        if empty == 0:
+            return None
+        pick = random.randrange(empty)
+        for node in neighbourhood:
+            if self.get_at_node(node) is None:
+                if pick == 0:
+                    return node
+                pick -= 1
+
     def get_empty_neighbour_position(self, c):
         """
         Return the position of a neighbouring empty spot on 
-        this Surface's map.
+        this Surface's map, see get_empty_neighbour_node.
         :param c: The Cell for which we want to find an empty adjacent spot.
         :type c: Cell
         :return: A random open position from among neighbouring
         open position, or None if there are no open positions.
         :rtype: Position
         """
-        candidates = []
-        for offset in neighbour_offsets:
-            neighbour = self.get(c.get_position() + offset)
-            if neighbour is None:
-                candidates.append(c.get_position() + offset)
-        if len(candidates) == 0:
+        node = self.get_empty_neighbour_node(c)
+        if node is None:
             return None
-        return random.choice(candidates)
+        return self.get_node_position(node)
+
+    def get_node_position(self, node):
+        """
+        :return: A new Position of the node 'node' of the topology
+        :rtype: Position
+        """
+        return Position(node % self.width, node // self.width)
 
     def __interaction_tick(self):
         """
         Perform the interaction tick on every living Cell 
-        on this Surface's map.
+        on this Surface's map.  In the 'neighbourhood' interaction
+        mode, every Cell interacts with all its neighbours, so every
+        pair of neighbours plays twice.  In the 'pairwise' mode,
+        every pair of neighbours plays once.
+        """
+        if p.params['interaction_mode'] == 'pairwise':
+            self.my_map(self.__play_forward)
+        else:
+            self.my_map(self.__play_neighbours)
+
+    def __play_neighbours(self, c):
+        """
+        Play a round with every neighbour of the Cell 'c'
+        in the topology.
+        :param c: A living Cell
+        :type c: Cell
+        """
+        indptr = self.topology.indptr
+        indices = self.topology.indices
+        node = self.get_node(c.get_position())
+        for k in range(indptr[node], indptr[node + 1]):
+            neighbour = self.get_at_node(indices[k])
+            if neighbour is not None:
+                c.play(neighbour)
+
+    def __play_forward(self, c):
+        """
+        Play a round with the forward neighbours of the Cell 'c'
+        in the topology.
+        :param c: A living Cell
+        :type c: Cell
         """
-        self.my_map(lambda c: c.interact(self.get_neighbours(c)))
+        for node in self.topology.forward[self.get_node(c.get_position())]:
+            neighbour = self.get_at_node(node)
+            if neighbour is not None and neighbour is not c:
+                c.play(neighbour)
     
     def __death_tick(self):
         """ 
@@ -147,6 +291,10 @@ class Surface:
             for x in range(self.width):
                 if self.map[x][y] is not None:
                     if self.map[x][y].is_dead():
+                        if p.params['memory_scope'] != 'all':
+                            self.map[x][y].forget_all()
+                        if self.census is not None:
+                            self.census.remove(self.map[x][y])
                         self.map[x][y] = None
                         self.population -= 1
                         self.total_dead += 1
@@ -165,25 +313,93 @@ class Surface:
         for c in top_cells:
             if c not in chosen_cells:
                 # find best neighbour
-                open_position = self.get_empty_neighbour_position(c)
-                if open_position is None:
+                open_node = self.get_empty_neighbour_node(c)
+                if open_node is None:
                     continue
-                neighbours = self.get_neighbours(c)
-                if 0 == len(neighbours):
+                best_neighbour = self.get_lowest_neighbour(c)
+                if best_neighbour is None:
                     continue
-                best_neighbour = max(neighbours, key=lambda c: -c.get_score())
                 if best_neighbour not in chosen_cells:
                     chosen_cells.add(c)
                     chosen_cells.add(best_neighbour)
-                    self.set(open_position, Cell(
-                        self.ID,
-                        open_position,
-                        c,
-                        best_neighbour
-                    ))
-                    self.ID += 1
-                    self.population += 1
-                    self.total_alive += 1
+                    self.__give_birth(c, best_neighbour, self.get_node_position(open_node))
+
+    def __give_birth(self, c, partner, position):
+        """
+        Place a new child of the Cells 'c' and 'partner'.
+        :param position: The empty position of the child
+        :type position: Position
+        """
+        child = Cell(
+            self.ID,
+            position,
+            c,
+            partner
+        )
+        self.set(position, child)
+        if self.lineage is not None:
+            self.lineage.record_birth(
+                    self.generation, child, c, partner)
+        if self.census is not None:
+            self.census.add(child)
+        self.ID += 1
+        self.population += 1
+        self.total_alive += 1
+
+    def __accept(self, proposals):
+        """
+        Resolve the conflicts between proposals made against the same
+        map in one batch: every proposal gets a random priority, and
+        is accepted when its priority is the highest among all the
+        proposals which share any of its resources.  No two accepted
+        proposals share a resource, so they can be carried out in any
+        order, and the result does not depend on the order in which
+        Cells made them.
+        :param proposals: The resources every proposal needs, such
+                          as ('spot', node) or ('cell', id)
+        :type proposals: list(tuple)
+        :return: Whether every proposal is accepted
+        :rtype: list(boolean)
+        """
+        # the index breaks ties between equal priorities
+        priorities = [(random.random(), i) for i in range(len(proposals))]
+        best = dict()
+        for priority, resources in zip(priorities, proposals):
+            for r in resources:
+                if r not in best or best[r] < priority:
+                    best[r] = priority
+        return [all(best[r] == priority for r in resources)
+                for priority, resources in zip(priorities, proposals)]
+
+    def __sync_reproduction_tick(self):
+        """
+        The reproduction tick, with every Cell the reproduction tick
+        would consider proposing a birth against the same map, and
+        the births which share a parent or a spot resolved by
+        __accept.
+        """
+        ratio = p.params['reproduction_ratio']
+        top_cells = sorted(
+                self._all_cells,
+                key=lambda c: -c.get_score())[:round(len(self._all_cells) * ratio)]
+
+        births = []
+        for c in top_cells:
+            open_node = self.get_empty_neighbour_node(c)
+            if open_node is None:
+                continue
+            best_neighbour = self.get_lowest_neighbour(c)
+            if best_neighbour is None:
+                continue
+            births.append((c, best_neighbour, open_node))
+
+        accepted = self.__accept([(('cell', c.get_id()),
+                                   ('cell', partner.get_id()),
+                                   ('spot', node))
+                                  for c, partner, node in births])
+        for (c, partner, node), ok in zip(births, accepted):
+            if ok:
+                self.__give_birth(c, partner, self.get_node_position(node))
 
     def __move_cell(self, c, destination):
         """ 
@@ -216,11 +432,11 @@ class Surface:
             if random.random() > move_chance:
                 continue
             # find neighbouring open spots
-            open_position = self.get_empty_neighbour_position(c)
+            open_node = self.get_empty_neighbour_node(c)
             # If there is a _position, move the cell c from
             # its current _position to its new _position
-            if open_position is not None:
-                self.__move_cell(c, open_position)
+            if open_node is not None:
+                self.__move_cell(c, self.get_node_position(open_node))
 
     def __alt_movement_tick(self):
         """
@@ -238,11 +454,36 @@ class Surface:
         for c in bottom_cells:
             if random.random() > move_chance:
                 continue
-            open_position = self.get_empty_neighbour_position(c)
+            open_node = self.get_empty_neighbour_node(c)
             # If there is a _position, move the cell c from
             # its current _position to its new _position
-            if open_position is not None:
-                self.__move_cell(c, open_position)
+            if open_node is not None:
+                self.__move_cell(c, self.get_node_position(open_node))
+
+    def __sync_movement_tick(self):
+        """
+        The movement tick of __alt_movement_tick, with every moving
+        Cell picking its destination on the same map, and the moves
+        to the same spot resolved by __accept.
+        """
+        ratio = p.params['move_ratio']
+        move_chance = p.params['move_chance']
+        all_cells = self.get_all()
+        sorted_cells = sorted(all_cells, key=lambda c: c.get_score())
+        bottom_cells = sorted_cells[:round(len(all_cells) * ratio)]
+
+        moves = []
+        for c in bottom_cells:
+            if random.random() > move_chance:
+                continue
+            open_node = self.get_empty_neighbour_node(c)
+            if open_node is not None:
+                moves.append((c, open_node))
+
+        accepted = self.__accept([(('spot', node),) for c, node in moves])
+        for (c, node), ok in zip(moves, accepted):
+            if ok:
+                self.__move_cell(c, self.get_node_position(node))
 
     def get_best_x(self, ratio):
         """
@@ -269,21 +510,59 @@ class Surface:
         :param inters: the number of interactions per tick
         :type inters: int
         """
+        self.generation += 1
         self.__clean()
         if p.params['ageing']:
             self.__age_tick()
+        synchronous = p.params['update_mode'] == 'synchronous'
         for x in range(inters):
             self.__interaction_tick()
             self.__death_tick()
-            self.__alt_movement_tick()
-        self.__reproduction_tick()
+            if synchronous:
+                self.__sync_movement_tick()
+            else:
+                self.__alt_movement_tick()
+        if synchronous:
+            self.__sync_reproduction_tick()
+        else:
+            self.__reproduction_tick()
 
     def __clean(self):
         """
-        Clear and reset the scores of all living Cells.
+        Clear and reset the scores of all living Cells,
+        and prune their memories.
         """
         self.my_map(lambda c: c.clear_interactions())
         self.my_map(lambda c: c.reset_score())
+        self.__forget()
+
+    def __forget(self):
+        """
+        Make every living Cell forget the Cells outside
+        the memory scope of the parameters.
+        """
+        scope = p.params['memory_scope']
+        if scope == 'living':
+            living = set(c.get_id() for c in self.get_all())
+            self.my_map(lambda c: c.forget_all_but(living))
+        elif scope == 'neighbours':
+            self.my_map(lambda c: c.forget_all_but(
+                    set(n.get_id() for n in self.get_neighbours(c))))
+
+    def get_state_grids(self):
+        """
+        Get the rule class and the score of every spot on this
+        Surface's map, row by row.  Empty spots have a rule class
+        and a score of 0.
+        :return: The grid of rule classes and the grid of scores.
+        :rtype: tuple(list(list(int)), list(list(float)))
+        """
+        classes = []
+        scores = []
+        for row in self.map:
+            classes.append([0 if c is None else c.get_rule_class() for c in row])
+            scores.append([0 if c is None else c.get_score() for c in row])
+        return classes, scores
 
     def draw(self):
         pass
@@ -315,56 +594,14 @@ class Surface:
 if __name__ == "__main__":
     import sys
     import json
-    from os import path
-    from time import strftime
+    import simulation
 
     if len(sys.argv) == 2:
-        file_start = path.splitext(path.basename(sys.argv[1]))[0]
         p.init(sys.argv[1])
     else:
-        file_start = 'default'
         p.init(None)
 
-    surface_w = p.params['surface']['width']
-    surface_h = p.params['surface']['height']
-    gens = p.params['generations']
-    interactions = p.params['interactions']
-
-    surface = Surface(surface_w, surface_h)
-
-    for i in range(surface_w * surface_h):
-        c_init = Cell(surface.ID, Position(i // surface_w, i % surface_h))
-        surface.ID += 1
-        surface.population += 1
-        surface.set(c_init.get_position(), c_init)
-    
-    sim_stats = list()
-    
-    # add initial state
-    stat = s.get_stats(surface)
-    sim_stats.append(stat)
-
-    for i in range(gens):
-        surface.tick(interactions)
-        stat = s.get_stats(surface)
-        sim_stats.append(stat)
-        print(surface)
-        print(" | generation: " + str(i))
-        print(" | def.frac  : " + '{0:2f}'.format(stat['def_frac_mean']) \
-            + " | init.move : " + '{0:2f}'.format(stat['init_move_frac']))
-        
-        print(" | tfts  : "   + '{0:2f}'.format(stat['rule_frac_tfts']) \
-            + " | ftfs  : "   + '{0:2f}'.format(stat['rule_frac_ftfs']) \
-            + " | t2ts  : "   + '{0:2f}'.format(stat['rule_frac_t2ts']) \
-            + " | all_d : "   + '{0:2f}'.format(stat['rule_frac_alld']) \
-            + " | all_c : "   + '{0:2f}'.format(stat['rule_frac_allc']))
-
-        
-    for c in surface.get_best_x(0.02):
-        print(str(c))
+    sim_stats = simulation.run()
 
     with open("data.json", "w+") as out:
         json.dump(sim_stats, out, indent=4)
-
-    s.output_plot("plot.html", sim_stats)
-
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Sweep a single parameter, such as 'loss_per_tick', spending most
+of the generations and seeds where the target statistic changes
+fastest with the parameter.
+
+The sweep works in rounds of successive halving.  The first round
+runs every value for a short horizon with a few seeds.  Every
+round then measures the target statistic of every value, averaged
+over the last generations of its runs, and estimates how fast it
+changes with the parameter.  Only the values where it changes
+fastest are kept for the next round, which runs them with more
+seeds and for more generations, up to the full horizon.
+
+A run where no Cell is left counts as 0 for the target statistic,
+which suits the rule fractions.
+
+Every round is a sweep (see sweep.py) in its own directory, and the
+measurements of all rounds are written to 'adaptive.json'.
+"""
+import json
+import math
+import os
+from os import path
+
+import numpy as np
+
+import params as p
+import sweep
+
+
+def make_params_files(base, param, values, seeds, generations, directory):
+    """
+    Write a parameter file for every value and seed.
+    :param base: The parameters every file starts from
+    :type base: dict
+    :param param: The name of the swept parameter
+    :type param: str
+    :param values: The values of the parameter, by index
+    :type values: dict(int, float)
+    :param seeds: The random seeds of every value
+    :type seeds: list(int)
+    :param generations: The number of generations of every run
+    :type generations: int
+    :param directory: Where to write the files
+    :type directory: str
+    :return: The path of every file, by value index and seed
+    :rtype: dict(tuple(int, int), str)
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = dict()
+    for i, value in values.items():
+        for seed in seeds:
+            run = dict(base)
+            run[param] = value
+            run['random_seed'] = seed
+            run['generations'] = generations
+            name = path.join(directory, '{}_{}_s{}.json'.format(param, i, seed))
+            with open(name, 'w+') as f:
+                json.dump(run, f, indent=4, sort_keys=True)
+            files[(i, seed)] = name
+    return files
+
+
+def tail_mean(stats, key, tail):
+    """
+    Average a statistic over the last generations of a run.
+    :param stats: The statistics of every generation of the run,
+                  one row per generation, see my_stats.stat_keys
+    :type stats: numpy.ndarray
+    :param key: The index of the statistic
+    :type key: int
+    :param tail: The fraction of the generations to average over
+    :type tail: float
+    :rtype: float
+    """
+    count = max(1, int(math.ceil(tail * len(stats))))
+    return float(np.mean(np.nan_to_num(stats[-count:, key])))
+
+
+def get_slopes(values, means):
+    """
+    Estimate how fast the target statistic changes at every value.
+    :param values: The values of the parameter, in increasing order
+    :type values: list(float)
+    :param means: The mean of the statistic at every value
+    :type means: list(float)
+    :return: The absolute slope at every value
+    :rtype: numpy.ndarray
+    """
+    if len(values) < 2:
+        return np.zeros(len(values))
+    return np.abs(np.gradient(np.array(means), np.array(values)))
+
+
+def select(slopes, keep, minimum):
+    """
+    :return: The positions of the largest slopes, in increasing order
+    :rtype: list(int)
+    """
+    count = min(len(slopes), max(minimum, int(math.ceil(keep * len(slopes)))))
+    return sorted(np.argsort(-slopes, kind='mergesort')[:count].tolist())
+
+
+def run_round(base, param, values, seeds, generations, metric, tail, out_dir, processes):
+    """
+    Run every value with every seed and measure the target statistic.
+    :return: The mean and the standard error of the statistic, by value index
+    :rtype: dict(int, tuple(float, float))
+    """
+    files = make_params_files(
+            base, param, values, seeds, generations, path.join(out_dir, 'params'))
+    ordered = sorted(files)
+    sweep.run_sweep([files[k] for k in ordered], out_dir, processes)
+
+    runs = np.load(path.join(out_dir, 'stats.npz'))
+    key = runs['stat_keys'].tolist().index(metric)
+    measured = dict()
+    for i in values:
+        samples = [tail_mean(runs[sweep.get_run_name(files[(i, seed)])], key, tail)
+                   for seed in seeds]
+        error = np.std(samples) / math.sqrt(len(samples)) if len(samples) > 1 else 0.0
+        measured[i] = (float(np.mean(samples)), float(error))
+    return measured
+
+
+def adaptive_sweep(base, param, values, metric, out_root,
+                   seeds=2, max_seeds=10, horizon=50, keep=0.5,
+                   minimum=3, tail=0.1, processes=None):
+    """
+    Sweep a parameter by successive halving.
+    :param base: The parameters every run starts from
+    :type base: dict
+    :param param: The name of the swept parameter
+    :type param: str
+    :param values: The values of the parameter
+    :type values: list(float)
+    :param metric: The target statistic, see my_stats.stat_keys
+    :type metric: str
+    :param out_root: The directory which will hold the rounds
+    :type out_root: str
+    :param seeds: The number of seeds of the first round
+    :type seeds: int
+    :param max_seeds: The number of seeds of the last round
+    :type max_seeds: int
+    :param horizon: The number of generations of the first round,
+                    which doubles every round up to 'generations'
+    :type horizon: int
+    :param keep: The fraction of the values kept every round
+    :type keep: float
+    :param minimum: The least number of values to keep
+    :type minimum: int
+    :param tail: The fraction of the generations to average the statistic over
+    :type tail: float
+    :param processes: The number of workers, or None for one per core
+    :type processes: int
+    :return: The rounds, with the measurements of every value
+    :rtype: list(dict)
+    """
+    values = sorted(values)
+    generations = base['generations']
+    kept = list(range(len(values)))
+    rounds = []
+
+    while True:
+        horizon = min(horizon, generations)
+        print("round {}: {} values, {} seeds, {} generations".format(
+                len(rounds), len(kept), seeds, horizon))
+
+        measured = run_round(base, param, { i: values[i] for i in kept },
+                             list(range(seeds)), horizon, metric, tail,
+                             path.join(out_root, 'round_{}'.format(len(rounds))),
+                             processes)
+        slopes = get_slopes([values[i] for i in kept], [measured[i][0] for i in kept])
+        rounds.append({
+            'generations': horizon,
+            'seeds': seeds,
+            'points': [{ 'value': values[i],
+                         'mean': measured[i][0],
+                         'error': measured[i][1],
+                         'slope': float(slope) }
+                       for i, slope in zip(kept, slopes)],
+        })
+
+        if horizon == generations and seeds >= max_seeds:
+            break
+        kept = [kept[j] for j in select(slopes, keep, minimum)]
+        horizon *= 2
+        seeds = min(2 * seeds, max_seeds)
+
+    with open(path.join(out_root, 'adaptive.json'), 'w+') as out:
+        json.dump({ 'param': param, 'metric': metric, 'rounds': rounds }, out, indent=4)
+    return rounds
+
+
+def get_cost(rounds):
+    """
+    :return: The number of generations run over all rounds
+    :rtype: int
+    """
+    return sum(r['generations'] * r['seeds'] * len(r['points']) for r in rounds)
+
+
+def get_arguments():
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+
+    parser.add_argument('-p', '--param', type=str, default='loss_per_tick')
+    parser.add_argument('-r', '--range', type=float, nargs=3, default=[1.0, 3.9, 30],
+                        metavar=('FIRST', 'LAST', 'COUNT'))
+    parser.add_argument('-m', '--metric', type=str, default='rule_frac_tfts')
+    parser.add_argument('-s', '--seeds', type=int, default=2)
+    parser.add_argument('-S', '--max-seeds', type=int, default=10)
+    parser.add_argument('-g', '--horizon', type=int, default=50)
+    parser.add_argument('-k', '--keep', type=float, default=0.5)
+    parser.add_argument('-n', '--minimum', type=int, default=3)
+    parser.add_argument('-t', '--tail', type=float, default=0.1)
+    parser.add_argument('-j', '--processes', type=int, default=None)
+    parser.add_argument('-o', '--out', type=str, default=None)
+
+    parser.add_argument('base', nargs='?', default=None,
+                        help="the parameter file every run starts from")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    from time import strftime
+
+    args = get_arguments()
+    out_root = args.out or path.join('out', 'adaptive_' + strftime('%Y-%m-%d_%H.%M.%S'))
+
+    first, last, count = args.range
+    values = np.linspace(first, last, int(count)).round(10).tolist()
+    base = p.resolve(args.base)
+
+    rounds = adaptive_sweep(base, args.param, values, args.metric, out_root,
+                            args.seeds, args.max_seeds, args.horizon, args.keep,
+                            args.minimum, args.tail, args.processes)
+
+    for r in rounds[-1:]:
+        for point in r['points']:
+            print("{}: {:.4f} | {}: {:.3f} +- {:.3f} | slope: {:.3f}".format(
+                    args.param, point['value'], args.metric,
+                    point['mean'], point['error'], point['slope']))
+    print("generations run: {} | uniform sweep: {}".format(
+            get_cost(rounds), len(values) * args.max_seeds * base['generations']))
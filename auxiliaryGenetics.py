@@ -14,8 +14,20 @@ def recombine(parent_a, parent_b):
     code and parent B's gene's code.
     :rtype: A list of characters
     """
-    code_a = parent_a.get_seq()
-    code_b = parent_b.get_seq()
+    return recombine_codes(parent_a.get_seq(), parent_b.get_seq())
+
+
+def recombine_codes(code_a, code_b):
+    """
+    Recombine the code sequences code_a and code_b
+    into a new code sequence.
+    :param code_a: Parent A's gene's code
+    :type code_a: list(char)
+    :param code_b: Parent B's gene's code
+    :type code_b: list(char)
+    :return: A new code formed from both codes
+    :rtype: A list of characters
+    """
     # Do not let the length of a gene fall less that 2
     new_code_length = max(((len(code_a) + len(code_b)) // 2), 2)
     # Find out which is the longer gene
@@ -125,6 +137,295 @@ def mutate(code):
     apply_insertions(code)
 
 
+def prune(code):
+    """
+    Apply the length cap and the canonicalization which the
+    parameters ask for to a newly made code.
+    :param code: A list of choices, a Gene's sequence.
+    :type code: list(char)
+    """
+    if params['max_gene_length'] is not None:
+        cap_length(code, params['max_gene_length'])
+    if params['canonicalize_genes']:
+        canonicalize(code)
+
+
+def cap_length(code, max_length):
+    """
+    Remove the choices of the code past 'max_length', keeping
+    at least 1 choice.  Unlike canonicalize, this can change
+    the memory size and decisions of the code.
+    :param code: A list of choices, a Gene's sequence.
+    :type code: list(char)
+    :param max_length: The longest the code can be, position 0 included
+    :type max_length: int
+    """
+    del code[max(max_length, 2):]
+
+
+def canonicalize(code):
+    """
+    Reduce the code to the shortest code with the same memory
+    size and the same decision for every history.
+
+    With a code of length l, the memory size is m = floor(log2(l))
+    and a history of up to m choices leads to a node of depth up to
+    m, which is a position p with 2^m <= p < 2^(m+1).  When that
+    node is not in the code, the decision is the choice of its
+    parent, p // 2.  So the last choice of the code, when it is
+    at depth m and the same as its parent's, changes no decision,
+    and it is removed until the last choice differs from its
+    parent's or the code would lose a level of memory.
+
+    Two codes with the same memory size make the same decisions if
+    and only if they have the same canonical code.
+    :param code: A list of choices, a Gene's sequence.
+    :type code: list(char)
+    """
+    deepest = 1 << (len(code).bit_length() - 1)
+    last = len(code) - 1
+    while last >= deepest and code[last] == code[last // 2]:
+        del code[last]
+        last -= 1
+
+
+"""
+The functions below work on the nodes of a SparseGene: a
+dictionary of the choices it defines, by position in the decision
+tree, which always holds the root, position 1.  The choice of a
+node it does not define is that of its closest defined ancestor.
+A code is the same as the nodes of all its positions, so a code of
+length l is the same as nodes whose last position is l - 1.
+"""
+
+
+def get_nodes_mem_size(nodes):
+    """
+    :param nodes: The nodes of a SparseGene
+    :type nodes: dict(int, char)
+    :return: The memory size of the nodes, that of a code as long as
+             their last position and 1
+    :rtype: int
+    """
+    return (max(nodes) + 1).bit_length() - 1
+
+
+def get_inherited_choice(nodes, pos):
+    """
+    :param nodes: The nodes of a SparseGene
+    :type nodes: dict(int, char)
+    :param pos: A position in the decision tree, 1 or more
+    :type pos: int
+    :return: The choice of the closest defined node to 'pos',
+             itself included, among its ancestors
+    :rtype: char
+    """
+    while pos not in nodes:
+        pos //= 2
+    return nodes[pos]
+
+
+def nodes_follow(nodes, rule):
+    """
+    Check the choice of every position up to the last node against
+    a rule, as the checks of a Gene do with every position of its
+    code.  A subtree without nodes has the same choice throughout,
+    so a walk down the tree stops at the first position which breaks
+    the rule, and only goes through every position for a Gene which
+    follows it.
+    :param nodes: The nodes of a SparseGene
+    :type nodes: dict(int, char)
+    :param rule: The choice of every position
+    :type rule: function(int) -> char
+    :return: Whether every position up to the last node, defined or
+             not, has the choice of the rule
+    :rtype: boolean
+    """
+    last = max(nodes)
+    stack = [(1, nodes[1])]
+    while stack:
+        x, choice = stack.pop()
+        if choice != rule(x):
+            return False
+        for child in (2 * x, 2 * x + 1):
+            if child <= last:
+                stack.append((child, nodes.get(child, choice)))
+    return True
+
+
+def nodes_from_code(code):
+    """
+    :param code: A Gene's sequence
+    :type code: list(char)
+    :return: The nodes of all the positions of the code
+    :rtype: dict(int, char)
+    """
+    return { x: code[x] for x in range(1, len(code)) }
+
+
+def code_from_nodes(nodes):
+    """
+    Expand nodes into the code with the same memory size and
+    decisions, every undefined position up to the last taking
+    the choice of its closest defined ancestor.  The code has
+    2^(m+1) positions at most, for a memory size m.
+    :param nodes: The nodes of a SparseGene
+    :type nodes: dict(int, char)
+    :rtype: list(char)
+    """
+    code = [0]
+    for x in range(1, max(nodes) + 1):
+        code.append(nodes[x] if x in nodes else code[x // 2])
+    return code
+
+
+def produce_random_nodes(size_mem, count):
+    """
+    Produce the nodes of a random SparseGene of memory size
+    'size_mem': the root, the last node of a code of that memory
+    size, 2^size_mem - 1, and other positions drawn before it, up
+    to 'count' nodes in all, each with a random choice.  With
+    'count' at 2^size_mem - 1, these are the positions of a code
+    from produce_random_gene.
+    :param size_mem: the size of a Cell's memory
+    :type size_mem: int
+    :param count: The number of nodes
+    :type count: int
+    :rtype: dict(int, char)
+    """
+    last = max(2 ** size_mem - 1, 1)
+    positions = [1]
+    if last > 1:
+        positions += sorted(random.sample(range(2, last), min(max(count - 2, 0), last - 2)))
+        positions.append(last)
+    return { x: get_random_choice() for x in positions }
+
+
+def recombine_nodes(nodes_a, nodes_b):
+    """
+    Recombine the nodes of two SparseGenes, as recombine_codes
+    does their codes: a node both parents define comes from either
+    one, and a node only one parent defines is kept half the time,
+    so that the child has as many nodes as its parents on average.
+    :param nodes_a: The nodes of Parent A's Gene
+    :type nodes_a: dict(int, char)
+    :param nodes_b: The nodes of Parent B's Gene
+    :type nodes_b: dict(int, char)
+    :return: The nodes of the child
+    :rtype: dict(int, char)
+    """
+    nodes = dict()
+    for x in sorted(nodes_a.keys() | nodes_b.keys()):
+        if x in nodes_a and x in nodes_b:
+            nodes[x] = nodes_a[x] if random.choice([True, False]) else nodes_b[x]
+        elif x == 1 or random.choice([True, False]):
+            nodes[x] = nodes_a[x] if x in nodes_a else nodes_b[x]
+    return nodes
+
+
+def mutate_nodes(nodes):
+    """
+    Apply the simulation mutations to the nodes of a SparseGene,
+    with the chances of mutate: every node may flip, every node
+    but the root may be deleted, and every node may insert a new
+    node, see insert_node.
+    :param nodes: The nodes of a SparseGene
+    :type nodes: dict(int, char)
+    """
+    for x in sorted(nodes):
+        if params['mutation_chance_flip'] > random.random():
+            nodes[x] = get_other_choice(nodes[x])
+    for x in sorted(nodes):
+        if x != 1 and params['mutation_chance_delete'] > random.random():
+            del nodes[x]
+    for x in range(len(nodes)):
+        if params['mutation_chance_insert'] > random.random():
+            insert_node(nodes, get_random_choice())
+
+
+def insert_node(nodes, choice):
+    """
+    Define a random undefined position of the decision tree of a
+    SparseGene, as insert_choice does to a code, no deeper than a
+    code of the same memory size m can grow without a new level:
+    positions 2 to 2^(m+1) - 1, the last of which is the only one
+    which raises the memory size.  A code grows a level of memory
+    once its length doubles, and nodes only grow one with one
+    insertion in as many as there are free positions, rather than
+    with most insertions, as down a path of undefined nodes.
+
+    Memory sizes still settle deeper than those of codes with as
+    many choices, as nodes spread over the whole tree while a code
+    fills it in order: from a memory of 3, they settle around 5
+    where codes settle around 2 (see 'golden.py invariants').
+    :param nodes: The nodes of a SparseGene
+    :type nodes: dict(int, char)
+    :param choice: The choice of 'c' or 'd'
+    :type choice: char
+    """
+    last = 2 ** (get_nodes_mem_size(nodes) + 1) - 1
+    # position 'last' is always free, so that there is one
+    free = last - 1 - (len(nodes) - 1)
+    if free < (last - 1) // 2:
+        pos = random.choice([x for x in range(2, last + 1) if x not in nodes])
+    else:
+        pos = random.randint(2, last)
+        while pos in nodes:
+            pos = random.randint(2, last)
+    nodes[pos] = choice
+
+
+def prune_nodes(nodes):
+    """
+    The same as prune, for the nodes of a SparseGene.
+    :param nodes: The nodes of a SparseGene
+    :type nodes: dict(int, char)
+    """
+    if params['max_gene_length'] is not None:
+        cap_nodes(nodes, params['max_gene_length'])
+    if params['canonicalize_genes']:
+        canonicalize_nodes(nodes)
+
+
+def cap_nodes(nodes, max_length):
+    """
+    Remove the nodes past the position 'max_length' - 1, as
+    cap_length does with a code, keeping the root.
+    :param nodes: The nodes of a SparseGene
+    :type nodes: dict(int, char)
+    :param max_length: The longest the equivalent code can be, position 0 included
+    :type max_length: int
+    """
+    for x in [x for x in nodes if x >= max(max_length, 2)]:
+        del nodes[x]
+
+
+def canonicalize_nodes(nodes):
+    """
+    Reduce nodes to the fewest nodes with the same memory size and
+    the same decision for every history.
+
+    A node with the same choice as its closest defined ancestor
+    changes no decision, and it is removed, which does not change
+    which other nodes are the same as their ancestors.  If this
+    would lower the memory size m, the node 2^m - 1 is kept, with
+    the choice it inherits.
+
+    Two SparseGenes with the same memory size make the same
+    decisions if and only if they have the same canonical nodes.
+    :param nodes: The nodes of a SparseGene
+    :type nodes: dict(int, char)
+    """
+    size_mem = get_nodes_mem_size(nodes)
+    last = 2 ** size_mem - 1
+    kept_last = get_inherited_choice(nodes, last)
+    for x in sorted(nodes, reverse=True):
+        if x != 1 and nodes[x] == get_inherited_choice(nodes, x // 2):
+            del nodes[x]
+    if get_nodes_mem_size(nodes) < size_mem:
+        nodes[last] = kept_last
+
+
 def apply_flips(code):
     """
     Proceed over the code and apply flip mutations
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Distribute the runs of a sweep over the cores of many machines.
+
+A coordinator serves jobs over TCP to workers on any number of
+nodes.  A job is the fully resolved parameters of a run, so that
+workers do not need the parameter files.  Every job is leased to
+the worker which takes it: the worker renews the lease while it
+runs the job, and if the worker disconnects or lets its lease run
+out, the job goes back to the queue for another worker.  When a
+run fails, or its process is killed, it is tried again up to
+'max_attempts' times.  Jobs
+are handed out longest first, by the cost model of schedule.py.
+
+Workers send back the statistics of every generation of a run,
+compressed with zlib, and the coordinator writes them to the run's
+'data.json', and all of them to 'stats.npz', as sweep.py does.
+
+Messages are pickled by multiprocessing.connection, and every
+connection must know the sweep's key, so only serve a sweep to a
+network you trust.
+
+    python3 broker.py serve -a 0.0.0.0:6000 -k KEY -o out/x params/*.json
+    python3 broker.py work -a coordinator:6000 -k KEY -j 8
+    python3 broker.py local -j 4 -o out/x params/*.json
+"""
+import contextlib
+import io
+import json
+import os
+import socket
+import threading
+import time
+import zlib
+from collections import deque
+from multiprocessing import Process, forkserver, get_context
+from multiprocessing.connection import Client, Listener
+from os import path
+
+import numpy as np
+
+import my_stats as s
+import params as p
+import schedule
+import sweep
+
+
+def run_remote(job_params):
+    """
+    Run a single simulation in a worker's child process.
+    :param job_params: The fully resolved parameters of the run
+    :type job_params: dict
+    :return: The compressed statistics of every generation, and
+             the number of seconds the run took
+    :rtype: tuple(bytes, float)
+    """
+    import simulation
+
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        p.params.update(job_params)
+        p.init(None)
+        sim_stats = simulation.run(verbose=False)
+    return zlib.compress(json.dumps(sim_stats).encode()), time.time() - start
+
+
+class Coordinator():
+    """
+    Hands out jobs to workers, and collects their results.
+    """
+
+    def __init__(self, names, jobs, lease=60.0, max_attempts=3, on_result=None, costs=None):
+        """
+        :param names: The name of every run
+        :type names: list(str)
+        :param jobs: The fully resolved parameters of every run
+        :type jobs: list(dict)
+        :param lease: The number of seconds a worker has to renew its lease
+        :type lease: float
+        :param max_attempts: The number of times a run may fail
+        :type max_attempts: int
+        :param on_result: Called with the index of every job when
+                          its result comes in, before the sweep may finish
+        :type on_result: function
+        :param costs: The expected seconds of every run, to hand out
+                      the longest first, or None for their order
+        :type costs: list(float)
+        """
+        self.names = names
+        self.jobs = jobs
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.on_result = on_result
+        """ deque(int): The jobs waiting for a worker """
+        self._pending = deque(range(len(jobs)) if costs is None
+                              else schedule.longest_first(costs))
+        """ dict(int, tuple(str, float)): The worker and lease expiry of running jobs """
+        self._leases = dict()
+        """ dict(int, int): The number of failures of every job """
+        self._failures = dict()
+        """ dict(int, tuple(list, float, str)): The statistics, time and worker of done jobs """
+        self.results = dict()
+        """ dict(int, str): The last error of every job which failed for good """
+        self.failed = dict()
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        if not jobs:
+            self._finished.set()
+
+    def expire(self):
+        """
+        Put the jobs whose lease ran out back in the queue.
+        """
+        with self._lock:
+            self.__expire()
+
+    def __expire(self):
+        now = time.time()
+        for index, (worker, expiry) in list(self._leases.items()):
+            if expiry < now:
+                print("{}: lease of {} expired".format(self.names[index], worker))
+                del self._leases[index]
+                self._pending.appendleft(index)
+
+    def __check_finished(self):
+        if len(self.results) + len(self.failed) == len(self.jobs):
+            self._finished.set()
+
+    def request(self, worker):
+        """
+        :return: The message for a worker asking for a job
+        :rtype: tuple
+        """
+        with self._lock:
+            self.__expire()
+            if self._finished.is_set():
+                return ('done',)
+            if not self._pending:
+                return ('wait', min(self.lease / 4, 5.0))
+            index = self._pending.popleft()
+            self._leases[index] = (worker, time.time() + self.lease)
+            return ('job', index, self.jobs[index], self.lease)
+
+    def heartbeat(self, worker, index):
+        with self._lock:
+            if self._leases.get(index, (None,))[0] == worker:
+                self._leases[index] = (worker, time.time() + self.lease)
+
+    def complete(self, worker, index, blob, elapsed):
+        """
+        Take the result of a job, unless another worker already sent it.
+        :return: Whether the result was new
+        :rtype: boolean
+        """
+        with self._lock:
+            if self._leases.get(index, (None,))[0] == worker:
+                del self._leases[index]
+            if index in self.results or index in self.failed:
+                return False
+            if index in self._pending:
+                self._pending.remove(index)
+            self.results[index] = (json.loads(zlib.decompress(blob).decode()),
+                                   elapsed, worker)
+            if self.on_result is not None:
+                self.on_result(index)
+            self.__check_finished()
+            return True
+
+    def fail(self, worker, index, error):
+        with self._lock:
+            if self._leases.get(index, (None,))[0] != worker:
+                return
+            del self._leases[index]
+            self._failures[index] = self._failures.get(index, 0) + 1
+            print("{}: failed on {}: {}".format(self.names[index], worker, error))
+            if self._failures[index] >= self.max_attempts:
+                self.failed[index] = error
+                self.__check_finished()
+            else:
+                self._pending.append(index)
+
+    def release(self, worker):
+        """
+        Put the jobs of a worker which disconnected back in the queue.
+        """
+        with self._lock:
+            for index, (holder, expiry) in list(self._leases.items()):
+                if holder == worker:
+                    print("{}: {} disconnected".format(self.names[index], worker))
+                    del self._leases[index]
+                    self._pending.appendleft(index)
+
+    def get_progress(self):
+        with self._lock:
+            return len(self.results), len(self._leases), len(self._pending)
+
+    def wait(self, timeout):
+        return self._finished.wait(timeout)
+
+
+def handle(coordinator, conn):
+    """
+    Answer the messages of a single worker until it disconnects.
+    """
+    worker = None
+    try:
+        while True:
+            message = conn.recv()
+            kind = message[0]
+            if kind == 'hello':
+                worker = message[1]
+            elif kind == 'request':
+                conn.send(coordinator.request(worker))
+            elif kind == 'heartbeat':
+                coordinator.heartbeat(worker, message[1])
+            elif kind == 'result':
+                _, index, blob, elapsed = message
+                coordinator.complete(worker, index, blob, elapsed)
+            elif kind == 'failed':
+                coordinator.fail(worker, message[1], message[2])
+    except (EOFError, OSError):
+        pass
+    finally:
+        conn.close()
+        if worker is not None:
+            coordinator.release(worker)
+
+
+def accept(coordinator, listener):
+    while True:
+        try:
+            conn = listener.accept()
+        except OSError:
+            return
+        except Exception:
+            # a client which does not know the key
+            continue
+        threading.Thread(target=handle, args=(coordinator, conn), daemon=True).start()
+
+
+def run_job(conn, job_params):
+    """
+    Run a job in a child process of a worker, and send its outcome
+    to the worker: ('result', blob, elapsed), see run_remote, or
+    ('failed', error).
+    :param conn: The child's end of a pipe to the worker
+    :type conn: multiprocessing.connection.Connection
+    :param job_params: The fully resolved parameters of the run
+    :type job_params: dict
+    """
+    try:
+        conn.send(('result',) + run_remote(job_params))
+    except Exception as e:
+        conn.send(('failed', repr(e)))
+    finally:
+        conn.close()
+
+
+def work(address, authkey, name=None):
+    """
+    Run jobs from a coordinator until it has none left.
+    :param address: The host and port of the coordinator
+    :type address: tuple(str, int)
+    :param authkey: The key of the sweep
+    :type authkey: bytes
+    :param name: The name of this worker, or None for host:pid
+    :type name: str
+    """
+    name = name or "{}:{}".format(socket.gethostname(), os.getpid())
+    # A fresh process per run, so that no parameters leak from one
+    # run into the next.  The processes come from a fork server started
+    # before connecting, so that they do not inherit the connection and
+    # keep it open when this worker dies.
+    context = get_context('forkserver')
+    forkserver.ensure_running()
+    conn = Client(address, authkey=authkey)
+    job = None
+    try:
+        conn.send(('hello', name))
+        while True:
+            conn.send(('request',))
+            message = conn.recv()
+            if message[0] == 'done':
+                break
+            if message[0] == 'wait':
+                time.sleep(message[1])
+                continue
+
+            _, index, job_params, lease = message
+            outcomes, child_end = context.Pipe(duplex=False)
+            job = context.Process(target=run_job, args=(child_end, job_params), daemon=True)
+            job.start()
+            # once the child is gone, its end of the pipe is closed,
+            # and the pipe is ready to tell so
+            child_end.close()
+            while not outcomes.poll(lease / 4) and job.is_alive():
+                conn.send(('heartbeat', index))
+            outcome = None
+            if outcomes.poll():
+                try:
+                    outcome = outcomes.recv()
+                except EOFError:
+                    pass
+            job.join()
+            outcomes.close()
+            if outcome is None:
+                # killed, such as by the out of memory killer
+                conn.send(('failed', index,
+                           "the run exited with code {}".format(job.exitcode)))
+            else:
+                conn.send((outcome[0], index) + outcome[1:])
+            job = None
+    except (EOFError, OSError):
+        # the coordinator is gone, so there is nothing left to report to
+        pass
+    finally:
+        if job is not None and job.is_alive():
+            job.terminate()
+            job.join()
+        conn.close()
+
+
+def work_many(address, authkey, processes):
+    """
+    Run 'processes' workers on this node.
+    """
+    workers = [Process(target=work, args=(address, authkey))
+               for i in range(processes or os.cpu_count())]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+
+def serve(params_files, out_root, address, authkey, lease=60.0, interval=10.0,
+          local_workers=0, catalog_path=None):
+    """
+    Serve a sweep to workers until every run is done or failed for good.
+    :param params_files: The parameter files of the runs
+    :type params_files: list(str)
+    :param out_root: The directory which will hold the runs' directories
+    :type out_root: str
+    :param address: The host and port to listen on, port 0 for any
+    :type address: tuple(str, int)
+    :param authkey: The key workers must know
+    :type authkey: bytes
+    :param lease: The number of seconds a worker has to renew its lease
+    :type lease: float
+    :param interval: The number of seconds between progress reports
+    :type interval: float
+    :param local_workers: The number of workers to start on this machine
+    :type local_workers: int
+    :param catalog_path: The run catalog whose timings refine the
+                         cost model, or None
+    :type catalog_path: str
+    :return: The statistics of the last generation of every run, None for failed runs
+    :rtype: list(dict(str, float))
+    """
+    os.makedirs(out_root, exist_ok=True)
+    names = [sweep.get_run_name(f) for f in params_files]
+
+    def on_result(index):
+        out_dir = path.join(out_root, names[index])
+        os.makedirs(out_dir, exist_ok=True)
+        with open(path.join(out_dir, 'data.json'), 'w+') as out:
+            json.dump(coordinator.results[index][0], out, indent=4)
+
+    jobs = [p.resolve(f) for f in params_files]
+    model = schedule.from_catalog(catalog_path)
+    coordinator = Coordinator(names, jobs, lease, on_result=on_result,
+                              costs=[model.predict(j) for j in jobs])
+
+    listener = Listener(address, authkey=authkey)
+    print("serving {} runs on {}:{}".format(len(names), *listener.address))
+    threading.Thread(target=accept, args=(coordinator, listener), daemon=True).start()
+
+    workers = [Process(target=work, args=(listener.address, authkey))
+               for i in range(local_workers)]
+    for w in workers:
+        w.start()
+
+    next_report = 0
+    while not coordinator.wait(min(interval, lease / 4)):
+        coordinator.expire()
+        if time.time() < next_report:
+            continue
+        next_report = time.time() + interval
+        print("{} of {} runs done | {} running | {} waiting".format(
+                coordinator.get_progress()[0], len(names), *coordinator.get_progress()[1:]))
+    for w in workers:
+        w.join()
+    listener.close()
+
+    with open(path.join(out_root, 'broker.json'), 'w+') as manifest:
+        json.dump([{ 'params': f,
+                     'worker': coordinator.results[i][2] if i in coordinator.results else None,
+                     'elapsed': coordinator.results[i][1] if i in coordinator.results else None,
+                     'error': coordinator.failed.get(i) }
+                   for i, f in enumerate(params_files)],
+                  manifest, indent=4)
+    np.savez(path.join(out_root, 'stats.npz'),
+             stat_keys=np.array(s.stat_keys),
+             **{ n: sweep.read_stats(path.join(out_root, n))
+                 for i, n in enumerate(names) if i in coordinator.results })
+    print("{} runs done, {} failed".format(len(coordinator.results), len(coordinator.failed)))
+
+    return [coordinator.results[i][0][-1] if i in coordinator.results else None
+            for i in range(len(names))]
+
+
+def parse_address(address):
+    host, port = address.rsplit(':', 1)
+    return (host, int(port))
+
+
+def get_arguments():
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve')
+    serve_parser.add_argument('-a', '--address', type=str, default='0.0.0.0:6000')
+    serve_parser.add_argument('-k', '--key', type=str, required=True)
+    serve_parser.add_argument('-o', '--out', type=str, default=None)
+    serve_parser.add_argument('-l', '--lease', type=float, default=60.0)
+    serve_parser.add_argument('-i', '--interval', type=float, default=10.0)
+    serve_parser.add_argument('-c', '--catalog', type=str, default=path.join('out', 'catalog.db'),
+                              help="the run catalog whose timings refine the cost model")
+    serve_parser.add_argument('params', nargs='+')
+
+    work_parser = commands.add_parser('work')
+    work_parser.add_argument('-a', '--address', type=str, required=True)
+    work_parser.add_argument('-k', '--key', type=str, required=True)
+    work_parser.add_argument('-j', '--processes', type=int, default=None)
+
+    local_parser = commands.add_parser('local')
+    local_parser.add_argument('-j', '--processes', type=int, default=os.cpu_count())
+    local_parser.add_argument('-o', '--out', type=str, default=None)
+    local_parser.add_argument('-l', '--lease', type=float, default=60.0)
+    local_parser.add_argument('-i', '--interval', type=float, default=10.0)
+    local_parser.add_argument('-c', '--catalog', type=str, default=path.join('out', 'catalog.db'),
+                              help="the run catalog whose timings refine the cost model")
+    local_parser.add_argument('params', nargs='+')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    from time import strftime
+
+    args = get_arguments()
+    if args.command == 'work':
+        work_many(parse_address(args.address), args.key.encode(), args.processes)
+    else:
+        out_root = args.out or path.join('out', 'broker_' + strftime('%Y-%m-%d_%H.%M.%S'))
+        if args.command == 'serve':
+            serve(args.params, out_root, parse_address(args.address), args.key.encode(),
+                  args.lease, args.interval, catalog_path=args.catalog)
+        else:
+            serve(args.params, out_root, ('localhost', 0), os.urandom(16),
+                  args.lease, args.interval, args.processes, args.catalog)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+A catalog of completed runs in a SQLite database, so that a sweep
+can skip the runs it has already done and analysis can find runs
+by their parameters without opening run directories.
+
+A run is identified by a key: the hash of its fully resolved
+parameters and of the source of the modules which simulate it.
+Two parameter files which resolve to the same parameters, with
+the same code, give the same key, and the second run is skipped.
+Parameters which only choose what is written during a run, such
+as 'lineage', are not part of the key.
+
+The database has three tables:
+    runs: the key, code version, status, directory, parameters
+          and timings of every run;
+    params: every parameter of every run, nested parameters
+            joined with '.', such as 'surface.width';
+    metrics: every statistic of the last generation of every run.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from os import path
+
+""" The modules whose source decides the result of a run """
+simulation_modules = [
+    'Cell.py', 'Gene.py', 'Memory.py', 'Position.py', 'SparseGene.py',
+    'Surface.py', 'auxiliaryGenetics.py', 'convergence.py', 'footprint.py',
+    'my_stats.py', 'params.py', 'simulation.py', 'topology.py',
+]
+
+""" The parameters which do not change the result of a run """
+output_params = ['lineage', 'census', 'frames', 'keyframe_interval', 'shared_state']
+
+schema = """
+create table if not exists runs (
+    key text primary key,
+    version text not null,
+    status text not null,
+    out_dir text,
+    params text not null,
+    started real,
+    finished real,
+    elapsed real
+);
+create table if not exists params (
+    key text not null references runs(key),
+    name text not null,
+    value
+);
+create index if not exists params_name_value on params(name, value);
+create table if not exists metrics (
+    key text not null references runs(key),
+    name text not null,
+    value real
+);
+create index if not exists metrics_key on metrics(key);
+"""
+
+
+def code_version():
+    """
+    :return: A hash of the source of the simulation modules
+    :rtype: str
+    """
+    h = hashlib.sha256()
+    root = path.dirname(path.abspath(__file__))
+    for module in simulation_modules:
+        with open(path.join(root, module), 'rb') as f:
+            h.update(module.encode())
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def run_key(resolved, version):
+    """
+    :param resolved: The fully resolved parameters of a run, see params.resolve
+    :type resolved: dict
+    :param version: The code version, see code_version
+    :type version: str
+    :return: The key of the run
+    :rtype: str
+    """
+    relevant = { k: v for k, v in resolved.items() if k not in output_params }
+    h = hashlib.sha256()
+    h.update(version.encode())
+    h.update(json.dumps(relevant, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def flatten(params, prefix=''):
+    """
+    :return: The parameters with nested parameters joined with '.'
+    :rtype: dict(str, object)
+    """
+    flat = dict()
+    for name, value in params.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + name + '.'))
+        elif isinstance(value, (list, tuple)):
+            flat[prefix + name] = json.dumps(value)
+        else:
+            flat[prefix + name] = value
+    return flat
+
+
+class Catalog():
+    """
+    A connection to a run catalog.  Only one process should
+    write to a catalog at a time, so workers report to the
+    coordinator of a sweep, which writes.
+    """
+
+    def __init__(self, db_path):
+        """
+        :param db_path: The path of the database, created if it does not exist
+        :type db_path: str
+        """
+        if path.dirname(db_path):
+            os.makedirs(path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(schema)
+
+    def get_run(self, key):
+        """
+        :return: The run with the key, or None
+        :rtype: sqlite3.Row
+        """
+        return self._db.execute("select * from runs where key = ?", (key,)).fetchone()
+
+    def is_done(self, key):
+        """
+        :return: Whether the run with the key completed
+        :rtype: boolean
+        """
+        run = self.get_run(key)
+        return run is not None and run['status'] == 'done'
+
+    def start(self, key, version, resolved, out_dir):
+        """
+        Record that a run started, replacing an earlier attempt.
+        """
+        with self._db:
+            self._db.execute("delete from params where key = ?", (key,))
+            self._db.execute("delete from metrics where key = ?", (key,))
+            self._db.execute(
+                "insert or replace into runs (key, version, status, out_dir, params, started)"
+                " values (?, ?, 'running', ?, ?, ?)",
+                (key, version, out_dir, json.dumps(resolved, sort_keys=True), time.time()))
+            self._db.executemany(
+                "insert into params (key, name, value) values (?, ?, ?)",
+                [(key, n, v) for n, v in flatten(resolved).items()])
+
+    def finish(self, key, final_stats, elapsed):
+        """
+        Record that a run completed.
+        :param final_stats: The statistics of the last generation
+        :type final_stats: dict(str, float)
+        :param elapsed: The number of seconds the run took
+        :type elapsed: float
+        """
+        with self._db:
+            self._db.execute(
+                "update runs set status = 'done', finished = ?, elapsed = ? where key = ?",
+                (time.time(), elapsed, key))
+            self._db.executemany(
+                "insert into metrics (key, name, value) values (?, ?, ?)",
+                [(key, n, v) for n, v in final_stats.items()])
+
+    def fail(self, key):
+        """
+        Record that a run failed, so that it is run again.
+        """
+        with self._db:
+            self._db.execute("update runs set status = 'failed' where key = ?", (key,))
+
+    def query(self, ranges=None, metrics=None, version=None):
+        """
+        Find completed runs by the values of their parameters.
+        :param ranges: The lowest and highest value of parameters, by name
+        :type ranges: dict(str, tuple(float, float))
+        :param metrics: The statistics to return, or None for all
+        :type metrics: list(str)
+        :param version: Only return runs of this code version, or None for all
+        :type version: str
+        :return: The key, directory, elapsed time, parameters and
+                 statistics of every matching run
+        :rtype: list(dict)
+        """
+        sql = "select * from runs where status = 'done'"
+        args = []
+        if version is not None:
+            sql += " and version = ?"
+            args.append(version)
+        for name, (low, high) in (ranges or dict()).items():
+            sql += " and key in (select key from params" \
+                   " where name = ? and value between ? and ?)"
+            args += [name, low, high]
+
+        return [self.__describe(run, metrics)
+                for run in self._db.execute(sql, args).fetchall()]
+
+    def __describe(self, run, metrics=None):
+        rows = self._db.execute(
+            "select name, value from metrics where key = ?", (run['key'],)).fetchall()
+        return {
+            'key': run['key'],
+            'out_dir': run['out_dir'],
+            'elapsed': run['elapsed'],
+            'params': json.loads(run['params']),
+            'metrics': { r['name']: r['value'] for r in rows
+                         if metrics is None or r['name'] in metrics },
+        }
+
+    def describe(self, key):
+        """
+        :return: The directory, elapsed time, parameters and statistics
+                 of the run with the key, as returned by query
+        :rtype: dict
+        """
+        return self.__describe(self.get_run(key))
+
+    def close(self):
+        self._db.close()
+
+
+def get_arguments():
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+
+    parser.add_argument('catalog', type=str)
+    parser.add_argument('-w', '--where', nargs=3, action='append', default=[],
+                        metavar=('PARAM', 'LOW', 'HIGH'))
+    parser.add_argument('-m', '--metric', action='append', default=None)
+    parser.add_argument('-c', '--current', action='store_true',
+                        help="only runs of the current code version")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+
+    catalog = Catalog(args.catalog)
+    runs = catalog.query({ name: (float(low), float(high)) for name, low, high in args.where },
+                         args.metric,
+                         code_version() if args.current else None)
+    for run in runs:
+        print("{} | {} | {:.1f}s | {}".format(
+                run['key'][:12], run['out_dir'], run['elapsed'] or 0, run['metrics']))
+    catalog.close()
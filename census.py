@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+This module keeps a census of the species of a simulation: the
+number of living Cells of every distinct Gene, Genes which make the
+same decisions being the same species (see Gene.get_canonical_hash).
+
+The census is kept up to date as Cells are born and die, so taking
+it costs nothing more every generation than writing the species
+which are alive.  Every species gets an index when it first
+appears.  Every generation, the indices and counts of the living
+species are written to 'census.bin', the indices as differences
+from the previous index, and compressed with zlib.
+
+'census.idx' holds one fixed-width entry per generation: where it
+is in 'census.bin' and its size.  'census.species' holds a line per
+species, in order of index: its canonical hash in hexadecimal and
+the Gene of the first Cell of the species, in its canonical form
+(see Gene.get_canonical_form).
+
+    python3 census.py out/default_2016-12-12_14.49.50 -n 10
+"""
+import zlib
+
+import numpy as np
+
+""" The layout of an entry of the index """
+index_dtype = np.dtype([
+    ('offset', '<u8'),
+    ('size', '<u4'),
+])
+
+
+class Census():
+    """
+    Counts the living Cells of every species, and writes the
+    counts of every generation.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The path of the census file; the index and the
+                     species are written to the same path with '.idx'
+                     and '.species' instead of '.bin'
+        :type path: str
+        """
+        self._file = open(path, 'wb')
+        self._index = open(_sibling(path, '.idx'), 'wb')
+        self._species = open(_sibling(path, '.species'), 'w')
+        """ dict(int, int): The index of every species seen, by canonical hash """
+        self._indices = dict()
+        """ dict(int, int): The number of living Cells of every living species, by index """
+        self.counts = dict()
+
+    def add(self, cell):
+        """
+        Count a Cell which was born or placed on the Surface.
+        :type cell: Cell
+        """
+        gene = cell.get_gene()
+        key = gene.get_canonical_hash()
+        index = self._indices.get(key)
+        if index is None:
+            index = len(self._indices)
+            self._indices[key] = index
+            self._species.write("{:016x} {}\n".format(key, gene.get_canonical_form()))
+        self.counts[index] = self.counts.get(index, 0) + 1
+
+    def remove(self, cell):
+        """
+        Stop counting a Cell which died.
+        :type cell: Cell
+        """
+        index = self._indices[cell.get_gene().get_canonical_hash()]
+        if self.counts[index] == 1:
+            del self.counts[index]
+        else:
+            self.counts[index] -= 1
+
+    def record(self, generation, surface, stats):
+        """
+        Write the counts of the living species.
+        :param generation: The index of the generation
+        :type generation: int
+        :param surface: The Surface of the simulation (unused)
+        :type surface: Surface
+        :param stats: The statistics of the generation (unused)
+        :type stats: dict(str, float)
+        """
+        indices = np.array(sorted(self.counts), np.uint32)
+        counts = np.array([self.counts[i] for i in indices.tolist()], np.uint32)
+        deltas = np.diff(indices, prepend=np.uint32(0)).astype(np.uint32)
+        data = zlib.compress(np.concatenate([deltas, counts]).tobytes())
+
+        entry = np.array([(self._file.tell(), len(data))], index_dtype)
+        self._file.write(data)
+        self._index.write(entry.tobytes())
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+        self._species.close()
+
+
+def _sibling(path, extension):
+    """
+    :return: The path of a file written along the census file 'path'
+    :rtype: str
+    """
+    if path.endswith('.bin'):
+        return path[:-len('.bin')] + extension
+    return path + extension
+
+
+class CensusReader():
+    """
+    Random access to the census of every generation.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The path of a census file written by Census
+        :type path: str
+        """
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+        self._index = np.fromfile(_sibling(path, '.idx'), dtype=index_dtype)
+        """ list(str): The canonical hash of every species, in hexadecimal """
+        self.hashes = []
+        """ list(str): The canonical Gene of every species, see Gene.get_canonical_form """
+        self.genes = []
+        with open(_sibling(path, '.species')) as f:
+            for line in f:
+                key, gene = line.split()
+                self.hashes.append(key)
+                self.genes.append(gene)
+
+    def __len__(self):
+        return len(self._index)
+
+    def get(self, generation):
+        """
+        Get the census of a generation.
+        :param generation: The index of the generation
+        :type generation: int
+        :return: The indices of the living species, and their counts
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        entry = self._index[generation]
+        start = int(entry['offset'])
+        data = self._data[start:start + int(entry['size'])].tobytes()
+        table = np.frombuffer(zlib.decompress(data), np.uint32)
+        deltas, counts = np.split(table, 2)
+        return np.cumsum(deltas, dtype=np.uint32), counts
+
+    def abundance(self, species):
+        """
+        Get the number of living Cells of some species in every generation.
+        :param species: The indices of the species
+        :type species: list(int)
+        :return: One row per generation, one column per species
+        :rtype: numpy.ndarray
+        """
+        species = np.asarray(species)
+        table = np.zeros((len(self), len(species)), np.int64)
+        for generation in range(len(self)):
+            indices, counts = self.get(generation)
+            if len(indices) == 0:
+                continue
+            found = np.minimum(np.searchsorted(indices, species), len(indices) - 1)
+            present = indices[found] == species
+            table[generation, present] = counts[found[present]]
+        return table
+
+    def top(self, generation, n):
+        """
+        :return: The indices and counts of the 'n' most abundant species
+                 of a generation, most abundant first
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        indices, counts = self.get(generation)
+        order = np.argsort(-counts.astype(np.int64), kind='mergesort')[:n]
+        return indices[order], counts[order]
+
+
+def get_arguments():
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+
+    parser.add_argument('run', type=str, help="the directory of a run")
+    parser.add_argument('-g', '--generation', type=int, default=-1)
+    parser.add_argument('-n', '--top', type=int, default=10)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    from os import path
+
+    args = get_arguments()
+    reader = CensusReader(path.join(args.run, 'census.bin'))
+    generation = args.generation % len(reader)
+    indices, counts = reader.top(generation, args.top)
+    print("generation {}: {} species".format(generation, len(reader.get(generation)[0])))
+    for i, count in zip(indices.tolist(), counts.tolist()):
+        print("{:6d} | {} | {}".format(count, reader.hashes[i], reader.genes[i]))
@@ -0,0 +1,104 @@
+"""
+This module decides when a simulation has nothing left to show,
+so that a run can stop before its last generation.
+
+A run stops when any of the enabled criteria is met:
+    extinction: no Cell is alive;
+    a stationary window: over the last 'stationary_window'
+        generations, none of 'stationary_metrics' moved by more
+        than 'stationary_tolerance';
+    fixation: every living Cell has the same Gene.
+
+When a run stops early, simulation.run repeats its last state
+until 'generations', so that every run of a sweep has statistics
+of the same length.
+"""
+import params as p
+
+
+class StoppingCriteria():
+    """
+    Checks the stopping criteria of the parameters every generation.
+    """
+
+    def __init__(self, extinction, window, metrics, tolerance, fixation):
+        """
+        :param extinction: Whether to stop when no Cell is alive
+        :type extinction: boolean
+        :param window: The number of generations the metrics must be
+                       stationary for, 0 to never stop on them
+        :type window: int
+        :param metrics: The keys of the statistics which must be stationary
+        :type metrics: list(str)
+        :param tolerance: How far a metric may move within the window
+        :type tolerance: float
+        :param fixation: Whether to stop when all living Cells have the same Gene
+        :type fixation: boolean
+        """
+        self.extinction = extinction
+        self.window = window
+        self.metrics = metrics
+        self.tolerance = tolerance
+        self.fixation = fixation
+        """ list(dict(str, float)): The statistics of the last generations """
+        self._history = []
+
+    def is_enabled(self):
+        """
+        :return: Whether any criterion could stop a run
+        :rtype: boolean
+        """
+        return self.extinction or self.window > 0 or self.fixation
+
+    def __is_stationary(self):
+        if len(self._history) < self.window:
+            return False
+        for key in self.metrics:
+            values = [stat[key] for stat in self._history]
+            if all(v is None for v in values):
+                continue
+            if any(v is None for v in values):
+                return False
+            if max(values) - min(values) > self.tolerance:
+                return False
+        return True
+
+    def __is_fixed(self, surface):
+        hashes = set()
+        surface.my_map(lambda c: hashes.add(c.get_gene().get_hash()))
+        return len(hashes) == 1
+
+    def check(self, surface, stat):
+        """
+        Check the criteria after a generation.
+        :param surface: The Surface of the simulation
+        :type surface: Surface
+        :param stat: The statistics of the generation
+        :type stat: dict(str, float)
+        :return: The reason to stop, or None to go on
+        :rtype: str
+        """
+        if self.window > 0:
+            self._history.append(stat)
+            if len(self._history) > self.window:
+                self._history.pop(0)
+
+        if self.extinction and surface.population == 0:
+            return "extinction"
+        if self.window > 0 and self.__is_stationary():
+            return "stationary for {} generations".format(self.window)
+        if self.fixation and surface.population > 0 and self.__is_fixed(surface):
+            return "fixation"
+        return None
+
+
+def from_params():
+    """
+    :return: The stopping criteria of the current parameters
+    :rtype: StoppingCriteria
+    """
+    return StoppingCriteria(p.params['stop_on_extinction'],
+                            p.params['stationary_window'],
+                            p.params['stationary_metrics'],
+                            p.params['stationary_tolerance'],
+                            p.params['stop_on_fixation'])
@@ -0,0 +1,643 @@
+#!/usr/bin/env python3
+"""
+Simulate K independent replicas of a Surface of the same size
+together, in a single process.  Every piece of state is an array
+with a leading replica dimension, so the cost of the Python
+interpreter is shared by all replicas rather than paid by each.
+
+The replicas share all parameters except 'random_seed' and
+'loss_per_tick', so a seed by bleed sweep on one grid size
+can run as a handful of ensembles.  Every replica draws from
+generators of its own, seeded with its 'random_seed', so that a
+replica runs the same whichever replicas it is batched with.
+
+The ensemble follows the rules of Surface with these differences:
+    - A Cell remembers its neighbours by direction, not by identity.
+      A memory is forgotten when the neighbour in its direction
+      changes, so a Cell does not remember a neighbour which left
+      and came back.
+    - Movement and reproduction are synchronous: every Cell proposes
+      its move or birth against the same map, and a proposal is
+      accepted when it has the highest random priority of all
+      proposals sharing a spot or a parent.
+    - Surface never removes dead Cells from its '_all_cells', so the
+      number of Cells which may reproduce is a fraction of all Cells
+      ever born.  The ensemble uses the same count, but only living
+      Cells reproduce, which is also what happens on a Surface unless
+      that count exceeds the population.
+Only the default topology is supported: the Moore neighbourhood
+of radius 1.
+The ensemble matches Surface statistically rather than exactly.
+"""
+import math
+import random
+
+import numpy as np
+
+import auxiliaryGenetics as ag
+import params as p
+
+"""
+The 8 neighbours of a spot as (dx, dy) offsets, in the order of
+Surface.neighbour_offsets.  The first 4 are the forward directions,
+and direction 7 - d is the opposite of direction d.
+"""
+directions = [(-1, -1), ( 0, -1), ( 1, -1), (-1,  0),
+              ( 1,  0), (-1,  1), ( 0,  1), ( 1,  1)]
+
+""" The keys of the parameters which may differ between replicas """
+replica_keys = ['random_seed', 'loss_per_tick']
+
+
+class Ensemble():
+    """
+    K replicas of a toroidal Surface, stored as arrays of
+    shape (K, height, width).
+    """
+
+    def __init__(self, seeds, losses=None):
+        """
+        Create K fully populated replicas with the current parameters.
+        :param seeds: The random seed of every replica
+        :type seeds: list(int)
+        :param losses: The loss per tick of every replica, or None
+                       for the 'loss_per_tick' parameter
+        :type losses: list(float)
+        """
+        self.replicas = len(seeds)
+        self.width = p.params['surface']['width']
+        self.height = p.params['surface']['height']
+        if self.width < 3 or self.height < 3:
+            raise ValueError("an ensemble needs a surface of at least 3 by 3")
+        if p.params['topology'] != 'moore' or p.params['topology_radius'] != 1:
+            raise ValueError("an ensemble only supports the 'moore' topology of radius 1")
+        shape = (self.replicas, self.height, self.width)
+        size = self.replicas * self.height * self.width
+
+        """ list(RandomState): The source of randomness of every replica """
+        self.rngs = [np.random.RandomState(seed) for seed in seeds]
+        # Mutation is done by auxiliaryGenetics, which uses 'random'
+        """ list(tuple): The state of 'random' of every replica, see __make_codes """
+        self.random_states = [random.Random(int(rng.randint(2 ** 31))).getstate()
+                              for rng in self.rngs]
+        """ numpy.ndarray: The replica of every spot """
+        self.replica = np.indices(shape)[0]
+
+        if losses is None:
+            losses = [p.params['loss_per_tick']] * self.replicas
+        """ numpy.ndarray: The loss per tick of every replica """
+        self.loss = np.array(losses, np.float64).reshape(self.replicas, 1, 1)
+
+        sm = p.params['score_matrix']
+        """ numpy.ndarray: The score of my choice against theirs, 0 being 'c' """
+        self.payoff = np.array([[sm['c']['c'], sm['c']['d']],
+                                [sm['d']['c'], sm['d']['d']]], np.float64)
+
+        self.population = np.full(self.replicas, self.width * self.height, np.int64)
+        self.total_alive = self.population.copy()
+        self.total_dead = np.zeros(self.replicas, np.int64)
+
+        """ numpy.ndarray: Whether a spot holds a Cell """
+        self.occupied = np.ones(shape, bool)
+        """ numpy.ndarray: The unique ID of the Cell in a spot, or -1 """
+        self.ids = np.arange(size, dtype=np.int64).reshape(shape)
+        self.next_id = size
+        self.score = np.full(shape, float(p.params['initial_score']))
+        self.age = np.zeros(shape, np.int64)
+
+        """ numpy.ndarray: The length of the code of a Cell's gene """
+        self.length = np.zeros(shape, np.int64)
+        """ numpy.ndarray: The memory size of a Cell's gene """
+        self.mem_size = np.zeros(shape, np.int64)
+        """ numpy.ndarray: The codes of the Cells' genes, 1 being 'd', padded with 0 """
+        self.genes = np.zeros(shape + (2 ** p.params['default_memory_size'],), np.uint8)
+
+        """ numpy.ndarray: Remembered choices of the neighbour in each direction, newest last """
+        self.mem_bits = np.zeros((8,) + shape, np.int64)
+        """ numpy.ndarray: The number of remembered choices in each direction """
+        self.mem_count = np.zeros((8,) + shape, np.int64)
+        """ numpy.ndarray: The ID of the neighbour each memory is about """
+        self.mem_id = np.full((8,) + shape, -1, np.int64)
+
+        codes = self.__make_codes(self.replica.ravel(), lambda i: self.__new_code())
+        self.__set_genes(np.arange(size), codes)
+
+    def __new_code(self):
+        """
+        :return: The code of the gene of a Cell without parents
+        :rtype: list(char)
+        """
+        code = ag.produce_random_gene(p.params['default_memory_size'])
+        ag.mutate(code)
+        ag.prune(code)
+        return code
+
+    def __make_codes(self, replicas, make):
+        """
+        Make codes with auxiliaryGenetics, which draws from 'random':
+        the codes of every replica are made in turn, with 'random' in
+        the state of that replica, so that they only depend on its
+        own seed.  The state of 'random' is restored afterwards.
+        :param replicas: The replica of every code
+        :type replicas: numpy.ndarray
+        :param make: Makes the i-th code
+        :type make: function(int) -> list(char)
+        :return: The codes, in the order of 'replicas'
+        :rtype: list(list(char))
+        """
+        saved = random.getstate()
+        codes = [None] * len(replicas)
+        for k in range(self.replicas):
+            random.setstate(self.random_states[k])
+            for i in np.flatnonzero(replicas == k):
+                codes[i] = make(i)
+            self.random_states[k] = random.getstate()
+        random.setstate(saved)
+        return codes
+
+    def __random_sample(self, replicas):
+        """
+        Draw a random number in [0, 1) for every element of
+        'replicas', from the generator of the replica it holds.
+        :param replicas: The replica of every draw
+        :type replicas: numpy.ndarray
+        :rtype: numpy.ndarray
+        """
+        sample = np.empty(replicas.shape)
+        for k, rng in enumerate(self.rngs):
+            mine = replicas == k
+            sample[mine] = rng.random_sample(np.count_nonzero(mine))
+        return sample
+
+    def __flat(self, array):
+        """
+        :return: A view of 'array' with the replica and spot dimensions flattened
+        :rtype: numpy.ndarray
+        """
+        return array.reshape((-1,) + array.shape[3:])
+
+    def __shift(self, array, direction):
+        """
+        Get, for every spot, the value of 'array' at its
+        neighbour in the direction 'direction'.
+        :param array: An array of shape (K, height, width)
+        :type array: numpy.ndarray
+        :param direction: An index into 'directions'
+        :type direction: int
+        :rtype: numpy.ndarray
+        """
+        dx, dy = directions[direction]
+        return np.roll(np.roll(array, -dy, axis=1), -dx, axis=2)
+
+    def __unshift(self, array, direction):
+        """
+        The inverse of __shift: move the values computed at every
+        spot's neighbour in 'direction' back to that neighbour.
+        """
+        dx, dy = directions[direction]
+        return np.roll(np.roll(array, dy, axis=1), dx, axis=2)
+
+    def __set_genes(self, spots, codes):
+        """
+        Write gene codes into spots, growing the gene array if needed.
+        :param spots: Flat indices of spots
+        :type spots: numpy.ndarray
+        :param codes: One code per spot, as produced by auxiliaryGenetics
+        :type codes: list(list(char))
+        """
+        longest = max(len(code) for code in codes)
+        if longest > self.genes.shape[3]:
+            grown = np.zeros(self.genes.shape[:3] + (longest,), np.uint8)
+            grown[..., :self.genes.shape[3]] = self.genes
+            self.genes = grown
+        genes = self.__flat(self.genes)
+        length = self.__flat(self.length)
+        mem_size = self.__flat(self.mem_size)
+        for spot, code in zip(spots, codes):
+            genes[spot] = 0
+            genes[spot, 1:len(code)] = [x == 'd' for x in code[1:]]
+            length[spot] = len(code)
+            mem_size[spot] = int(math.log(len(code), 2))
+
+    def __get_code(self, spot):
+        """
+        :param spot: The flat index of a spot
+        :type spot: int
+        :return: The code of the gene of the Cell at 'spot'
+        :rtype: list(char)
+        """
+        bits = self.__flat(self.genes)[spot, 1:self.__flat(self.length)[spot]]
+        return [0] + ['d' if b else 'c' for b in bits]
+
+    def __decide(self, bits, count):
+        """
+        Get every Cell's decision given its memory of a neighbour,
+        walking its gene as Gene.get_decision does.
+        :param bits: Remembered choices, newest in the lowest bit
+        :type bits: numpy.ndarray
+        :param count: The number of remembered choices
+        :type count: numpy.ndarray
+        :return: The decisions, 1 being 'd'
+        :rtype: numpy.ndarray
+        """
+        offset = np.ones(bits.shape, np.int64)
+        stopped = np.zeros(bits.shape, bool)
+        for t in range(int(count.max())):
+            active = (t < count) & ~stopped
+            bit = (bits >> np.maximum(count - 1 - t, 0)) & 1
+            child = 2 * offset + bit
+            go = active & (child < self.length)
+            stopped |= active & ~go
+            offset = np.where(go, child, offset)
+        genes = self.__flat(self.genes)
+        return genes[np.arange(genes.shape[0]), offset.ravel()].reshape(bits.shape)
+
+    def __remember(self, direction, choice, mask):
+        """
+        Add the choices of the neighbours in 'direction' to the
+        memories of the Cells where 'mask' is set.
+        """
+        limit = (1 << self.mem_size) - 1
+        bits = ((self.mem_bits[direction] << 1) | choice) & limit
+        count = np.minimum(self.mem_count[direction] + 1, self.mem_size)
+        self.mem_bits[direction] = np.where(mask, bits, self.mem_bits[direction])
+        self.mem_count[direction] = np.where(mask, count, self.mem_count[direction])
+
+    def __forget(self, spots):
+        """
+        Clear all the memories of the Cells in the flat spots 'spots'.
+        """
+        for array, value in [(self.mem_bits, 0), (self.mem_count, 0), (self.mem_id, -1)]:
+            array.reshape(8, -1)[:, spots] = value
+
+    def __forget_strangers(self):
+        """
+        Clear the memories of directions whose neighbour has changed.
+        """
+        for d in range(8):
+            neighbour = self.__shift(self.ids, d)
+            stale = self.mem_id[d] != neighbour
+            self.mem_bits[d][stale] = 0
+            self.mem_count[d][stale] = 0
+            self.mem_id[d] = neighbour
+
+    def __play(self, d):
+        """
+        Let every Cell play once with its neighbour in the
+        forward direction 'd', updating both sides.
+        """
+        o = 7 - d
+        pair = self.occupied & self.__shift(self.occupied, d)
+        mine = self.__decide(self.mem_bits[d], self.mem_count[d])
+        theirs = self.__shift(self.__decide(self.mem_bits[o], self.mem_count[o]), d)
+
+        gain = np.where(pair, self.payoff[mine, theirs] - self.loss, 0)
+        their_gain = np.where(pair, self.payoff[theirs, mine] - self.loss, 0)
+        self.score += gain + self.__unshift(their_gain, d)
+
+        self.__remember(d, theirs, pair)
+        self.__remember(o, self.__unshift(mine, d), self.__unshift(pair, d))
+
+    def __interaction_tick(self):
+        """
+        Every neighbouring pair plays twice, as every Cell
+        of a Surface interacts with all its neighbours, or
+        once in the 'pairwise' interaction mode.
+        """
+        self.__forget_strangers()
+        for d in range(4):
+            self.__play(d)
+        if p.params['interaction_mode'] != 'pairwise':
+            for d in range(4):
+                self.__play(d)
+
+    def __remove(self, mask):
+        """
+        Clear the spots where 'mask' is set.
+        """
+        self.occupied[mask] = False
+        self.ids[mask] = -1
+        self.score[mask] = 0
+        self.age[mask] = 0
+        self.length[mask] = 0
+        self.mem_size[mask] = 0
+
+    def __death_tick(self):
+        dead = self.occupied & (self.score <= 0)
+        if p.params['ageing']:
+            dead |= self.occupied & (self.age > p.params['age_of_death'])
+        died = dead.reshape(self.replicas, -1).sum(axis=1)
+        self.population -= died
+        self.total_dead += died
+        self.__remove(dead)
+
+    def __ranks(self, key):
+        """
+        Rank the living Cells of every replica by 'key', ascending,
+        ties going to the earlier spot as with a stable sort of
+        Surface.get_all.  Empty spots rank last.
+        :rtype: numpy.ndarray
+        """
+        key = np.where(self.occupied, key, np.inf).reshape(self.replicas, -1)
+        order = np.argsort(key, axis=1, kind='mergesort')
+        ranks = np.argsort(order, axis=1, kind='mergesort')
+        return ranks.reshape(self.occupied.shape)
+
+    def __random_empty_neighbour(self, proposers):
+        """
+        Pick a random empty neighbouring spot for every proposer.
+        :param proposers: Where a Cell wants an empty neighbour
+        :type proposers: numpy.ndarray
+        :return: The flat index of the picked spot, or -1 if there is none
+        :rtype: numpy.ndarray
+        """
+        empty = np.array([~self.__shift(self.occupied, d) for d in range(8)])
+        count = empty.sum(axis=0)
+        proposers = proposers & (count > 0)
+        pick = np.floor(self.__random_sample(self.replica) * count).astype(np.int64)
+        # the direction of the pick-th empty neighbour
+        direction = np.argmax(np.cumsum(empty, axis=0) > pick, axis=0)
+
+        k, y, x = np.indices(count.shape)
+        dx = np.array([d[0] for d in directions])[direction]
+        dy = np.array([d[1] for d in directions])[direction]
+        target = (k * self.height + (y + dy) % self.height) * self.width \
+                 + (x + dx) % self.width
+        return np.where(proposers, target, -1)
+
+    def __accept(self, resources):
+        """
+        Resolve conflicts between proposals in one batch: a proposal
+        is accepted when its random priority is the highest among all
+        proposals which share any of its resources.
+        :param resources: For every proposal, the flat spots it needs
+        :type resources: list(numpy.ndarray)
+        :return: Whether every proposal is accepted
+        :rtype: numpy.ndarray
+        """
+        priority = self.__random_sample(resources[0] // (self.height * self.width))
+        best = np.full(self.occupied.size, -1.0)
+        for r in resources:
+            np.maximum.at(best, r, priority)
+        accepted = np.ones(priority.shape, bool)
+        for r in resources:
+            accepted &= best[r] == priority
+        return accepted
+
+    def __move(self, sources, targets):
+        """
+        Move Cells from their flat spots 'sources' to 'targets'.
+        Moved Cells forget all their neighbours.
+        """
+        for name in ['occupied', 'ids', 'score', 'age', 'length', 'mem_size', 'genes']:
+            array = self.__flat(getattr(self, name))
+            array[targets] = array[sources]
+        self.__forget(targets)
+        moved = np.zeros(self.occupied.size, bool)
+        moved[sources] = True
+        self.__remove(moved.reshape(self.occupied.shape))
+
+    def __movement_tick(self):
+        """
+        The poorest performing 'move_ratio' of every replica may
+        move, each with the chance 'move_chance'.
+        """
+        ranks = self.__ranks(self.score)
+        bottom = np.round(self.population * p.params['move_ratio']).astype(np.int64)
+        movers = self.occupied & (ranks < bottom[:, None, None])
+        movers &= self.__random_sample(self.replica) <= p.params['move_chance']
+
+        targets = self.__random_empty_neighbour(movers).ravel()
+        sources = np.flatnonzero(targets >= 0)
+        targets = targets[sources]
+        if len(sources) == 0:
+            return
+        accepted = self.__accept([targets])
+        self.__move(sources[accepted], targets[accepted])
+
+    def __reproduction_tick(self):
+        """
+        The best performing Cells of every replica, as many as
+        'reproduction_ratio' of all Cells ever born, may each produce
+        a child in an empty neighbouring spot with the worst scoring
+        Cell of its neighbourhood, itself included, as Surface does.
+        """
+        ranks = self.__ranks(-self.score)
+        top = np.round(self.total_alive * p.params['reproduction_ratio']).astype(np.int64)
+        parents = self.occupied & (ranks < top[:, None, None])
+
+        targets = self.__random_empty_neighbour(parents).ravel()
+        sources = np.flatnonzero(targets >= 0)
+        targets = targets[sources]
+        if len(sources) == 0:
+            return
+
+        # find the worst scoring Cell around every parent, itself included
+        scores = [np.where(self.__shift(self.occupied, d), self.__shift(self.score, d), np.inf)
+                  for d in range(4)] \
+               + [self.score] \
+               + [np.where(self.__shift(self.occupied, d), self.__shift(self.score, d), np.inf)
+                  for d in range(4, 8)]
+        worst = np.argmin(np.array(scores), axis=0).ravel()[sources]
+        offsets = [(dx, dy) for dx, dy in directions[:4]] + [(0, 0)] + directions[4:]
+        k, rest = np.divmod(sources, self.height * self.width)
+        y, x = np.divmod(rest, self.width)
+        dx = np.array([o[0] for o in offsets])[worst]
+        dy = np.array([o[1] for o in offsets])[worst]
+        partners = (k * self.height + (y + dy) % self.height) * self.width \
+                   + (x + dx) % self.width
+
+        accepted = self.__accept([sources, partners, targets])
+        sources = sources[accepted]
+        partners = partners[accepted]
+        targets = targets[accepted]
+
+        codes = self.__make_codes(sources // (self.height * self.width),
+                                  lambda i: self.__child_code(sources[i], partners[i]))
+        self.__flat(self.occupied)[targets] = True
+        self.__flat(self.score)[targets] = p.params['initial_score']
+        self.__flat(self.age)[targets] = 0
+        self.__flat(self.ids)[targets] = np.arange(self.next_id, self.next_id + len(targets))
+        self.next_id += len(targets)
+        self.__forget(targets)
+        self.__set_genes(targets, codes)
+
+        born = np.bincount(targets // (self.height * self.width), minlength=self.replicas)
+        self.population += born
+        self.total_alive += born
+
+    def __child_code(self, a, b):
+        """
+        :param a: The flat spot of a parent
+        :type a: int
+        :param b: The flat spot of the other parent
+        :type b: int
+        :return: The code of the gene of their child
+        :rtype: list(char)
+        """
+        code = ag.recombine_codes(self.__get_code(a), self.__get_code(b))
+        ag.mutate(code)
+        ag.prune(code)
+        return code
+
+    def tick(self, inters):
+        """
+        Run a tick on every replica, as Surface.tick does.
+        :param inters: the number of interactions per tick
+        :type inters: int
+        """
+        self.score[self.occupied] = p.params['initial_score']
+        if p.params['ageing']:
+            self.age[self.occupied] += 1
+        for x in range(inters):
+            self.__interaction_tick()
+            self.__death_tick()
+            self.__movement_tick()
+        self.__reproduction_tick()
+
+    def get_rule_masks(self):
+        """
+        Classify the rule of every Cell like the Cell.is_* methods.
+        :return: A mask of the Cells of every rule, by name.
+        :rtype: dict(str, numpy.ndarray)
+        """
+        g = self.genes
+        n = g.shape[3]
+        x = np.arange(n)
+        inside = x < self.length[..., None]
+        choices = inside & (x >= 1)
+        alternate = (x % 2 == 1)[None, None, None, :]
+        t2t_pattern = ((x - 3) % 4 == 0)[None, None, None, :]
+
+        tail_alternates = np.all((g == alternate) | ~inside | (x < 2), axis=3)
+        masks = dict()
+        masks['tft'] = (g[..., 1] == 0) & (self.length >= 4) & tail_alternates
+        masks['ftf'] = (g[..., 1] == 1) & (self.length >= 4) & tail_alternates
+        masks['t2t'] = (g[..., 1] == 0) & (self.length >= 8) \
+                       & (g[..., 2] == 0) & (g[..., 3] == 0) \
+                       & np.all((g == t2t_pattern) | ~inside | (x < 4), axis=3)
+        masks['alld'] = np.all((g == 1) | ~choices, axis=3)
+        masks['allc'] = np.all((g == 0) | ~choices, axis=3)
+        for rule in masks:
+            masks[rule] &= self.occupied
+        return masks
+
+    def get_stats(self):
+        """
+        Collect the statistics of my_stats.get_stats for every replica.
+        :return: The statistics of every replica
+        :rtype: list(dict(str, float))
+        """
+        masks = self.get_rule_masks()
+        choices = np.maximum(self.length - 1, 1)
+        defect = self.genes[..., 1:].sum(axis=3) / choices
+        all_stats = []
+        for k in range(self.replicas):
+            live = self.occupied[k]
+            pop = int(live.sum())
+            stats = dict()
+            if pop == 0:
+                stats['init_move_frac'] = None
+                stats['def_frac_mean'] = 0
+                stats['def_frac_stddev'] = 0
+                for key in ['length', 'scores', 'age']:
+                    stats[key + '_mean'] = None
+                    stats[key + '_stddev'] = None
+                for rule in ['tfts', 't2ts', 'ftfs', 'alld', 'allc']:
+                    stats['rule_frac_' + rule] = 0
+                all_stats.append(stats)
+                continue
+
+            stats['init_move_frac'] = float(self.genes[k][..., 1][live].mean()) * 100.0
+            stats['def_frac_mean'] = float(defect[k][live].mean()) * 100.0
+            stats['def_frac_stddev'] = float(defect[k][live].std()) * 100.0
+            for key, values in [('length', self.length[k] - 1),
+                                ('scores', self.score[k]),
+                                ('age', self.age[k])]:
+                stats[key + '_mean'] = float(values[live].mean())
+                stats[key + '_stddev'] = float(values[live].std())
+            # a rule is counted once, in the order of my_stats.get_rule_stats
+            counted = np.zeros(live.shape, bool)
+            for rule, key in [('tft', 'tfts'), ('t2t', 't2ts'), ('ftf', 'ftfs'),
+                              ('alld', 'alld'), ('allc', 'allc')]:
+                mask = masks[rule][k] & ~counted
+                counted |= mask
+                stats['rule_frac_' + key] = float(mask.sum()) / pop * 100.0
+            all_stats.append(stats)
+        return all_stats
+
+
+def load_replicas(params_files):
+    """
+    Initialize the parameters from a list of parameter files
+    which differ only in the keys of 'replica_keys'.
+    :param params_files: The parameter files of the replicas
+    :type params_files: list(str)
+    :return: The values of 'replica_keys' of every replica, by key
+    :rtype: dict(str, list)
+    """
+    resolved = [p.resolve(f) for f in params_files]
+    shared = [{ k: v for k, v in r.items() if k not in replica_keys } for r in resolved]
+    for f, r in zip(params_files, shared):
+        if r != shared[0]:
+            raise ValueError("{} differs from {} in more than {}".format(
+                f, params_files[0], ", ".join(replica_keys)))
+    p.init(params_files[0])
+    return { k: [r[k] for r in resolved] for k in replica_keys }
+
+
+def run(seeds, losses=None, verbose=True):
+    """
+    Run an ensemble with the current parameters.
+    :param seeds: The random seed of every replica
+    :type seeds: list(int)
+    :param losses: The loss per tick of every replica, or None
+    :type losses: list(float)
+    :param verbose: Whether to print the progress of every generation
+    :type verbose: boolean
+    :return: The statistics of every generation, for every replica
+    :rtype: list(list(dict(str, float)))
+    """
+    gens = p.params['generations']
+    interactions = p.params['interactions']
+
+    ensemble = Ensemble(seeds, losses)
+    sim_stats = [[stats] for stats in ensemble.get_stats()]
+
+    for i in range(gens):
+        ensemble.tick(interactions)
+        for k, stats in enumerate(ensemble.get_stats()):
+            sim_stats[k].append(stats)
+        if verbose:
+            print(" | generation: " + str(i)
+                  + " | population: " + " ".join(str(x) for x in ensemble.population))
+
+    return sim_stats
+
+
+def get_arguments():
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+
+    parser.add_argument('-o', '--out', type=str, default='.')
+
+    parser.add_argument('params', nargs='+')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    import json
+    import os
+    from os import path
+
+    args = get_arguments()
+
+    replicas = load_replicas(args.params)
+    sim_stats = run(replicas['random_seed'], replicas['loss_per_tick'])
+
+    for f, stats in zip(args.params, sim_stats):
+        out_dir = path.join(args.out, path.splitext(path.basename(f))[0])
+        os.makedirs(out_dir, exist_ok=True)
+        with open(path.join(out_dir, 'data.json'), 'w+') as out:
+            json.dump(stats, out, indent=4)
@@ -0,0 +1,251 @@
+"""
+This module accounts for the memory a simulation takes, and
+keeps it within a budget, so that a long run on a large Surface
+stops cleanly rather than making the machine swap.
+
+With 'memory_accounting', the statistics of every generation get
+an estimate, in bytes, of what the objects of the simulation take:
+    bytes_cells: the Cells the Surface keeps, dead Cells included;
+    bytes_genes: the Genes of those Cells;
+    bytes_memories: the memories of those Cells;
+    bytes_stats: the statistics of the generations so far;
+    bytes_total: the sum of the above;
+and 'bytes_rss', the resident memory of the process, where known.
+
+Without 'gc_automatic', the cyclic garbage collector does not run
+during ticks, where it would walk every Cell and memory again and
+again as they are allocated.  The objects of the initial Surface
+are frozen out of its passes (see gc.freeze), and it runs between
+generations every 'gc_interval' generations instead.  Reference
+counting still frees Cells, Genes and memories as soon as they are
+dropped, as they do not form cycles.
+
+With a 'memory_budget_mb', a generation whose 'bytes_total' is
+over the budget either compacts the Surface (see Surface.compact)
+or aborts the run, as 'memory_budget_action' says.  A compaction
+which does not bring the total back under the budget aborts the
+run too.  An aborted run saves a checkpoint of its state, which
+load_checkpoint reads back.
+
+The budget is on the estimate rather than on the resident memory,
+so that whether a run is compacted or aborted does not depend on
+the machine.
+"""
+import gc
+import os
+import pickle
+import random
+import sys
+
+import params as p
+
+
+def get_rss():
+    """
+    :return: The resident memory of this process in bytes, or None if unknown
+    :rtype: int
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def measure(surface, sim_stats):
+    """
+    Estimate the bytes the objects of a simulation take.
+    :param surface: The Surface of the simulation
+    :type surface: Surface
+    :param sim_stats: The statistics of the generations so far
+    :type sim_stats: list(dict(str, float))
+    :return: The estimates, by key
+    :rtype: dict(str, int)
+    """
+    cells = genes = memories = 0
+    for c in surface.get_all_cells():
+        cells += c.get_footprint()
+        genes += c.get_gene().get_footprint()
+        memories += c.get_memory_footprint()
+    stats = sys.getsizeof(sim_stats) + sum(
+            sys.getsizeof(stat) + sum(sys.getsizeof(v) for v in stat.values())
+            for stat in sim_stats)
+
+    return {
+        'bytes_cells': cells,
+        'bytes_genes': genes,
+        'bytes_memories': memories,
+        'bytes_stats': stats,
+        'bytes_total': cells + genes + memories + stats,
+        'bytes_rss': get_rss(),
+    }
+
+
+def save_checkpoint(path, surface, sim_stats, generation):
+    """
+    Save the state of a simulation, with the parameters and
+    the state of the random generator.
+    :param path: The path of the checkpoint
+    :type path: str
+    :param surface: The Surface of the simulation
+    :type surface: Surface
+    :param sim_stats: The statistics of the generations so far
+    :type sim_stats: list(dict(str, float))
+    :param generation: The index of the last generation run
+    :type generation: int
+    """
+    # the lineage recorder holds an open file
+    lineage, surface.lineage = surface.lineage, None
+    try:
+        with open(path, 'wb') as out:
+            pickle.dump({ 'generation': generation,
+                          'params': p.params,
+                          'random_state': random.getstate(),
+                          'surface': surface,
+                          'sim_stats': sim_stats },
+                        out, pickle.HIGHEST_PROTOCOL)
+    finally:
+        surface.lineage = lineage
+
+
+def load_checkpoint(path):
+    """
+    Read a checkpoint, restoring the parameters and the state
+    of the random generator.
+    :param path: The path of the checkpoint
+    :type path: str
+    :return: The Surface, the statistics so far, and the index
+             of the last generation run
+    :rtype: tuple(Surface, list(dict(str, float)), int)
+    """
+    with open(path, 'rb') as f:
+        checkpoint = pickle.load(f)
+    p.params.clear()
+    p.params.update(checkpoint['params'])
+    random.setstate(checkpoint['random_state'])
+    return checkpoint['surface'], checkpoint['sim_stats'], checkpoint['generation']
+
+
+class MemoryGuard():
+    """
+    Accounts for the memory of a simulation every generation,
+    and keeps it within a budget.
+    """
+
+    def __init__(self, accounting, budget, action):
+        """
+        :param accounting: Whether to add the estimates to the statistics
+        :type accounting: boolean
+        :param budget: The most bytes the simulation may take, or None
+        :type budget: int
+        :param action: What to do over the budget, 'compact' or 'abort'
+        :type action: str
+        """
+        if action not in ('compact', 'abort'):
+            raise ValueError("unknown memory budget action '{}'".format(action))
+        self.accounting = accounting
+        self.budget = budget
+        self.action = action
+        """ int: The number of compactions so far """
+        self.compactions = 0
+
+    def is_enabled(self):
+        """
+        :return: Whether the memory is accounted for
+        :rtype: boolean
+        """
+        return self.accounting or self.budget is not None
+
+    def check(self, surface, sim_stats, stat):
+        """
+        Account for the memory after a generation, and compact
+        the Surface if the action is 'compact' and it is over budget.
+        :param surface: The Surface of the simulation
+        :type surface: Surface
+        :param sim_stats: The statistics of the generations before this one
+        :type sim_stats: list(dict(str, float))
+        :param stat: The statistics of the generation, which get the estimates
+        :type stat: dict(str, float)
+        :return: The reason to abort, or None to go on
+        :rtype: str
+        """
+        footprint = measure(surface, sim_stats)
+        if self.accounting:
+            stat.update(footprint)
+        if self.budget is None or footprint['bytes_total'] <= self.budget:
+            return None
+
+        if self.action == 'compact':
+            surface.compact()
+            self.compactions += 1
+            footprint = measure(surface, sim_stats)
+            if footprint['bytes_total'] <= self.budget:
+                return None
+        return "{} bytes over a budget of {} bytes".format(
+                footprint['bytes_total'], self.budget)
+
+
+class Collector():
+    """
+    Decides when the cyclic garbage collector runs during a simulation.
+    """
+
+    def __init__(self, automatic, interval):
+        """
+        :param automatic: Whether the collector runs on its own
+        :type automatic: boolean
+        :param interval: Otherwise, the number of generations between
+                         collections, or 0 for none
+        :type interval: int
+        """
+        self.automatic = automatic
+        self.interval = interval
+        """ boolean: Whether the collector was enabled before the simulation """
+        self._was_enabled = True
+
+    def start(self):
+        """
+        Take over the collector, once the initial Surface is made.
+        """
+        if not self.automatic:
+            self._was_enabled = gc.isenabled()
+            gc.collect()
+            gc.freeze()
+            gc.disable()
+
+    def collect(self, generation):
+        """
+        Collect garbage if it is due after a generation.
+        :param generation: The index of the generation
+        :type generation: int
+        """
+        if not self.automatic and self.interval > 0 and generation % self.interval == 0:
+            gc.collect()
+
+    def stop(self):
+        """
+        Give the collector back as it was.
+        """
+        if not self.automatic:
+            gc.unfreeze()
+            if self._was_enabled:
+                gc.enable()
+
+
+def collector_from_params():
+    """
+    :return: The garbage collector control of the current parameters
+    :rtype: Collector
+    """
+    return Collector(p.params['gc_automatic'], p.params['gc_interval'])
+
+
+def from_params():
+    """
+    :return: The memory guard of the current parameters
+    :rtype: MemoryGuard
+    """
+    budget = p.params['memory_budget_mb']
+    return MemoryGuard(p.params['memory_accounting'],
+                       None if budget is None else int(budget * 2 ** 20),
+                       p.params['memory_budget_action'])
@@ -0,0 +1,178 @@
+"""
+This module records a frame of the Surface every generation:
+the rule class of every spot (see Cell.rule_classes) and the
+score of every spot, so that spatial patterns of cooperation
+can be analysed without running the simulation again.
+
+Frames are written to 'frames.bin' after a small header.  Every
+frame is compressed with zlib; a key frame holds the full grids,
+and every other frame holds the XOR of its grids with those of the
+previous frame, which is mostly zeros.  The bytes of the scores
+are grouped by significance before compressing, which helps zlib
+with the floats.
+
+'frames.idx' holds one fixed-width entry per frame: where it is in
+'frames.bin', its size, and the frame its delta chain starts from.
+FrameReader memory-maps both files to read any generation by
+decoding at most 'keyframe_interval' frames.
+"""
+import struct
+import zlib
+
+import numpy as np
+
+""" The header of a frames file: magic, width, height """
+header_format = '<4sII'
+header_magic = b'IPDF'
+
+""" The layout of an entry of the index """
+index_dtype = np.dtype([
+    ('offset', '<u8'),
+    ('size', '<u4'),
+    ('key', '<u4'),
+])
+
+
+def _encode(classes, scores):
+    """
+    Pack the grids of a frame into bytes, with the bytes of
+    the scores grouped by significance.
+    :rtype: numpy.ndarray
+    """
+    shuffled = scores.astype('<f4').view(np.uint8).reshape(-1, 4).T
+    return np.concatenate([classes.ravel(), shuffled.ravel()])
+
+
+def _decode(raw, width, height):
+    """
+    The inverse of _encode.
+    :return: The rule class grid and the score grid
+    :rtype: tuple(numpy.ndarray, numpy.ndarray)
+    """
+    size = width * height
+    classes = raw[:size].reshape(height, width)
+    scores = raw[size:].reshape(4, -1).T.copy().view('<f4').reshape(height, width)
+    return classes, scores
+
+
+class FrameRecorder():
+    """
+    Appends a frame of the Surface to a frames file every generation.
+    """
+
+    def __init__(self, path, width, height, keyframe_interval=50):
+        """
+        :param path: The path of the frames file; the index is
+                     written to the same path with '.idx' instead of '.bin'
+        :type path: str
+        :param width: The width of the Surface
+        :type width: int
+        :param height: The height of the Surface
+        :type height: int
+        :param keyframe_interval: The number of frames between key frames
+        :type keyframe_interval: int
+        """
+        self.width = width
+        self.height = height
+        self._keyframe_interval = keyframe_interval
+        self._file = open(path, 'wb')
+        self._index = open(_index_path(path), 'wb')
+        self._file.write(struct.pack(header_format, header_magic, width, height))
+        """ int: The number of frames written so far """
+        self._count = 0
+        """ int: The frame the current delta chain starts from """
+        self._key = 0
+        """ numpy.ndarray: The bytes of the previous frame """
+        self._previous = None
+
+    def record(self, generation, surface, stats):
+        """
+        Append a frame of the Surface.
+        :param generation: The index of the generation
+        :type generation: int
+        :param surface: The Surface of the simulation
+        :type surface: Surface
+        :param stats: The statistics of the generation (unused)
+        :type stats: dict(str, float)
+        """
+        classes, scores = surface.get_state_grids()
+        raw = _encode(np.array(classes, np.uint8), np.array(scores, np.float32))
+
+        if self._count % self._keyframe_interval == 0:
+            self._key = self._count
+            data = zlib.compress(raw.tobytes())
+        else:
+            data = zlib.compress(np.bitwise_xor(raw, self._previous).tobytes())
+        self._previous = raw
+
+        entry = np.array([(self._file.tell(), len(data), self._key)], index_dtype)
+        self._file.write(data)
+        self._index.write(entry.tobytes())
+        self._count += 1
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+
+
+def _index_path(path):
+    """
+    :return: The path of the index of the frames file 'path'
+    :rtype: str
+    """
+    if path.endswith('.bin'):
+        return path[:-len('.bin')] + '.idx'
+    return path + '.idx'
+
+
+class FrameReader():
+    """
+    Random access to the frames of a frames file.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The path of a frames file written by FrameRecorder
+        :type path: str
+        """
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, self.width, self.height = struct.unpack_from(
+                header_format, self._data[:struct.calcsize(header_format)].tobytes())
+        if magic != header_magic:
+            raise ValueError("{} is not a frames file".format(path))
+        self._index = np.fromfile(_index_path(path), dtype=index_dtype)
+        """ tuple(int, numpy.ndarray): The last decoded frame, to read in sequence cheaply """
+        self._last = (None, None)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __read(self, frame):
+        """
+        :return: The decompressed bytes of a single frame
+        :rtype: numpy.ndarray
+        """
+        entry = self._index[frame]
+        start = int(entry['offset'])
+        data = self._data[start:start + int(entry['size'])].tobytes()
+        return np.frombuffer(zlib.decompress(data), np.uint8)
+
+    def get(self, generation):
+        """
+        Get the frame of a generation.
+        :param generation: The index of the generation
+        :type generation: int
+        :return: The rule class grid and the score grid
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        key = int(self._index[generation]['key'])
+        last, raw = self._last
+        if last is not None and key <= last <= generation:
+            start = last + 1
+        else:
+            raw = self.__read(key)
+            start = key + 1
+        for frame in range(start, generation + 1):
+            raw = np.bitwise_xor(raw, self.__read(frame))
+        self._last = (generation, raw)
+        return _decode(raw, self.width, self.height)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Compare the speed of World, VectorWorld and PackedWorld, and
+check that they all step the same map to the same map.
+"""
+import random
+import time
+
+import numpy as np
+
+from main import World
+from vector_world import VectorWorld, PackedWorld
+
+
+def get_cells(world):
+    if isinstance(world, World):
+        return np.array([[world.get(x, y) is not None for y in range(world.height)]
+                         for x in range(world.width)])
+    return world.get_cells()
+
+
+def time_steps(world, steps):
+    """
+    :return: The average number of seconds per step
+    :rtype: float
+    """
+    start = time.perf_counter()
+    for i in range(steps):
+        world.step()
+    return (time.perf_counter() - start) / steps
+
+
+def get_arguments():
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[64, 256, 1024])
+    parser.add_argument('-n', '--steps', type=int, default=20)
+    parser.add_argument('-l', '--list-limit', type=int, default=256,
+                        help="the largest size to run World on")
+    parser.add_argument('--seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+
+    for size in args.sizes:
+        random.seed(args.seed)
+        world = World(size, size)
+        cells = np.array([[world.get(x, y) is not None for y in range(size)]
+                          for x in range(size)])
+
+        worlds = [VectorWorld(size, size, cells)]
+        if size % 8 == 0:
+            worlds.append(PackedWorld(size, size, cells))
+        if size <= args.list_limit:
+            worlds.append(world)
+
+        times = [time_steps(w, args.steps) for w in worlds]
+        results = [get_cells(w) for w in worlds]
+        same = all(np.array_equal(results[0], r) for r in results[1:])
+
+        print("{0}x{0}, {1} steps: ".format(size, args.steps)
+              + " | ".join("{}: {:.3f} ms/step".format(type(w).__name__, 1000 * t)
+                           for w, t in zip(worlds, times))
+              + " | same: {}".format(same))
@@ -1,4 +1,4 @@
-import pyglet 
+import sys
 from random import randint
 
 creature_size = 5
@@ -6,13 +6,22 @@ creature_size = 5
 world_width = 100
 world_height = 100
 
-dot = pyglet.image.create(
-    width=5,
-    height=5,
-    pattern=pyglet.image.SolidColorImagePattern(
-        color=(255, 255, 255, 0)
-    )
-)
+dot = None
+
+def get_dot():
+    # pyglet is only needed to draw, so that the worlds can be
+    # benchmarked without a display
+    global dot
+    if dot is None:
+        import pyglet
+        dot = pyglet.image.create(
+            width=5,
+            height=5,
+            pattern=pyglet.image.SolidColorImagePattern(
+                color=(255, 255, 255, 0)
+            )
+        )
+    return dot
 
 class World:
     def __init__(self, width, height):
@@ -55,12 +64,20 @@ class World:
 
 
     def draw(self):
+        dot = get_dot()
         for x in range(self.width):
             for y in range(self.height):
                 if self.get(x, y) != None: 
                     dot.blit((x+1) * dot.width, (y+1) * dot.height)
 
 if __name__ == "__main__":
+    import pyglet
+    from vector_world import VectorWorld, PackedWorld
+
+    # python3 main.py [list|vector|packed]
+    engine = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    World = { 'list': World, 'vector': VectorWorld, 'packed': PackedWorld }[engine]
+
     window = pyglet.window.Window(
             width=((2 + world_width) * creature_size),
             height=((2 + world_height) * creature_size)
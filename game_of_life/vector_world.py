@@ -0,0 +1,176 @@
+"""
+Drop-in replacements for main.World which step the whole map
+at once with numpy.
+
+The map is a torus, so the neighbours of every cell are found by
+rolling the map by one in every direction and adding the rolled
+maps.  The IPD Surface is a torus too, and this is the template
+for computing its neighbourhoods with arrays.
+
+VectorWorld keeps one boolean per cell.  PackedWorld keeps eight
+cells per byte along y, and counts neighbours with bitwise adders
+on whole bytes, so it needs a height which is a multiple of 8.
+
+Both index the map as map[x][y], like World.get.
+"""
+from random import randint
+
+import numpy as np
+
+
+""" The offsets of the eight neighbours of a cell """
+neighbour_offsets = [(dx, dy)
+                     for dx in [-1, 0, 1]
+                     for dy in [-1, 0, 1]
+                     if (dx, dy) != (0, 0)]
+
+
+def random_map(width, height):
+    """
+    Create a random map the way World does, drawing from
+    the same random numbers in the same order.
+    :rtype: numpy.ndarray
+    """
+    return np.array([[randint(0, 8) == 0 for x in range(width)]
+                     for y in range(height)], bool)
+
+
+class VectorWorld:
+    def __init__(self, width, height, cells=None):
+        """
+        :param width: The width of the map
+        :type width: int
+        :param height: The height of the map
+        :type height: int
+        :param cells: The initial map, indexed [x, y], or None for a random map
+        :type cells: numpy.ndarray
+        """
+        self.width = width
+        self.height = height
+        self.cells = random_map(width, height) if cells is None \
+                     else np.array(cells, bool)
+        self._image = None
+
+    def spawn(self, chance):
+        return True if randint(0, chance) == 0 else None
+
+    def get(self, x, y):
+        return True if self.cells[x % self.width, y % self.height] else None
+
+    def get_value(self, x, y):
+        return 1 if self.get(x, y) else 0
+
+    def get_neighbour_counts(self):
+        """
+        :return: The number of live neighbours of every cell
+        :rtype: numpy.ndarray
+        """
+        counts = np.zeros(self.cells.shape, np.uint8)
+        for dx, dy in neighbour_offsets:
+            counts += np.roll(self.cells, (-dx, -dy), axis=(0, 1))
+        return counts
+
+    def get_neighbour_count(self, x, y):
+        return int(self.get_neighbour_counts()[x % self.width, y % self.height])
+
+    def step(self):
+        counts = self.get_neighbour_counts()
+        self.cells = (counts == 3) | ((counts == 2) & self.cells)
+
+    def get_cells(self):
+        """
+        :return: Whether every cell is alive, indexed [x, y]
+        :rtype: numpy.ndarray
+        """
+        return self.cells
+
+    def draw(self, creature_size=5):
+        """
+        Draw the map as a single image, with a border of one cell.
+        """
+        import pyglet
+        cells = self.get_cells()
+        # pyglet images are indexed [y, x] from the bottom row
+        pixels = np.zeros((self.height + 2, self.width + 2, 4), np.uint8)
+        pixels[1:-1, 1:-1][cells.T] = (255, 255, 255, 255)
+        self._image = pyglet.image.ImageData(
+                self.width + 2, self.height + 2, 'RGBA',
+                pixels.tobytes(), (self.width + 2) * 4)
+        self._image.get_texture().blit(
+                0, 0,
+                width=(self.width + 2) * creature_size,
+                height=(self.height + 2) * creature_size)
+
+
+def _shift_up(packed):
+    """
+    Move every bit of a map packed along y to the bit of y - 1, so
+    that the bit of y holds the cell at y + 1, wrapping around.
+    :rtype: numpy.ndarray
+    """
+    carry = np.roll(packed, -1, axis=1) >> 7
+    return (packed << 1) | carry
+
+
+def _shift_down(packed):
+    """
+    Move every bit of a map packed along y to the bit of y + 1, so
+    that the bit of y holds the cell at y - 1, wrapping around.
+    :rtype: numpy.ndarray
+    """
+    carry = np.roll(packed, 1, axis=1) << 7
+    return (packed >> 1) | carry
+
+
+class PackedWorld(VectorWorld):
+    def __init__(self, width, height, cells=None):
+        """
+        :param width: The width of the map
+        :type width: int
+        :param height: The height of the map, a multiple of 8
+        :type height: int
+        :param cells: The initial map, indexed [x, y], or None for a random map
+        :type cells: numpy.ndarray
+        """
+        if height % 8 != 0:
+            raise ValueError("the height of a PackedWorld must be a multiple of 8")
+        VectorWorld.__init__(self, width, height, cells)
+        """ numpy.ndarray: The map, 8 cells per byte along y """
+        self.packed = np.packbits(self.cells, axis=1)
+        self.cells = None
+
+    def get(self, x, y):
+        return True if self.get_cells()[x % self.width, y % self.height] else None
+
+    def get_neighbour_counts(self):
+        cells = self.get_cells()
+        counts = np.zeros(cells.shape, np.uint8)
+        for dx, dy in neighbour_offsets:
+            counts += np.roll(cells, (-dx, -dy), axis=(0, 1))
+        return counts
+
+    def step(self):
+        rows = [self.packed,
+                np.roll(self.packed, 1, axis=0),
+                np.roll(self.packed, -1, axis=0)]
+        neighbours = rows[1:] \
+                   + [_shift_up(r) for r in rows] \
+                   + [_shift_down(r) for r in rows]
+
+        # a three bit counter in bit planes; a count of 8 wraps to 0,
+        # which is as dead as 8
+        s0 = np.zeros_like(self.packed)
+        s1 = np.zeros_like(self.packed)
+        s2 = np.zeros_like(self.packed)
+        for n in neighbours:
+            c0 = s0 & n
+            s0 ^= n
+            c1 = s1 & c0
+            s1 ^= c0
+            s2 ^= c1
+
+        # alive with 3, or with 2 if already alive
+        self.packed = s1 & ~s2 & (s0 | self.packed)
+
+    def get_cells(self):
+        return np.unpackbits(self.packed, axis=1).astype(bool)
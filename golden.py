@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Check that the simulation still follows its golden trajectories.
+
+For the 'tiny' and 'small' presets of params/old, a golden file
+in golden/ holds a digest of every generation of a short run:
+    occupancy: a hash of which spots hold a Cell;
+    genes: a hash of the multiset of the Gene hashes of all Cells;
+    scores: a hash of the score of every Cell, spot by spot;
+and the population and statistics of the generation.
+
+    python3 golden.py record     write the golden files with the current code
+    python3 golden.py check      compare Surface with the golden files, exactly
+    python3 golden.py ensemble   compare the batched ensemble with the golden
+                                 files, statistically
+
+    python3 golden.py invariants check properties of the code which need
+                                 no golden file, such as round trips
+
+Any change which should not change the dynamics, such as an
+optimization of Surface, Cell or Gene, must pass 'check'.  An
+engine with different semantics, such as ensemble.py, cannot match
+digest for digest, so its statistics over the seeds of a preset are
+compared with those of the golden runs by a two-sample
+Kolmogorov-Smirnov test.
+"""
+import contextlib
+import copy
+import glob
+import hashlib
+import io
+import json
+import math
+import struct
+import sys
+from os import path
+
+import params as p
+
+""" The directory of the golden files """
+golden_dir = path.join(path.dirname(path.abspath(__file__)), 'golden')
+
+""" The parameter files of the golden runs """
+presets = sorted(glob.glob(path.join(path.dirname(path.abspath(__file__)),
+                                     'params', 'old', 'tiny_*.json'))) \
+        + sorted(glob.glob(path.join(path.dirname(path.abspath(__file__)),
+                                     'params', 'old', 'small_*.json')))
+
+""" The number of generations of the golden runs """
+generations = 30
+
+""" The statistics compared between engines, averaged over the last generations """
+compared_stats = ['population', 'def_frac_mean', 'scores_mean',
+                  'rule_frac_tfts', 'rule_frac_alld', 'rule_frac_allc']
+
+""" The default parameters, to start every run from """
+defaults = copy.deepcopy(p.params)
+
+
+def _hash(data):
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def digest(occupied, gene_hashes, scores):
+    """
+    Digest the state of a generation, independently of the engine.
+    :param occupied: Whether every spot holds a Cell, row by row
+    :type occupied: list(list(boolean))
+    :param gene_hashes: The Gene hash of every Cell, see Gene.get_hash
+    :type gene_hashes: list(int)
+    :param scores: The score of every Cell, spot by spot, row by row
+    :type scores: list(float)
+    :return: The digests of the occupancy, the Genes and the scores
+    :rtype: dict(str, str)
+    """
+    return {
+        'occupancy': _hash(bytes(bool(x) for row in occupied for x in row)),
+        'genes': _hash(struct.pack('<{}Q'.format(len(gene_hashes)), *sorted(gene_hashes))),
+        'scores': _hash(struct.pack('<{}d'.format(len(scores)), *scores)),
+    }
+
+
+class DigestRecorder():
+    """
+    Records the digests and statistics of every generation of a Surface.
+    """
+
+    def __init__(self):
+        """ list(dict): The digests of every generation """
+        self.generations = []
+
+    def record(self, generation, surface, stats):
+        cells = surface.get_all()
+        record = digest([[c is not None for c in row] for row in surface.map],
+                        [c.get_gene().get_hash() for c in cells],
+                        [float(c.get_score()) for c in cells])
+        record['population'] = surface.population
+        record['stats'] = stats
+        self.generations.append(record)
+
+
+def load(preset):
+    """
+    Initialize the parameters of a golden run, from the defaults.
+    """
+    p.params.clear()
+    p.params.update(copy.deepcopy(defaults))
+    p.params['generations'] = generations
+    with contextlib.redirect_stdout(io.StringIO()):
+        p.init(preset)
+
+
+def run_surface(preset):
+    """
+    :return: The digests of every generation of a golden run
+    :rtype: list(dict)
+    """
+    import simulation
+
+    load(preset)
+    recorder = DigestRecorder()
+    simulation.run([recorder], verbose=False)
+    return recorder.generations
+
+
+def get_golden_path(preset):
+    return path.join(golden_dir, path.basename(preset))
+
+
+def read_golden(preset):
+    with open(get_golden_path(preset)) as f:
+        return json.load(f)
+
+
+def record():
+    for preset in presets:
+        with open(get_golden_path(preset), 'w+') as out:
+            json.dump(run_surface(preset), out, indent=1)
+        print("recorded {}".format(path.basename(preset)))
+
+
+def check():
+    """
+    Compare Surface with every golden file, generation by generation.
+    :return: Whether all runs match
+    :rtype: boolean
+    """
+    passed = True
+    for preset in presets:
+        golden = read_golden(preset)
+        # JSON turns tuples into lists, so compare through JSON
+        current = json.loads(json.dumps(run_surface(preset)))
+        mismatch = None
+        for g, (a, b) in enumerate(zip(golden, current)):
+            different = [k for k in a if a[k] != b.get(k)]
+            if different:
+                mismatch = "generation {}: {}".format(g, ", ".join(different))
+                break
+        if mismatch is None and len(golden) != len(current):
+            mismatch = "{} generations instead of {}".format(len(current), len(golden))
+        print("{}: {}".format(path.basename(preset), mismatch or "ok"))
+        passed = passed and mismatch is None
+    return passed
+
+
+def tail_mean(run, key, tail=10):
+    """
+    Average a statistic over the last 'tail' generations of a run,
+    counting a missing statistic as 0.
+    :rtype: float
+    """
+    values = []
+    for generation in run[-tail:]:
+        value = generation['population'] if key == 'population' \
+                else generation['stats'][key]
+        values.append(0.0 if value is None else float(value))
+    return sum(values) / len(values)
+
+
+def ks_test(a, b):
+    """
+    The two-sample Kolmogorov-Smirnov test.
+    :param a: A sample
+    :type a: list(float)
+    :param b: Another sample
+    :type b: list(float)
+    :return: The statistic, and its asymptotic p-value
+    :rtype: tuple(float, float)
+    """
+    a, b = sorted(a), sorted(b)
+    d = 0.0
+    for x in a + b:
+        fa = sum(1 for v in a if v <= x) / len(a)
+        fb = sum(1 for v in b if v <= x) / len(b)
+        d = max(d, abs(fa - fb))
+    en = math.sqrt(len(a) * len(b) / (len(a) + len(b)))
+    lam = (en + 0.12 + 0.11 / en) * d
+    if lam == 0:
+        return d, 1.0
+    pvalue = 2 * sum((-1) ** (k - 1) * math.exp(-2 * k * k * lam * lam)
+                     for k in range(1, 101))
+    return d, min(1.0, max(0.0, pvalue))
+
+
+def compare_ensemble(alpha=0.01):
+    """
+    Run every size of preset as an ensemble of its seeds, and compare
+    the statistics of the ensemble with those of the golden runs.
+    :param alpha: The p-value under which a statistic differs
+    :type alpha: float
+    :return: Whether no statistic differs
+    :rtype: boolean
+    """
+    import ensemble
+
+    sizes = dict()
+    for preset in presets:
+        size = path.basename(preset).rsplit('_', 1)[0]
+        sizes.setdefault(size, []).append(preset)
+
+    passed = True
+    for size, files in sorted(sizes.items()):
+        golden = [read_golden(f) for f in files]
+        load(files[0])
+        seeds = [p.resolve(f)['random_seed'] for f in files]
+        batch = ensemble.Ensemble(seeds)
+        runs = [[] for f in files]
+        for g in range(generations + 1):
+            if g > 0:
+                batch.tick(p.params['interactions'])
+            for k, stats in enumerate(batch.get_stats()):
+                runs[k].append({ 'population': int(batch.population[k]), 'stats': stats })
+
+        for key in compared_stats:
+            d, pvalue = ks_test([tail_mean(r, key) for r in golden],
+                                [tail_mean(r, key) for r in runs])
+            verdict = "ok" if pvalue >= alpha else "DIFFERS"
+            print("{} | {}: D = {:.3f}, p = {:.3f} {}".format(size, key, d, pvalue, verdict))
+            passed = passed and pvalue >= alpha
+    return passed
+
+
+def check_packing():
+    """
+    Pack and unpack the genes of migrants (see islands.pack_genes):
+    the nodes of codes around the longest a 2 byte length could
+    hold, and sparse nodes as deep as a memory of 62.
+    :return: Whether every gene comes back as it was
+    :rtype: boolean
+    """
+    import random
+    import auxiliaryGenetics as ag
+    import islands
+
+    rng = random.Random(0)
+    genes = [ag.nodes_from_code([0] + [rng.choice('cd') for x in range(length)])
+             for length in [1, 7, 8, 65535, 65536, 65537, 2 ** 17]]
+    for depth in [8, 16, 17, 32, 62]:
+        nodes = { x: rng.choice('cd') for x in rng.sample(range(2, 2 ** depth), 20) }
+        nodes[1] = rng.choice('cd')
+        nodes[2 ** depth - 1] = rng.choice('cd')
+        genes.append(nodes)
+    return islands.unpack_genes(islands.pack_genes(genes)) == genes
+
+
+def check_sparse_genes():
+    """
+    Classify the strategies, flipped at a random position, and random
+    codes, both as Genes and as SparseGenes with the fewest nodes
+    which make the same decisions, for memory sizes 1 to 6.
+    :return: Whether every SparseGene makes the same decisions and
+             gets the same classes as the Gene of its code
+    :rtype: boolean
+    """
+    import random
+    import auxiliaryGenetics as ag
+    from Gene import Gene
+    from SparseGene import SparseGene
+
+    rules = [
+        lambda x: 'c' if x == 1 or x % 2 == 0 else 'd',
+        lambda x: 'd' if x == 1 else ('c' if x % 2 == 0 else 'd'),
+        lambda x: 'd' if x >= 4 and x % 4 == 3 else 'c',
+        lambda x: 'c',
+        lambda x: 'd',
+        lambda x: random.choice('cd'),
+    ]
+    classes = ['is_tft', 'is_ftf', 'is_t2t', 'is_alld', 'is_allc']
+    random.seed(0)
+    for size_mem in range(1, 7):
+        for rule in rules:
+            for flip in [False, True]:
+                code = [0] + [rule(x) for x in range(1, 2 ** (size_mem + 1))]
+                if flip:
+                    x = random.randrange(1, len(code))
+                    code[x] = ag.get_other_choice(code[x])
+                dense = Gene(code=code)
+                sparse = SparseGene(code=code)
+                ag.canonicalize_nodes(sparse.get_nodes())
+                if ag.code_from_nodes(sparse.get_nodes()) != code:
+                    return False
+                if sparse.get_mem_size() != dense.get_mem_size():
+                    return False
+                for name in classes:
+                    if getattr(sparse, name)() != getattr(dense, name)():
+                        return False
+    return True
+
+
+def check_memory_drift():
+    """
+    Mutate lineages of SparseGene nodes, starting with the nodes
+    of a code of memory size 3, as auxiliaryGenetics.mutate_nodes
+    does at every birth.  Their memory sizes settle around 5, where
+    insertions down a path of undefined nodes took them past 10.
+    :return: Whether the mean memory size after 200 mutations is
+             at most 6
+    :rtype: boolean
+    """
+    import random
+    import auxiliaryGenetics as ag
+
+    random.seed(0)
+    lineages = 100
+    total = 0
+    for i in range(lineages):
+        nodes = ag.produce_random_nodes(3, 7)
+        for t in range(200):
+            ag.mutate_nodes(nodes)
+        total += ag.get_nodes_mem_size(nodes)
+    return float(total) / lineages <= 6
+
+
+def check_replicas():
+    """
+    Run a replica of an ensemble alone and batched with others, on
+    the first preset.
+    :return: Whether the replica runs the same either way
+    :rtype: boolean
+    """
+    import ensemble
+
+    load(presets[0])
+    runs = []
+    for seeds in [[7], [3, 7, 11]]:
+        batch = ensemble.Ensemble(seeds)
+        k = seeds.index(7)
+        run = [batch.get_stats()[k]]
+        for g in range(10):
+            batch.tick(p.params['interactions'])
+            run.append(batch.get_stats()[k])
+        runs.append(run)
+    return runs[0] == runs[1]
+
+
+""" The checks of 'invariants', by name """
+invariants = [
+    ('packing of migrants', check_packing),
+    ('classes of sparse genes', check_sparse_genes),
+    ('memory drift of sparse genes', check_memory_drift),
+    ('replicas of an ensemble', check_replicas),
+]
+
+
+def check_invariants():
+    """
+    :return: Whether every check of 'invariants' passes
+    :rtype: boolean
+    """
+    passed = True
+    for name, check in invariants:
+        ok = check()
+        print("{}: {}".format(name, "ok" if ok else "FAILED"))
+        passed = passed and ok
+    return passed
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+    if command == 'record':
+        record()
+    elif command == 'check':
+        sys.exit(0 if check() else 1)
+    elif command == 'ensemble':
+        sys.exit(0 if compare_ensemble() else 1)
+    elif command == 'invariants':
+        sys.exit(0 if check_invariants() else 1)
+    else:
+        print("usage: golden.py [record|check|ensemble|invariants]")
+        sys.exit(2)
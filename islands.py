@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Evolve many moderate Surfaces, the islands, side by side in worker
+processes, and let them exchange their best Cells every
+'migration_interval' generations.
+
+Every island is an ordinary simulation (see simulation.Simulation),
+run with the parameters of the run and a random seed of its own,
+'random_seed' plus its index, with the sampled statistics,
+convergence stops, memory budget and recorders they ask for, which
+write to the island's directory.  An island which stops early or
+goes over its budget takes no more migrants, but still sends its
+best Cells.  Only 'shared_state' is refused, as a viewer attaches
+to a single run.  Islands only meet at a migration, so the workers
+run on their own for a whole epoch between migrations and scale
+with the cores.
+
+At a migration, every island sends copies of its best Cells (see
+Surface.get_best_x) to the islands chosen by 'migration_topology':
+    'ring': every island sends its migrants to the next island;
+    'all': its migrants are dealt out to all the other islands;
+    'random': every island sends its migrants to another island
+              drawn at random.
+Migrants travel as the nodes of their genes only, one bit per
+choice (see pack_genes), so that a SparseGene travels as the
+nodes it defines rather than as the code with the same decisions,
+which doubles with every choice of memory.  They arrive with a new
+ID, the initial score and an age of 0, in empty spots first and
+then in the spots of the worst Cells of the island, which die.
+
+Every island gets a directory with a 'data.json', like the runs of
+run.sh, and the statistics of all islands are saved together in
+'stats.npz', like those of a sweep.
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import struct
+import time
+from multiprocessing import Pipe, Process
+from os import path
+
+import numpy as np
+
+import my_stats as s
+import params as p
+import sweep
+
+
+def pack_genes(genes):
+    """
+    Pack the nodes of genes into bytes: for every gene, its number
+    of nodes as 4 bytes, then 1 byte which is 1 if its nodes are the
+    positions of a code, 1 to their number, and otherwise 0 followed
+    by their positions as 8 bytes each, and then their choices as
+    bits, 'd' being 1.
+    :param genes: The nodes of the genes, see Gene.get_nodes
+    :type genes: list(dict(int, char))
+    :rtype: bytes
+    """
+    packed = [struct.pack('<I', len(genes))]
+    for nodes in genes:
+        positions = sorted(nodes)
+        is_code = positions[-1] == len(positions)
+        packed.append(struct.pack('<IB', len(positions), is_code))
+        if not is_code:
+            packed.append(np.array(positions, '<u8').tobytes())
+        bits = np.array([nodes[x] == 'd' for x in positions], np.uint8)
+        packed.append(np.packbits(bits).tobytes())
+    return b''.join(packed)
+
+
+def unpack_genes(data):
+    """
+    The inverse of pack_genes.
+    :type data: bytes
+    :return: The nodes of the genes
+    :rtype: list(dict(int, char))
+    """
+    count, = struct.unpack_from('<I', data)
+    offset = 4
+    genes = []
+    for i in range(count):
+        length, is_code = struct.unpack_from('<IB', data, offset)
+        offset += 5
+        if is_code:
+            positions = range(1, length + 1)
+        else:
+            positions = np.frombuffer(data, '<u8', length, offset).tolist()
+            offset += 8 * length
+        size = (length + 7) // 8
+        bits = np.unpackbits(np.frombuffer(data, np.uint8, size, offset))[:length]
+        offset += size
+        genes.append({ x: 'd' if b else 'c' for x, b in zip(positions, bits) })
+    return genes
+
+
+def get_destinations(topology, islands, rng):
+    """
+    Choose where the migrants of every island go.
+    :param topology: 'ring', 'all' or 'random'
+    :type topology: str
+    :param islands: The number of islands
+    :type islands: int
+    :param rng: The random generator of the migrations
+    :type rng: random.Random
+    :return: The islands the migrants of every island are dealt out to
+    :rtype: list(list(int))
+    """
+    if islands < 2:
+        return [[] for i in range(islands)]
+    if topology == 'ring':
+        return [[(i + 1) % islands] for i in range(islands)]
+    if topology == 'all':
+        return [[j for j in range(islands) if j != i] for i in range(islands)]
+    if topology == 'random':
+        return [[(i + rng.randrange(1, islands)) % islands] for i in range(islands)]
+    raise ValueError("unknown migration topology '{}'".format(topology))
+
+
+def migrate(emigrants, destinations):
+    """
+    Deal out the migrants of every island to their destinations.
+    :param emigrants: The nodes of the genes of the migrants of every island
+    :type emigrants: list(list(dict(int, char)))
+    :param destinations: See get_destinations
+    :type destinations: list(list(int))
+    :return: The nodes of the genes of the migrants arriving on every island
+    :rtype: list(list(dict(int, char)))
+    """
+    arriving = [[] for e in emigrants]
+    for genes, targets in zip(emigrants, destinations):
+        for k, nodes in enumerate(genes):
+            if targets:
+                arriving[targets[k % len(targets)]].append(nodes)
+    return arriving
+
+
+def immigrate(surface, genes):
+    """
+    Place migrants on a Surface, in empty spots first and then
+    in the spots of the worst Cells, which die.
+    :param surface: The Surface of an island
+    :type surface: Surface
+    :param genes: The nodes of the genes of the migrants
+    :type genes: list(dict(int, char))
+    """
+    from Cell import Cell
+    from Gene import make_gene
+    from Position import Position
+
+    empty = [Position(x, y)
+             for y in range(surface.height)
+             for x in range(surface.width)
+             if surface.map[y][x] is None]
+    random.shuffle(empty)
+    worst = sorted(surface.get_all(), key=lambda c: c.get_score())
+
+    for nodes in genes:
+        if empty:
+            position = empty.pop()
+        elif worst:
+            victim = worst.pop(0)
+            position = victim.get_position()
+            if p.params['memory_scope'] != 'all':
+                victim.forget_all()
+            if surface.census is not None:
+                surface.census.remove(victim)
+            surface.set(position, None)
+            surface.population -= 1
+            surface.total_dead += 1
+        else:
+            break
+        migrant = Cell(surface.ID, position, gene=make_gene(nodes=nodes))
+        surface.set(position, migrant)
+        if surface.lineage is not None:
+            surface.lineage.record_birth(surface.generation, migrant)
+        if surface.census is not None:
+            surface.census.add(migrant)
+        surface.ID += 1
+        surface.population += 1
+        surface.total_alive += 1
+
+
+def run_island(conn, params_file, index, out_dir):
+    """
+    Run an island in a worker process.  Every message from the
+    coordinator is the packed migrants arriving on the island, with
+    a number of generations to run, or None to stop; the worker
+    answers with the statistics of the generations it ran, its
+    packed emigrants and its population.
+    :param conn: The worker's end of a pipe to the coordinator
+    :type conn: multiprocessing.connection.Connection
+    :param params_file: The parameter file of the run, or None for the defaults
+    :type params_file: str
+    :param index: The index of the island
+    :type index: int
+    :param out_dir: The directory of the island's optional files
+    :type out_dir: str
+    """
+    import simulation
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        p.init(params_file)
+    p.params['random_seed'] += index
+    random.seed(p.params['random_seed'])
+    os.makedirs(out_dir, exist_ok=True)
+
+    island = simulation.Simulation(verbose=False, out_dir=out_dir)
+    try:
+        conn.send((list(island.sim_stats), None, island.surface.population))
+
+        while True:
+            generations, arriving = conn.recv()
+            if generations is None:
+                break
+            if not island.is_done():
+                immigrate(island.surface, unpack_genes(arriving))
+            ran = len(island.sim_stats)
+            for i in range(generations):
+                if not island.step():
+                    break
+            emigrants = [c.get_gene().get_nodes()
+                         for c in island.surface.get_best_x(p.params['migration_ratio'])]
+            conn.send((island.sim_stats[ran:], pack_genes(emigrants), island.surface.population))
+    finally:
+        island.close()
+    conn.close()
+
+
+def run_islands(params_file, out_root):
+    """
+    Run an island model with the parameters of a file.
+    :param params_file: The parameter file of the run, or None for the defaults
+    :type params_file: str
+    :param out_root: The directory which will hold the islands' directories
+    :type out_root: str
+    :return: The statistics of every generation of every island
+    :rtype: list(list(dict(str, float)))
+    """
+    resolved = p.resolve(params_file)
+    if resolved['shared_state'] is not None:
+        raise ValueError("islands cannot share their state with a viewer")
+    islands = resolved['islands']
+    generations = resolved['generations']
+    interval = resolved['migration_interval'] or generations
+    rng = random.Random(resolved['random_seed'])
+    os.makedirs(out_root, exist_ok=True)
+    names = ['island_{}'.format(i) for i in range(islands)]
+
+    conns = []
+    workers = []
+    for i in range(islands):
+        parent, child = Pipe()
+        worker = Process(target=run_island,
+                         args=(child, params_file, i, path.join(out_root, names[i])),
+                         daemon=True)
+        worker.start()
+        child.close()
+        conns.append(parent)
+        workers.append(worker)
+
+    try:
+        sim_stats = [conn.recv()[0] for conn in conns]
+        arriving = [pack_genes([])] * islands
+        done = 0
+        start = time.time()
+        while done < generations:
+            epoch = min(interval, generations - done)
+            for conn, data in zip(conns, arriving):
+                conn.send((epoch, data))
+            emigrants = []
+            populations = []
+            for i, conn in enumerate(conns):
+                stats, packed, population = conn.recv()
+                sim_stats[i] += stats
+                emigrants.append(unpack_genes(packed))
+                populations.append(population)
+            done += epoch
+            arriving = [pack_genes(genes) for genes in migrate(
+                    emigrants,
+                    get_destinations(resolved['migration_topology'], islands, rng))]
+            print("generation {} | {:.1f}s | populations: {} | migrants: {}".format(
+                    done, time.time() - start,
+                    " ".join(str(n) for n in populations),
+                    sum(len(e) for e in emigrants)))
+        for conn in conns:
+            conn.send((None, pack_genes([])))
+        for worker in workers:
+            worker.join()
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+
+    for name, stats in zip(names, sim_stats):
+        os.makedirs(path.join(out_root, name), exist_ok=True)
+        with open(path.join(out_root, name, 'data.json'), 'w+') as out:
+            json.dump(stats, out, indent=4)
+    np.savez(path.join(out_root, 'stats.npz'),
+             stat_keys=np.array(s.stat_keys),
+             **{ n: sweep.read_stats(path.join(out_root, n)) for n in names })
+    with open(path.join(out_root, 'islands.json'), 'w+') as out:
+        json.dump(resolved, out, indent=4, sort_keys=True)
+
+    return sim_stats
+
+
+def get_arguments():
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+
+    parser.add_argument('params_file', nargs='?', default=None)
+    parser.add_argument('-o', '--out', type=str, default=None)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    from time import strftime
+
+    args = get_arguments()
+    out_root = args.out or path.join('out', 'islands_' + strftime('%Y-%m-%d_%H.%M.%S'))
+    run_islands(args.params_file, out_root)
+    print("islands written to {}".format(out_root))
@@ -0,0 +1,171 @@
+"""
+This module records the genealogy of a simulation: for every
+Cell ever placed on the Surface, its ID, the IDs of its parents,
+the generation and position of its birth, and the hash of its Gene.
+
+Records have a fixed width and are appended to a binary file in
+bulk, so recording a birth is little more than appending a tuple
+to a list.  The file can be memory-mapped as a numpy array of
+'record_dtype', which makes it cheap to trace the ancestors or
+descendants of any Cell, even over millions of births.
+
+Cells of the initial population are recorded in generation 0,
+with parent IDs of -1.
+"""
+import numpy as np
+
+""" The layout of a single record """
+record_dtype = np.dtype([
+    ('child', '<i8'),
+    ('parent_a', '<i8'),
+    ('parent_b', '<i8'),
+    ('generation', '<i4'),
+    ('x', '<i4'),
+    ('y', '<i4'),
+    ('gene_hash', '<u8'),
+])
+
+
+class LineageRecorder():
+    """
+    Buffers birth records and appends them to a file.
+    """
+
+    def __init__(self, path, buffer_size=65536):
+        """
+        :param path: The path of the file to write
+        :type path: str
+        :param buffer_size: The number of records to buffer before writing
+        :type buffer_size: int
+        """
+        """ file: The file records are appended to """
+        self._file = open(path, 'wb')
+        """ list(tuple): The records which have not been written yet """
+        self._buffer = []
+        self._buffer_size = buffer_size
+
+    def record_birth(self, generation, child, parent_a=None, parent_b=None):
+        """
+        Record the birth of a Cell.
+        :param generation: The generation the Cell was born in
+        :type generation: int
+        :param child: The newborn Cell
+        :type child: Cell
+        :param parent_a: The first parent, or None for an initial Cell
+        :type parent_a: Cell
+        :param parent_b: The second parent, or None for an initial Cell
+        :type parent_b: Cell
+        """
+        position = child.get_position()
+        self._buffer.append((
+            child.get_id(),
+            -1 if parent_a is None else parent_a.get_id(),
+            -1 if parent_b is None else parent_b.get_id(),
+            generation,
+            position.x,
+            position.y,
+            child.get_gene().get_hash()))
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write all buffered records to the file.
+        """
+        if self._buffer:
+            np.array(self._buffer, dtype=record_dtype).tofile(self._file)
+            self._buffer = []
+        self._file.flush()
+
+    def close(self):
+        """
+        Write all buffered records and close the file.
+        """
+        self.flush()
+        self._file.close()
+
+
+def read_lineage(path):
+    """
+    Memory-map a lineage file.
+    :param path: The path of the lineage file
+    :type path: str
+    :return: The records of the file
+    :rtype: numpy.ndarray
+    """
+    return np.memmap(path, dtype=record_dtype, mode='r')
+
+
+def find(records, ids):
+    """
+    Find the records of Cells by ID.  Records are written in order
+    of birth, and IDs are given out in order of birth, so the
+    records are sorted by ID.
+    :param records: The records of a lineage file
+    :type records: numpy.ndarray
+    :param ids: The IDs of Cells
+    :type ids: numpy.ndarray
+    :return: The index of the record of every Cell
+    :rtype: numpy.ndarray
+    """
+    ids = np.asarray(ids)
+    index = np.searchsorted(records['child'], ids)
+    index = np.minimum(index, len(records) - 1)
+    if not np.all(records['child'][index] == ids):
+        raise KeyError("no record of some of the IDs")
+    return index
+
+
+def ancestry(records, cell_id, generations=None):
+    """
+    Reconstruct the ancestry tree of a Cell.
+    :param records: The records of a lineage file
+    :type records: numpy.ndarray
+    :param cell_id: The ID of the Cell
+    :type cell_id: int
+    :param generations: How many generations to go back, or None for all
+    :type generations: int
+    :return: The parents of the Cell and of all its ancestors, by ID
+    :rtype: dict(int, tuple(int, int))
+    """
+    tree = dict()
+    frontier = np.array([cell_id])
+    depth = 0
+    while len(frontier) > 0 and (generations is None or depth < generations):
+        found = records[find(records, frontier)]
+        for child, a, b in zip(found['child'], found['parent_a'], found['parent_b']):
+            tree[int(child)] = (int(a), int(b))
+        parents = np.concatenate([found['parent_a'], found['parent_b']])
+        parents = np.unique(parents[parents >= 0])
+        frontier = np.array([x for x in parents if int(x) not in tree], dtype=np.int64)
+        depth += 1
+    return tree
+
+
+def descendants(records, cell_ids):
+    """
+    Find every descendant of a group of Cells, such as all the
+    tit-for-tat Cells of a generation.
+    :param records: The records of a lineage file
+    :type records: numpy.ndarray
+    :param cell_ids: The IDs of the ancestors
+    :type cell_ids: list(int)
+    :return: Whether every record is of a descendant of the group
+    :rtype: numpy.ndarray
+    """
+    descends = np.zeros(len(records), bool)
+    descends[find(records, cell_ids)] = True
+    # parents are born before their children, at the latest
+    # earlier in the same generation
+    generation = records['generation']
+    for g in np.unique(generation):
+        born = np.flatnonzero(generation == g)
+        while True:
+            known = records['child'][descends]
+            found = descends[born] \
+                    | np.isin(records['parent_a'][born], known) \
+                    | np.isin(records['parent_b'][born], known)
+            if np.array_equal(found, descends[born]):
+                break
+            descends[born] = found
+    return descends
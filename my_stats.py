@@ -6,11 +6,27 @@ values is returned.
 This module also contains functionality for producing
 scatter plots with this data from module plotly.
 """
+import math
+
 import Surface
 import Cell as c
 import Gene as g
 import statistics as s
 
+"""
+The keys of the dictionary returned by get_stats, in a fixed
+order, for storing statistics in arrays rather than dictionaries.
+"""
+stat_keys = [
+    'init_move_frac',
+    'def_frac_mean', 'def_frac_stddev',
+    'length_mean', 'length_stddev',
+    'scores_mean', 'scores_stddev',
+    'rule_frac_tfts', 'rule_frac_t2ts', 'rule_frac_ftfs',
+    'rule_frac_alld', 'rule_frac_allc',
+    'age_mean', 'age_stddev',
+]
+
 def init_move_stats(surface, stats):
     """
     Create the keys 'init_move_frac' in the
@@ -78,7 +94,7 @@ def gene_length_stats(surface, stats):
 
     if 0 != surface.population:
         lengths = list()
-        surface.my_map(lambda c: lengths.append(len(c.get_gene().get_seq())-1))
+        surface.my_map(lambda c: lengths.append(c.get_gene().get_length()))
         mean = s.mean(lengths)
         stddev = s.pstdev(lengths, mean)
     else:
@@ -218,27 +234,140 @@ def get_stats(surface):
 
     return stats
     
-def output_plot(path, data):
-    from plotly import offline as py
-    from plotly import graph_objs as go
-
-    plot_data = {}
-    for key in data[0].keys():
-        plot_data[key] = {
-            'x': [],
-            'y': [],
-            'mode': 'lines+markers',
-            'name': key
-        }
-
-    for i, d in enumerate(data):
-        for k, v in d.items():
-            plot_data[k]['x'].append(i)
-            plot_data[k]['y'].append(v)
-
-    to_plot = []
-    for k in sorted(plot_data.keys()):
-        to_plot.append(go.Scatter(plot_data[k]))
-
-    py.plot(to_plot, filename=path, auto_open=False)
+"""
+The statistics which sampled statistics give a confidence interval for,
+as the key '<statistic>_ci', and whether each is a percentage of Cells
+rather than a mean over Cells.
+"""
+estimated_keys = [
+    ('init_move_frac', True),
+    ('def_frac_mean', False),
+    ('length_mean', False),
+    ('scores_mean', False),
+    ('rule_frac_tfts', True), ('rule_frac_t2ts', True), ('rule_frac_ftfs', True),
+    ('rule_frac_alld', True), ('rule_frac_allc', True),
+    ('age_mean', False),
+]
+
+""" The z value of the confidence intervals, for 95% """
+confidence_z = 1.96
+
+
+class CellSample():
+    """
+    A sample of the living Cells of a Surface, which the
+    statistics functions take in place of the Surface.
+    """
+
+    def __init__(self, cells):
+        """
+        :param cells: The Cells of the sample
+        :type cells: list(Cell)
+        """
+        self.cells = cells
+        self.population = len(cells)
+
+    def my_map(self, method):
+        for c in self.cells:
+            method(c)
+
+    def get_all(self):
+        return list(self.cells)
+
+
+def sample_cells(surface, size, rng):
+    """
+    Draw up to 'size' living Cells of a Surface at random, without
+    replacement, by drawing spots rather than going through every
+    spot, so that the cost does not grow with the Surface.
+    :param surface: The surface to sample
+    :type surface: Surface
+    :param size: The number of Cells to draw
+    :type size: int
+    :param rng: The random generator of the sample, which must not
+                be the one of the simulation
+    :type rng: random.Random
+    :rtype: list(Cell)
+    """
+    spots = surface.width * surface.height
+    if surface.population == 0:
+        return []
+    # draw enough spots to find 'size' Cells, with a margin
+    draws = min(spots, int(math.ceil(2.0 * size * spots / surface.population)))
+    cells = []
+    for node in rng.sample(range(spots), draws):
+        c = surface.get_at_node(node)
+        if c is not None:
+            cells.append(c)
+            if len(cells) == size:
+                break
+    return cells
+
+
+def add_confidence(stats, sample_size, population):
+    """
+    Add the half width of the confidence interval of every statistic
+    of 'estimated_keys', with the finite population correction.
+    :param stats: The statistics of a sample, see get_stats
+    :type stats: dict(str,float)
+    :param sample_size: The number of Cells in the sample
+    :type sample_size: int
+    :param population: The number of Cells the sample was drawn from
+    :type population: int
+    """
+    stats['sample_size'] = sample_size
+    for key, is_fraction in estimated_keys:
+        value = stats[key]
+        if value is None or sample_size == 0:
+            stats[key + '_ci'] = None
+            continue
+        if sample_size >= population:
+            stats[key + '_ci'] = 0.0
+            continue
+        if is_fraction:
+            fraction = value / 100.0
+            error = 100.0 * math.sqrt(fraction * (1.0 - fraction) / sample_size)
+        else:
+            stddev = stats[key.replace('_mean', '_stddev')]
+            error = stddev / math.sqrt(sample_size)
+        correction = math.sqrt((population - sample_size) / float(max(1, population - 1)))
+        stats[key + '_ci'] = confidence_z * error * correction
+
+
+def get_sampled_stats(surface, size, rng):
+    """
+    Estimate the statistics of get_stats from a random sample of
+    the living Cells, with the confidence interval of every
+    statistic of 'estimated_keys'.
+    :param surface: The surface of a simulation
+    :type surface: Surface
+    :param size: The number of Cells to sample
+    :type size: int
+    :param rng: The random generator of the sample
+    :type rng: random.Random
+    :return: A dictionary full of statistics
+    :rtype: dict(str, float)
+    """
+    cells = sample_cells(surface, size, rng)
+    stats = get_stats(CellSample(cells))
+    add_confidence(stats, len(cells), surface.population)
+    return stats
+
+def output_plot(path, data, points=500):
+    """
+    Plot the statistics of a run, downsampled, see plot.py.
+    :param path: The path of the HTML file
+    :type path: str
+    :param data: The statistics of every generation
+    :type data: list(dict(str, float))
+    :param points: The number of points to keep per statistic, or 0 for all
+    :type points: int
+    """
+    import collections
+    import numpy as np
+    import plot
 
+    keys = sorted(data[0].keys())
+    rows = np.array([[np.nan if d[k] is None else d[k] for k in keys] for d in data],
+                    np.float64)
+    plot.plot_runs(path, collections.OrderedDict([('run', (keys, rows))]), keys, points)
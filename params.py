@@ -7,6 +7,7 @@ the simulation.  Otherwise, changing parameter values
 would require navigating to any number of other files.
 """
 
+import copy
 import json
 import random
 
@@ -25,10 +26,44 @@ params['surface'] = {
     'height': 20,
 }
 
+"""
+Which spots are neighbours, see topology.py: 'moore', 'von_neumann',
+'hexagonal', 'small_world' or 'scale_free'
+"""
+params['topology'] = 'moore'
+""" The radius of the 'moore', 'von_neumann' and 'small_world' neighbourhoods """
+params['topology_radius'] = 1
+""" The probability of rewiring an edge of a 'small_world' topology """
+params['rewire_probability'] = 0.1
+""" The number of edges of every new node of a 'scale_free' topology """
+params['attachment'] = 2
+""" The random seed of random topologies, None for 'random_seed' """
+params['topology_seed'] = None
+
 """ The number of generations to run the simulation """
 params['generations'] = 300
 """ The number of interactions with neighbours per generation """
 params['interactions'] = 10
+"""
+How neighbours interact.  With 'neighbourhood', every cell interacts
+with all its neighbours, and as both sides of an interaction play,
+every pair of neighbours plays twice per interaction.  With 'pairwise',
+every pair of neighbours plays once per interaction, which halves the
+decisions and memory updates.  With twice the 'interactions', every
+pair plays as many rounds per generation, and so scores and loses as
+much, as with 'neighbourhood'.  The runs still differ, since the death
+and movement ticks run once per interaction, twice as often.
+"""
+params['interaction_mode'] = 'neighbourhood'
+"""
+How cells move and reproduce.  With 'sequential', cells move and give
+birth one after the other, each seeing the map as the cells before it
+left it.  With 'synchronous', every cell proposes its move or birth
+against the same map, and conflicting proposals are resolved at once
+by random priority, so the outcome does not depend on the order of
+the cells, as in ensemble.py.
+"""
+params['update_mode'] = 'sequential'
 
 """
 The payoff matrix for the iterated prisoner's dilemma.
@@ -53,6 +88,17 @@ params['initial_score'] = 20
 """ The initial size of Gene sequence is
 between 2^2 and 2^3. """
 params['default_memory_size'] = 3
+"""
+The most cells a cell remembers, forgetting the one it met least
+recently, or None to remember every cell it meets
+"""
+params['memory_capacity'] = None
+"""
+Which cells a cell keeps remembering from one generation to the next:
+'all' cells it met, the 'living' cells it met, or only its current
+'neighbours'.  Dead cells forget everything unless this is 'all'.
+"""
+params['memory_scope'] = 'all'
 
 """ The chance of a particular choice being 
 inserted into a gene """
@@ -66,6 +112,27 @@ params['mutation_chance_delete'] = 0.1
 being flipped from one to the other. """
 params['mutation_chance_flip'] = 0.1
 
+"""
+Whether a gene is reduced at birth to the shortest gene with the
+same memory size and decisions, see auxiliaryGenetics.canonicalize.
+Decisions are unchanged, but shorter genes give shorter children
+and change the gene statistics.
+"""
+params['canonicalize_genes'] = False
+""" The longest a gene can be at birth, position 0 included, or None for no limit """
+params['max_gene_length'] = None
+
+"""
+Whether Cells get SparseGenes, which only hold the nodes of their
+decision tree which they define, rather than a choice for every
+position, so that deep memories stay small (see SparseGene.py).
+'default_memory_size' is then the memory size of the initial Genes,
+which get 'sparse_gene_nodes' nodes.  Only the Surface uses them;
+ensemble.py always has dense genes.
+"""
+params['sparse_genes'] = False
+params['sparse_gene_nodes'] = 7
+
 """ The probability that a poorly performing cell will move """
 params['move_chance'] = 0.2
 
@@ -79,6 +146,71 @@ params['age_of_death'] = 20
 """ Whether or not the simulation is being run with ageing """
 params['ageing'] = False
 
+""" Whether a run stops when no cell is alive """
+params['stop_on_extinction'] = False
+"""
+The number of generations over which 'stationary_metrics' must not
+move by more than 'stationary_tolerance' for a run to stop, 0 to never stop
+"""
+params['stationary_window'] = 0
+""" The statistics which must be stationary, see my_stats.stat_keys """
+params['stationary_metrics'] = ['rule_frac_tfts', 'rule_frac_t2ts', 'rule_frac_ftfs',
+                                'rule_frac_alld', 'rule_frac_allc']
+""" How far a stationary statistic may move within the window """
+params['stationary_tolerance'] = 0.5
+""" Whether a run stops when every living cell has the same gene """
+params['stop_on_fixation'] = False
+
+""" The number of Surfaces evolved side by side by islands.py """
+params['islands'] = 4
+""" The number of generations between migrations, or 0 for none """
+params['migration_interval'] = 10
+""" The fraction of the best cells of an island which migrate """
+params['migration_ratio'] = 0.02
+""" Where migrants go: to the next island in a 'ring', to 'all' others, or to a 'random' one """
+params['migration_topology'] = 'ring'
+
+""" The most forgotten memories kept to be reused by new memories, 0 for none """
+params['memory_pool_size'] = 0
+"""
+Whether the cyclic garbage collector runs on its own during ticks.
+Otherwise it runs between generations, every 'gc_interval' generations,
+and the objects of the initial surface are left out of its passes.
+"""
+params['gc_automatic'] = True
+""" Without 'gc_automatic', the number of generations between collections, or 0 for none """
+params['gc_interval'] = 10
+
+"""
+The number of living cells to estimate the statistics of a generation
+from, with confidence intervals, or None for exact statistics
+"""
+params['stats_sample_size'] = None
+""" With sampled statistics, the number of generations between exact statistics, or 0 for none """
+params['exact_stats_interval'] = 10
+
+""" Whether to add the estimated bytes of cells, genes, memories and statistics to the statistics """
+params['memory_accounting'] = False
+""" The most megabytes of cells, genes, memories and statistics a run may keep, or None """
+params['memory_budget_mb'] = None
+"""
+What a run over its memory budget does: 'compact' frees the memories
+no decision depends on, and aborts if that is not enough; 'abort' saves
+a checkpoint of the run in 'checkpoint.pickle' and stops
+"""
+params['memory_budget_action'] = 'compact'
+
+""" Whether to record every birth and its parents in 'lineage.bin' """
+params['lineage'] = False
+""" Whether to count the cells of every species every generation in 'census.bin' """
+params['census'] = False
+""" Whether to record the rule class and score of every spot in 'frames.bin' """
+params['frames'] = False
+""" The number of generations between key frames in 'frames.bin' """
+params['keyframe_interval'] = 50
+""" The name of a block of shared memory to publish every generation in, for viewer.py, or None """
+params['shared_state'] = None
+
 """
 Retrieve the score from the score matrix.
 :param me: The choice of the calling Cell
@@ -91,6 +223,21 @@ Retrieve the score from the score matrix.
 def get_score(me, them):
     return params['score_matrix'][me][them]
 
+def resolve(path):
+    """
+    Get the parameters a simulation run with the parameter file
+    'path' would use, without changing the current parameters.
+    :param path: The path to a parameter file, or None for the defaults
+    :type path: str
+    :return: The fully resolved parameters
+    :rtype: dict
+    """
+    resolved = copy.deepcopy(params)
+    if path is not None:
+        with open(path) as f:
+            resolved.update(json.load(f))
+    return resolved
+
 def init(path):
     if path is not None:
         with open(path) as f:
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Plot the statistics of runs on demand, from what the runs saved:
+    the 'data.json' of a single run;
+    the 'stats.npz' of a sweep (see sweep.py), or its directory;
+    a directory of run directories, each with a 'data.json'.
+
+All the runs given are compared in a single HTML file, with one
+plot per statistic and one line per run.  Long runs are first
+downsampled with Largest-Triangle-Three-Buckets (Steinarsson,
+2013), which keeps the peaks and troughs that give a series its
+shape, so that the file stays small whatever the number of
+generations.
+
+    python3 plot.py out/sweep_2016-12-12_14.49.50 -o sweep.html
+    python3 plot.py data.json -k population -k rule_frac_tfts
+"""
+import collections
+import glob
+import json
+from os import path
+
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """
+    Downsample a series with Largest-Triangle-Three-Buckets.  The
+    first and last points are kept, and the points in between are
+    split into buckets, of which the point which makes the largest
+    triangle with the point kept before it and the mean of the
+    next bucket is kept.
+    :param x: The x of every point, in increasing order
+    :type x: numpy.ndarray
+    :param y: The y of every point, without NaN
+    :type y: numpy.ndarray
+    :param threshold: The number of points to keep
+    :type threshold: int
+    :return: The indices of the points kept
+    :rtype: numpy.ndarray
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # the buckets between the first and the last point
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    a = 0
+    for b in range(threshold - 2):
+        start, end = edges[b], edges[b + 1]
+        if b + 2 < len(edges):
+            next_x = x[end:edges[b + 2]].mean()
+            next_y = y[end:edges[b + 2]].mean()
+        else:
+            next_x, next_y = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        kept[b + 1] = a
+    return kept
+
+
+def downsample(values, threshold):
+    """
+    Downsample the series of a statistic, ignoring the generations
+    where it is undefined.
+    :param values: The statistic of every generation, NaN where undefined
+    :type values: numpy.ndarray
+    :param threshold: The number of points to keep, or 0 for all
+    :type threshold: int
+    :return: The generations and values kept
+    :rtype: tuple(numpy.ndarray, numpy.ndarray)
+    """
+    x = np.flatnonzero(~np.isnan(values))
+    y = values[x]
+    if threshold > 0:
+        kept = lttb(x.astype(np.float64), y, threshold)
+        x, y = x[kept], y[kept]
+    return x, y
+
+
+def read_data(data_path):
+    """
+    Read the statistics of a run from its 'data.json'.
+    :return: The names of the statistics, and one row per generation
+    :rtype: tuple(list(str), numpy.ndarray)
+    """
+    with open(data_path) as f:
+        sim_stats = json.load(f)
+    keys = sorted(sim_stats[0].keys()) if sim_stats else []
+    return keys, np.array([[np.nan if stat.get(k) is None else stat[k] for k in keys]
+                           for stat in sim_stats], np.float64).reshape(-1, len(keys))
+
+
+def read_sweep(stats_path):
+    """
+    Read the statistics of every run of a sweep from its 'stats.npz'.
+    :return: The names of the statistics, and the rows of every run, by name
+    :rtype: tuple(list(str), dict(str, numpy.ndarray))
+    """
+    runs = np.load(stats_path)
+    keys = runs['stat_keys'].tolist()
+    return keys, { name: runs[name] for name in sorted(runs.files) if name != 'stat_keys' }
+
+
+def load_runs(inputs):
+    """
+    Read the statistics of runs, see the description of the module.
+    :param inputs: The files and directories to read
+    :type inputs: list(str)
+    :return: The names of the statistics and the rows of every run, by run name
+    :rtype: collections.OrderedDict(str, tuple(list(str), numpy.ndarray))
+    """
+    runs = collections.OrderedDict()
+    for name in inputs:
+        if path.isdir(name):
+            if path.isfile(path.join(name, 'stats.npz')):
+                name = path.join(name, 'stats.npz')
+            elif path.isfile(path.join(name, 'data.json')):
+                name = path.join(name, 'data.json')
+
+        if path.isdir(name):
+            for data_path in sorted(glob.glob(path.join(name, '*', 'data.json'))):
+                runs[path.basename(path.dirname(data_path))] = read_data(data_path)
+        elif name.endswith('.npz'):
+            keys, rows = read_sweep(name)
+            for run, stats in rows.items():
+                runs[run] = (keys, stats)
+        else:
+            run = path.basename(path.dirname(path.abspath(name)))
+            runs[run] = read_data(name)
+    return runs
+
+
+def plot_runs(out_path, runs, keys=None, points=500):
+    """
+    Write a single HTML file comparing runs, with a plot per
+    statistic and a line per run.
+    :param out_path: The path of the HTML file
+    :type out_path: str
+    :param runs: The statistics of every run, see load_runs
+    :type runs: collections.OrderedDict(str, tuple(list(str), numpy.ndarray))
+    :param keys: The statistics to plot, or None for all
+    :type keys: list(str)
+    :param points: The number of points to keep per line, or 0 for all
+    :type points: int
+    """
+    from plotly import offline as py
+    from plotly import graph_objs as go
+    from plotly.subplots import make_subplots
+
+    if keys is None:
+        keys = sorted(set(k for run_keys, rows in runs.values() for k in run_keys))
+
+    figure = make_subplots(rows=len(keys), cols=1, shared_xaxes=True,
+                           subplot_titles=keys, vertical_spacing=0.1 / max(1, len(keys)))
+    for i, (run, (run_keys, rows)) in enumerate(runs.items()):
+        for row, key in enumerate(keys):
+            if key not in run_keys or len(rows) == 0:
+                continue
+            x, y = downsample(rows[:, run_keys.index(key)], points)
+            figure.add_trace(go.Scattergl(
+                    x=x.tolist(), y=y.tolist(), mode='lines', name=run,
+                    legendgroup=run, showlegend=row == 0,
+                    line={ 'color': 'hsl({}, 70%, 45%)'.format(
+                            int(360 * i / max(1, len(runs)))) }),
+                row=row + 1, col=1)
+    figure.update_layout(height=250 * len(keys))
+
+    py.plot(figure, filename=out_path, auto_open=False)
+
+
+def get_arguments():
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+
+    parser.add_argument('inputs', nargs='+',
+                        help="data.json or stats.npz files, or directories of runs")
+    parser.add_argument('-o', '--out', type=str, default='plot.html')
+    parser.add_argument('-k', '--key', action='append', default=None,
+                        help="a statistic to plot, all of them by default")
+    parser.add_argument('-n', '--points', type=int, default=500,
+                        help="the number of points per line, 0 for all")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+
+    runs = load_runs(args.inputs)
+    if not runs:
+        raise SystemExit("no runs found in {}".format(", ".join(args.inputs)))
+    plot_runs(args.out, runs, args.key, args.points)
+    print("{} runs plotted to {}".format(len(runs), path.abspath(args.out)))
@@ -3,7 +3,8 @@
 max=$(nproc 2> /dev/null)
 max=${max:-8}
 
-for p in $@; do
+# longest run first, see schedule.py
+for p in $(python3 sweep.py --order "$@"); do
     while [[ "$(screen -ls | grep cmpt394 | wc -l)" -gt "$max" ]]; do
         sleep 1
     done
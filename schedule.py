@@ -0,0 +1,151 @@
+"""
+Estimate how long runs take, and order them so that a batch of
+runs of mixed sizes finishes as early as it can.
+
+The cost of a run grows with four factors of its parameters:
+    area: the number of spots of its Surface;
+    generations: the number of generations it runs;
+    interactions: the interactions with neighbours per generation;
+    gene_length: the length of its initial Genes, 2^default_memory_size,
+                 or 'sparse_gene_nodes' with 'sparse_genes'.
+Its cost in seconds is modelled as
+    log(seconds) = c + sum over the factors f of b_f log(f)
+which starts as seconds in proportion to the product of the factors,
+every b_f being 1, and is refined with the timings of the completed
+runs of a run catalog (see catalog.py) by least squares.  The
+starting model weighs as much as 'prior_weight' timings, so that a
+few timings nudge it rather than overturn it.
+
+The runs are then started longest first (Graham, 1969): a long run
+started last keeps one worker busy long after the others are done,
+while longest first finishes within 4/3 of the shortest possible
+time.
+"""
+import heapq
+import math
+from os import path
+
+import numpy as np
+
+""" The factors of the cost of a run """
+factors = ['area', 'generations', 'interactions', 'gene_length']
+
+""" A first guess of the seconds per unit of the product of the factors """
+seconds_per_unit = 1e-6
+
+
+def get_factors(resolved):
+    """
+    :param resolved: The fully resolved parameters of a run, see params.resolve
+    :type resolved: dict
+    :return: The factors of the cost of the run, by name
+    :rtype: dict(str, float)
+    """
+    if resolved.get('sparse_genes'):
+        gene_length = resolved['sparse_gene_nodes']
+    else:
+        gene_length = 2 ** resolved['default_memory_size']
+    return {
+        'area': resolved['surface']['width'] * resolved['surface']['height'],
+        'generations': resolved['generations'],
+        'interactions': resolved['interactions'],
+        'gene_length': gene_length,
+    }
+
+
+def get_features(resolved):
+    """
+    :return: 1 and the logarithm of every factor of a run
+    :rtype: numpy.ndarray
+    """
+    values = get_factors(resolved)
+    return np.array([1.0] + [math.log(max(values[f], 1)) for f in factors])
+
+
+class CostModel():
+    """
+    Predicts the seconds a run takes from its parameters.
+    """
+
+    def __init__(self):
+        """ numpy.ndarray: c, then b_f for every factor """
+        self.coefficients = np.array([math.log(seconds_per_unit)] + [1.0] * len(factors))
+        """ int: The number of timings the model was refined with """
+        self.timings = 0
+
+    def fit(self, runs, prior_weight=4.0):
+        """
+        Refine the model with the timings of completed runs.
+        :param runs: The completed runs, with their 'params' and
+                     'elapsed' seconds, as returned by Catalog.query
+        :type runs: list(dict)
+        :param prior_weight: The number of timings the current model weighs as
+        :type prior_weight: float
+        """
+        runs = [r for r in runs if r.get('elapsed')]
+        if not runs:
+            return
+        x = np.array([get_features(r['params']) for r in runs])
+        y = np.log([r['elapsed'] for r in runs])
+        # pull every coefficient towards the current model
+        weight = math.sqrt(prior_weight)
+        x = np.vstack([x, weight * np.eye(len(self.coefficients))])
+        y = np.concatenate([y, weight * self.coefficients])
+        self.coefficients = np.linalg.lstsq(x, y, rcond=None)[0]
+        self.timings += len(runs)
+
+    def predict(self, resolved):
+        """
+        :param resolved: The fully resolved parameters of a run
+        :type resolved: dict
+        :return: The seconds the run is expected to take
+        :rtype: float
+        """
+        return math.exp(float(get_features(resolved) @ self.coefficients))
+
+
+def from_catalog(catalog_path):
+    """
+    :param catalog_path: A run catalog, or None
+    :type catalog_path: str
+    :return: The cost model refined with the timings of the catalog,
+             if it exists
+    :rtype: CostModel
+    """
+    import catalog
+
+    model = CostModel()
+    if catalog_path is not None and path.isfile(catalog_path):
+        runs = catalog.Catalog(catalog_path)
+        try:
+            model.fit(runs.query())
+        finally:
+            runs.close()
+    return model
+
+
+def longest_first(costs):
+    """
+    :param costs: The expected seconds of every run
+    :type costs: list(float)
+    :return: The indices of the runs, longest first, and in their
+             order for the same cost
+    :rtype: list(int)
+    """
+    return sorted(range(len(costs)), key=lambda i: -costs[i])
+
+
+def predict_makespan(costs, workers):
+    """
+    Predict when runs started in order on free workers finish.
+    :param costs: The expected seconds of every run, in the order started
+    :type costs: list(float)
+    :param workers: The number of workers
+    :type workers: int
+    :return: The seconds until the last run is done
+    :rtype: float
+    """
+    free = [0.0] * max(1, min(workers, len(costs)))
+    for cost in costs:
+        heapq.heappush(free, heapq.heappop(free) + cost)
+    return max(free)
@@ -0,0 +1,236 @@
+"""
+This module places the per-generation state of a running
+simulation in shared memory, so that a coordinator or a live
+analysis process can read it without the simulation writing
+files or serializing through JSON.
+
+A block of shared memory holds, in order:
+    the dimensions of the block (int64),
+    a header with the progress of the simulation (int64),
+    the grid of rule classes of the current generation (uint8),
+    the grid of scores of the current generation (float32), and
+    the statistics of every generation so far (float64).
+Statistics which are None are stored as NaN.
+
+The writer wraps every update in a sequence counter, which is odd
+while an update is in progress, so that readers can retry instead
+of reading a half-written generation.
+"""
+import time
+
+import numpy as np
+from multiprocessing import shared_memory
+
+import my_stats as s
+
+""" The fields of the dimensions at the start of every block """
+meta_fields = ['width', 'height', 'generations', 'num_stats']
+
+""" The fields of the header which follows the dimensions """
+header_fields = ['sequence', 'generation', 'population', 'born', 'died', 'done']
+
+
+def _align(offset):
+    """
+    Round 'offset' up to the next multiple of 8 bytes.
+    :param offset: An offset in bytes
+    :type offset: int
+    :return: The aligned offset
+    :rtype: int
+    """
+    return (offset + 7) // 8 * 8
+
+
+def _layout(width, height, generations, num_stats):
+    """
+    Compute the offsets of the arrays in a block of shared memory.
+    :return: The offset of every array by name, and the total size in bytes.
+    :rtype: tuple(dict(str, int), int)
+    """
+    offsets = dict()
+    offset = 0
+    offsets['meta'] = offset
+    offset += 8 * len(meta_fields)
+    offsets['header'] = offset
+    offset += 8 * len(header_fields)
+    offsets['classes'] = offset
+    offset = _align(offset + width * height)
+    offsets['scores'] = offset
+    offset = _align(offset + 4 * width * height)
+    offsets['stats'] = offset
+    offset += 8 * (generations + 1) * num_stats
+    return offsets, offset
+
+
+def _open_untracked(name):
+    """
+    Attach to an existing block of shared memory without registering
+    it with this process's resource tracker, which would otherwise
+    unlink the block when this process exits.
+    :param name: The name of the block
+    :type name: str
+    :rtype: SharedMemory
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no 'track' argument.  Unregistering after
+        # attaching is not enough: a forked worker shares the tracker of
+        # the process which created the block, so skip registering at all.
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedState():
+    """
+    A view of the arrays in a block of shared memory.  Use the
+    functions 'create' and 'attach' rather than this constructor.
+    """
+
+    def __init__(self, shm, owner):
+        """
+        :param shm: The block of shared memory
+        :type shm: SharedMemory
+        :param owner: Whether this view created the block and must unlink it
+        :type owner: boolean
+        """
+        """ SharedMemory: The block holding all the arrays """
+        self._shm = shm
+        """ boolean: Whether close() should also unlink the block """
+        self._owner = owner
+
+        meta = np.ndarray((len(meta_fields),), np.int64, shm.buf, 0)
+        self.width, self.height, self.generations, num_stats = [int(v) for v in meta]
+        offsets, _ = _layout(self.width, self.height, self.generations, num_stats)
+
+        """ numpy.ndarray: The progress of the simulation, see header_fields """
+        self.header = np.ndarray(
+                (len(header_fields),), np.int64, shm.buf, offsets['header'])
+        """ numpy.ndarray: The rule class of every spot, see Cell.rule_classes """
+        self.classes = np.ndarray(
+                (self.height, self.width), np.uint8, shm.buf, offsets['classes'])
+        """ numpy.ndarray: The score of every spot """
+        self.scores = np.ndarray(
+                (self.height, self.width), np.float32, shm.buf, offsets['scores'])
+        """ numpy.ndarray: One row of statistics per generation, see my_stats.stat_keys """
+        self.stats = np.ndarray(
+                (self.generations + 1, num_stats), np.float64, shm.buf, offsets['stats'])
+
+    def get_name(self):
+        """
+        :return: The name other processes use to attach to this state
+        :rtype: str
+        """
+        return self._shm.name
+
+    def get_field(self, field):
+        """
+        :param field: One of header_fields
+        :type field: str
+        :return: The value of the header field
+        :rtype: int
+        """
+        return int(self.header[header_fields.index(field)])
+
+    def record(self, generation, surface, stats):
+        """
+        Write the state of a generation of the simulation.
+        :param generation: The index of the generation, 0 being the initial state
+        :type generation: int
+        :param surface: The Surface of the simulation
+        :type surface: Surface
+        :param stats: The statistics of the generation, from my_stats.get_stats
+        :type stats: dict(str, float)
+        """
+        classes, scores = surface.get_state_grids()
+        row = [np.nan if stats[k] is None else stats[k] for k in s.stat_keys]
+
+        seq = header_fields.index('sequence')
+        self.header[seq] += 1
+        self.classes[:] = classes
+        self.scores[:] = scores
+        self.stats[generation] = row
+        self.header[1:5] = [generation,
+                            surface.population,
+                            surface.total_alive,
+                            surface.total_dead]
+        self.header[seq] += 1
+
+    def finish(self):
+        """
+        Mark the simulation as done.
+        """
+        self.header[header_fields.index('done')] = 1
+
+    def read(self):
+        """
+        Read a consistent copy of the current generation.
+        :return: The header, the rule class grid and the score grid.
+        :rtype: tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        seq = header_fields.index('sequence')
+        while True:
+            before = self.header[seq]
+            if before % 2 == 0:
+                header = self.header.copy()
+                classes = self.classes.copy()
+                scores = self.scores.copy()
+                if self.header[seq] == before:
+                    return header, classes, scores
+            time.sleep(0.0001)
+
+    def read_stats(self):
+        """
+        :return: A copy of the statistics of every generation written so far.
+        :rtype: numpy.ndarray
+        """
+        return self.stats[:self.get_field('generation') + 1].copy()
+
+    def close(self):
+        """
+        Detach from the block, and unlink it if this view created it.
+        """
+        # drop the views before closing the buffer they point into
+        self.header = self.classes = self.scores = self.stats = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def create(width, height, generations, name=None):
+    """
+    Create a new block of shared memory for a simulation.
+    :param width: The width of the Surface
+    :type width: int
+    :param height: The height of the Surface
+    :type height: int
+    :param generations: The number of generations the simulation will run
+    :type generations: int
+    :param name: The name of the block, or None for a random name
+    :type name: str
+    :rtype: SharedState
+    """
+    num_stats = len(s.stat_keys)
+    _, size = _layout(width, height, generations, num_stats)
+    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    meta = np.ndarray((len(meta_fields),), np.int64, shm.buf, 0)
+    meta[:] = [width, height, generations, num_stats]
+    state = SharedState(shm, True)
+    state.header[:] = 0
+    state.stats[:] = np.nan
+    return state
+
+
+def attach(name):
+    """
+    Attach to a block of shared memory created by another process.
+    :param name: The name of the block
+    :type name: str
+    :rtype: SharedState
+    """
+    return SharedState(_open_untracked(name), False)
@@ -0,0 +1,308 @@
+"""
+This module runs a complete simulation with the current
+parameters, from populating a new Surface to collecting the
+statistics of its last generation.  It is used by the Surface
+script for single runs and by the sweep workers, which run
+many simulations side by side.
+"""
+import random
+from os import path
+
+from Cell import Cell
+from Position import Position
+from Surface import Surface
+
+import Memory
+import convergence
+import footprint
+import my_stats as s
+import params as p
+
+
+def create_surface(lineage=None, census=None):
+    """
+    Create a Surface of the size given by the parameters,
+    with a new Cell in every spot.
+    :param lineage: The recorder of births, or None
+    :type lineage: LineageRecorder
+    :param census: The census of species, or None
+    :type census: Census
+    :return: A fully populated Surface.
+    :rtype: Surface
+    """
+    surface_w = p.params['surface']['width']
+    surface_h = p.params['surface']['height']
+
+    surface = Surface(surface_w, surface_h)
+    surface.lineage = lineage
+    surface.census = census
+
+    for i in range(surface_w * surface_h):
+        c_init = Cell(surface.ID, Position(i // surface_w, i % surface_h))
+        surface.ID += 1
+        surface.population += 1
+        surface.set(c_init.get_position(), c_init)
+        if lineage is not None:
+            lineage.record_birth(0, c_init)
+        if census is not None:
+            census.add(c_init)
+
+    return surface
+
+
+class StatsTaker():
+    """
+    Takes the statistics of every generation: exactly, or, with a
+    'stats_sample_size', from a sample of the living Cells (see
+    my_stats.get_sampled_stats) in every generation but the first,
+    the last, and every 'exact_stats_interval'th.
+    """
+
+    def __init__(self, generations):
+        """
+        :param generations: The number of generations of the run
+        :type generations: int
+        """
+        self.generations = generations
+        self.sample_size = p.params['stats_sample_size']
+        self.interval = p.params['exact_stats_interval']
+        """ Random: The random generator of the samples, apart from the simulation's """
+        self.rng = random.Random(p.params['random_seed'])
+
+    def take(self, surface, generation):
+        """
+        :param surface: The Surface of the simulation
+        :type surface: Surface
+        :param generation: The index of the generation
+        :type generation: int
+        :return: The statistics of the generation
+        :rtype: dict(str, float)
+        """
+        if self.sample_size is None:
+            return s.get_stats(surface)
+        if generation == 0 or generation == self.generations \
+                or (self.interval > 0 and generation % self.interval == 0):
+            stat = s.get_stats(surface)
+            s.add_confidence(stat, surface.population, surface.population)
+            return stat
+        return s.get_sampled_stats(surface, self.sample_size, self.rng)
+
+
+def format_stat(value):
+    """
+    :param value: A statistic, None when there is no Cell to measure
+    :type value: float
+    :rtype: str
+    """
+    return 'None' if value is None else '{0:2f}'.format(value)
+
+
+def print_generation(surface, generation, stat):
+    """
+    Print the Surface and a summary of its statistics for
+    a single generation.
+    :param surface: The Surface of the simulation
+    :type surface: Surface
+    :param generation: The index of the generation
+    :type generation: int
+    :param stat: The statistics of the generation
+    :type stat: dict(str, float)
+    """
+    print(surface)
+    print(" | generation: " + str(generation))
+    print(" | def.frac  : " + format_stat(stat['def_frac_mean']) \
+        + " | init.move : " + format_stat(stat['init_move_frac']))
+
+    print(" | tfts  : "   + format_stat(stat['rule_frac_tfts']) \
+        + " | ftfs  : "   + format_stat(stat['rule_frac_ftfs']) \
+        + " | t2ts  : "   + format_stat(stat['rule_frac_t2ts']) \
+        + " | all_d : "   + format_stat(stat['rule_frac_alld']) \
+        + " | all_c : "   + format_stat(stat['rule_frac_allc']))
+
+
+class Simulation():
+    """
+    A simulation with the current parameters, run one generation at
+    a time by 'step', with the recorders, statistics, convergence
+    stops, memory guard and garbage collector control which the
+    parameters ask for.  run steps it to the end; the islands of
+    islands.py step it for an epoch at a time and place migrants
+    on its Surface in between.
+    """
+
+    def __init__(self, recorders=(), verbose=True, out_dir='.'):
+        """
+        Create the Surface and take the statistics of its initial
+        state.  The parameters must already be initialized with
+        params.init.
+        :param recorders: Objects which record the state of the simulation.
+        :type recorders: list
+        :param verbose: Whether to print every generation and the best Cells.
+        :type verbose: boolean
+        :param out_dir: The directory for the files written by optional recorders
+        :type out_dir: str
+        """
+        self.generations = p.params['generations']
+        self.interactions = p.params['interactions']
+        self.verbose = verbose
+        self.out_dir = out_dir
+        Memory.pool.set_limit(p.params['memory_pool_size'])
+
+        self.lineage = None
+        if p.params['lineage']:
+            from lineage import LineageRecorder
+            self.lineage = LineageRecorder(path.join(out_dir, 'lineage.bin'))
+
+        self.frames = None
+        if p.params['frames']:
+            from frames import FrameRecorder
+            self.frames = FrameRecorder(path.join(out_dir, 'frames.bin'),
+                                        p.params['surface']['width'],
+                                        p.params['surface']['height'],
+                                        p.params['keyframe_interval'])
+            recorders = list(recorders) + [self.frames]
+
+        self.census = None
+        if p.params['census']:
+            from census import Census
+            self.census = Census(path.join(out_dir, 'census.bin'))
+            recorders = list(recorders) + [self.census]
+
+        self.state = None
+        if p.params['shared_state'] is not None:
+            import shared_state
+            self.state = shared_state.create(p.params['surface']['width'],
+                                             p.params['surface']['height'],
+                                             self.generations,
+                                             p.params['shared_state'])
+            recorders = list(recorders) + [self.state]
+        self.recorders = recorders
+
+        self.surface = create_surface(self.lineage, self.census)
+        self.guard = footprint.from_params()
+        self.taker = StatsTaker(self.generations)
+
+        """ list(dict(str, float)): The statistics of every generation so far """
+        self.sim_stats = list()
+        """ int: The number of generations run """
+        self.generation = 0
+        """ str: Why the run stopped early, see convergence, or None """
+        self.stopped = None
+
+        # add initial state
+        stat = self.taker.take(self.surface, 0)
+        """ str: Why the run went over its memory budget, or None """
+        self.overflow = self.guard.check(self.surface, self.sim_stats, stat) \
+                        if self.guard.is_enabled() else None
+        self.sim_stats.append(stat)
+        for recorder in self.recorders:
+            recorder.record(0, self.surface, stat)
+
+        self.criteria = convergence.from_params()
+
+        self.collector = footprint.collector_from_params()
+        self.collector.start()
+
+    def is_done(self):
+        """
+        :return: Whether the run reached its last generation, stopped
+                 early or went over its memory budget
+        :rtype: boolean
+        """
+        return self.generation >= self.generations \
+            or self.stopped is not None or self.overflow is not None
+
+    def step(self):
+        """
+        Run the next generation, unless the run is done.
+        :return: Whether the run goes on after this generation
+        :rtype: boolean
+        """
+        if self.is_done():
+            return False
+        i = self.generation
+        self.surface.tick(self.interactions)
+        self.collector.collect(i + 1)
+        stat = self.taker.take(self.surface, i + 1)
+        self.overflow = self.guard.check(self.surface, self.sim_stats, stat) \
+                        if self.guard.is_enabled() else None
+        self.sim_stats.append(stat)
+        for recorder in self.recorders:
+            recorder.record(i + 1, self.surface, stat)
+        if self.verbose:
+            print_generation(self.surface, i, stat)
+        self.generation += 1
+        if self.overflow is not None:
+            return False
+
+        reason = self.criteria.check(self.surface, stat) if self.criteria.is_enabled() else None
+        if reason is not None:
+            if self.verbose:
+                print(" | stopped after generation {}: {}".format(i, reason))
+            # the last state stands for every generation up to the horizon
+            for j in range(i + 2, self.generations + 1):
+                self.sim_stats.append(dict(stat))
+                for recorder in self.recorders:
+                    recorder.record(j, self.surface, stat)
+            self.stopped = reason
+            return False
+        return not self.is_done()
+
+    def close(self):
+        """
+        Give back the garbage collector, save a checkpoint if the
+        run went over its memory budget, after any generation, the
+        last one included, and close the optional recorders.
+        """
+        self.collector.stop()
+
+        if self.overflow is not None:
+            if self.verbose:
+                print(" | aborted at generation {}: {}".format(
+                        self.surface.generation, self.overflow))
+            footprint.save_checkpoint(path.join(self.out_dir, 'checkpoint.pickle'),
+                                      self.surface, self.sim_stats, self.surface.generation)
+
+        if self.lineage is not None:
+            self.lineage.close()
+        if self.frames is not None:
+            self.frames.close()
+        if self.census is not None:
+            self.census.close()
+        if self.state is not None:
+            # a viewer which is attached keeps its view of the last generation
+            self.state.finish()
+            self.state.close()
+
+        if self.verbose:
+            for c in self.surface.get_best_x(0.02):
+                print(str(c))
+
+
+def run(recorders=(), verbose=True, out_dir='.'):
+    """
+    Run a simulation with the current parameters.  The parameters
+    must already be initialized with params.init.
+    Every recorder is given the state of every generation, starting
+    with the initial state, through its method
+    record(generation, surface, stats).  When the run stops early
+    (see convergence), the last state is given again for every
+    remaining generation.  When the run goes over its memory
+    budget (see footprint), it saves a checkpoint and stops
+    without repeating its last state.
+    :param recorders: Objects which record the state of the simulation.
+    :type recorders: list
+    :param verbose: Whether to print every generation and the best Cells.
+    :type verbose: boolean
+    :param out_dir: The directory for the files written by optional recorders
+    :type out_dir: str
+    :return: The statistics of every generation, starting with the initial state.
+    :rtype: list(dict(str, float))
+    """
+    simulation = Simulation(recorders, verbose, out_dir)
+    try:
+        while simulation.step():
+            pass
+    finally:
+        simulation.close()
+    return simulation.sim_stats
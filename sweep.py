@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Run a sweep of simulations, one per parameter file, in a pool
+of worker processes.
+
+Every worker writes the state and statistics of its simulation
+into a block of shared memory (see shared_state) as it runs.
+The coordinator reads these blocks to report progress, and a
+live analysis process can attach to them by the names listed in
+the sweep's 'sweep.json'.  When the sweep is done, the statistics
+of all runs are saved together in 'stats.npz'.
+
+Every run still gets its own directory with a 'run.log' and
+a 'data.json', like the runs of run.sh.
+
+With a run catalog (see catalog.py), runs which were already
+completed with the same resolved parameters and code are skipped,
+and their statistics are taken from their earlier directories.
+
+Runs are started longest first, by the cost model of schedule.py
+refined with the timings of the catalog, so that a long run does
+not start last and keep the sweep waiting.  With '--order', the
+parameter files are only printed in that order, for run-batch.sh.
+"""
+import contextlib
+import json
+import os
+import time
+from multiprocessing import Pool
+from os import path
+
+import numpy as np
+
+import catalog
+import my_stats as s
+import params as p
+import schedule
+import shared_state
+
+
+def run_job(job):
+    """
+    Run a single simulation in a worker process.
+    :param job: The parameter file, the output directory, and the
+                name of the block of shared memory to write into.
+    :type job: tuple(str, str, str)
+    :return: The statistics of the last generation, and the
+             number of seconds the run took
+    :rtype: tuple(dict(str, float), float)
+    """
+    import simulation
+
+    params_file, out_dir, shm_name = job
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.time()
+
+    state = shared_state.attach(shm_name)
+    with open(path.join(out_dir, 'run.log'), 'w+') as log:
+        with contextlib.redirect_stdout(log):
+            p.init(params_file)
+            sim_stats = simulation.run([state], out_dir=out_dir)
+    state.finish()
+    state.close()
+
+    with open(path.join(out_dir, 'data.json'), 'w+') as out:
+        json.dump(sim_stats, out, indent=4)
+
+    return sim_stats[-1], time.time() - start
+
+
+def get_run_name(params_file):
+    """
+    :param params_file: The path to a parameter file
+    :type params_file: str
+    :return: The name of the run for the parameter file
+    :rtype: str
+    """
+    return path.splitext(path.basename(params_file))[0]
+
+
+def report_progress(names, states, results):
+    """
+    Print the generation reached by every unfinished run.
+    """
+    running = []
+    for name, state, result in zip(names, states, results):
+        if not result.ready():
+            running.append("{}: {}/{}".format(
+                name, state.get_field('generation'), state.generations))
+    print("{} of {} runs done | {}".format(
+        len(names) - len(running), len(names), " | ".join(running)))
+
+
+def read_stats(out_dir):
+    """
+    Read the statistics of a completed run from its 'data.json'.
+    :param out_dir: The directory of the run
+    :type out_dir: str
+    :return: One row of statistics per generation, see my_stats.stat_keys
+    :rtype: numpy.ndarray
+    """
+    with open(path.join(out_dir, 'data.json')) as f:
+        sim_stats = json.load(f)
+    return np.array([[np.nan if stat[k] is None else stat[k] for k in s.stat_keys]
+                     for stat in sim_stats], np.float64)
+
+
+def run_sweep(params_files, out_root, processes=None, interval=10.0, catalog_path=None):
+    """
+    Run a simulation for every parameter file in a pool of
+    worker processes.
+    :param params_files: The parameter files of the runs
+    :type params_files: list(str)
+    :param out_root: The directory which will hold the runs' directories
+    :type out_root: str
+    :param processes: The number of workers, or None for one per core
+    :type processes: int
+    :param interval: The number of seconds between progress reports
+    :type interval: float
+    :param catalog_path: The run catalog to skip completed runs with
+                         and record new runs in, or None
+    :type catalog_path: str
+    :return: The statistics of the last generation of every run
+    :rtype: list(dict(str, float))
+    """
+    os.makedirs(out_root, exist_ok=True)
+
+    names = [get_run_name(f) for f in params_files]
+    out_dirs = [path.abspath(path.join(out_root, n)) for n in names]
+    resolved = [p.resolve(f) for f in params_files]
+    final_stats = [None] * len(params_files)
+
+    runs = None
+    todo = list(range(len(params_files)))
+    model = schedule.from_catalog(catalog_path)
+    if catalog_path is not None:
+        runs = catalog.Catalog(catalog_path)
+        version = catalog.code_version()
+        keys = [catalog.run_key(r, version) for r in resolved]
+        for i in list(todo):
+            if runs.is_done(keys[i]):
+                done = runs.describe(keys[i])
+                print("{}: already done in {}".format(names[i], done['out_dir']))
+                out_dirs[i] = done['out_dir']
+                final_stats[i] = done['metrics']
+                todo.remove(i)
+
+    costs = [model.predict(r) for r in resolved]
+    todo = [todo[k] for k in schedule.longest_first([costs[i] for i in todo])]
+    print("{} runs, longest first | predicted time: {:.0f}s on {} workers".format(
+            len(todo),
+            schedule.predict_makespan([costs[i] for i in todo], processes or os.cpu_count()),
+            processes or os.cpu_count()))
+
+    states = dict()
+    for i in todo:
+        states[i] = shared_state.create(
+            resolved[i]['surface']['width'],
+            resolved[i]['surface']['height'],
+            resolved[i]['generations'])
+
+    with open(path.join(out_root, 'sweep.json'), 'w+') as manifest:
+        json.dump([{ 'params': f,
+                     'out': d,
+                     'shm': states[i].get_name() if i in states else None }
+                   for i, (f, d) in enumerate(zip(params_files, out_dirs))],
+                  manifest, indent=4)
+
+    try:
+        # A fresh process per run, so that no parameters
+        # leak from one run into the next
+        with Pool(processes, maxtasksperchild=1) as pool:
+            results = dict()
+            for i in todo:
+                if runs is not None:
+                    runs.start(keys[i], version, resolved[i], out_dirs[i])
+                results[i] = pool.apply_async(run_job, ((
+                        path.abspath(params_files[i]),
+                        out_dirs[i],
+                        states[i].get_name()),))
+
+            while todo:
+                report_progress([names[i] for i in todo],
+                                [states[i] for i in todo],
+                                [results[i] for i in todo])
+                results[todo[0]].wait(interval)
+                for i in [i for i in todo if results[i].ready()]:
+                    todo.remove(i)
+                    if not results[i].successful():
+                        if runs is not None:
+                            runs.fail(keys[i])
+                        continue
+                    final_stats[i], elapsed = results[i].get()
+                    if runs is not None:
+                        runs.finish(keys[i], final_stats[i], elapsed)
+
+            # raise the error of the first run which failed
+            for result in results.values():
+                result.get()
+
+        np.savez(path.join(out_root, 'stats.npz'),
+                 stat_keys=np.array(s.stat_keys),
+                 **{ n: states[i].read_stats() if i in states else read_stats(out_dirs[i])
+                     for i, n in enumerate(names) })
+    finally:
+        for st in states.values():
+            st.close()
+        if runs is not None:
+            runs.close()
+
+    return final_stats
+
+
+def get_arguments():
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+
+    parser.add_argument('-j', '--processes', type=int, default=None)
+    parser.add_argument('-o', '--out', type=str, default=None)
+    parser.add_argument('-i', '--interval', type=float, default=10.0)
+    parser.add_argument('-c', '--catalog', type=str, default=path.join('out', 'catalog.db'),
+                        help="the run catalog, see catalog.py")
+    parser.add_argument('--no-catalog', action='store_true')
+    parser.add_argument('--order', action='store_true',
+                        help="only print the parameter files, longest run first")
+
+    parser.add_argument('params', nargs='+')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    from time import strftime
+
+    args = get_arguments()
+    if args.order:
+        model = schedule.from_catalog(None if args.no_catalog else args.catalog)
+        costs = [model.predict(p.resolve(f)) for f in args.params]
+        for i in schedule.longest_first(costs):
+            print(args.params[i])
+        raise SystemExit(0)
+
+    out_root = args.out or path.join('out', 'sweep_' + strftime('%Y-%m-%d_%H.%M.%S'))
+    run_sweep(args.params, out_root, args.processes, args.interval,
+              None if args.no_catalog else args.catalog)
@@ -0,0 +1,236 @@
+"""
+This module describes which spots of a Surface are neighbours.
+
+A topology has a node for every spot of the Surface, the spot
+at (x, y) being node y * width + x, and stores the neighbours of
+every node in compressed sparse row form: the neighbours of node
+i are indices[indptr[i]:indptr[i + 1]], each once, in the order
+of its neighbourhood.  The phases of Surface go through them by
+index rather than by slice, so that finding neighbours allocates
+nothing.  Every topology also keeps, for every node, a tuple of
+its neighbourhood and a tuple of its forward neighbours, built
+once with the topology:
+    neighbourhoods[i]: the neighbours of i with i itself, in the
+        order of the stencil for lattices, which is the order of
+        Surface.neighbour_offsets for the Moore topology;
+    forward[i]: one side of every edge of i, so that going through
+        the forward neighbours of every node finds every edge once.
+
+Lattices are tori built from a stencil of offsets.  On a torus
+smaller than its stencil, a spot can be the neighbour of a spot
+through more than one offset, and appears once per offset in its
+neighbourhood, but once in 'indices'.
+
+The small-world and scale-free graphs are drawn with their own
+random generator, so that they do not change the random numbers
+of the simulation.
+"""
+import random
+from array import array
+
+import params as p
+
+
+class Topology():
+    """
+    The neighbours of every node, in compressed sparse row form.
+    """
+
+    def __init__(self, width, height, neighbourhoods, forward):
+        """
+        :param width: The width of the Surface
+        :type width: int
+        :param height: The height of the Surface
+        :type height: int
+        :param neighbourhoods: The neighbourhood of every node, itself included
+        :type neighbourhoods: list(tuple(int))
+        :param forward: The forward neighbours of every node
+        :type forward: list(tuple(int))
+        """
+        self.width = width
+        self.height = height
+        """ int: The number of nodes """
+        self.size = width * height
+        self.neighbourhoods = neighbourhoods
+        self.forward = forward
+
+        """ array: Where the neighbours of every node start in 'indices' """
+        self.indptr = array('l', [0])
+        """ array: The neighbours of every node, itself excluded, each once """
+        self.indices = array('l')
+        for i, neighbourhood in enumerate(neighbourhoods):
+            seen = set([i])
+            for n in neighbourhood:
+                if n not in seen:
+                    seen.add(n)
+                    self.indices.append(n)
+            self.indptr.append(len(self.indices))
+
+    def get_neighbours(self, node):
+        """
+        :return: The neighbours of a node, itself excluded
+        :rtype: array
+        """
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def get_degree(self, node):
+        """
+        :return: The number of neighbours of a node
+        :rtype: int
+        """
+        return self.indptr[node + 1] - self.indptr[node]
+
+
+def lattice(width, height, stencil):
+    """
+    Build a toroidal lattice from a stencil.
+    :param width: The width of the Surface
+    :type width: int
+    :param height: The height of the Surface
+    :type height: int
+    :param stencil: A function from the y of a node to its offsets
+                    (dx, dy), (0, 0) included, symmetric, and ordered
+                    by dy and then dx
+    :type stencil: function
+    :rtype: Topology
+    """
+    neighbourhoods = []
+    forward = []
+    for y in range(height):
+        offsets = stencil(y)
+        for x in range(width):
+            nodes = [((y + dy) % height) * width + (x + dx) % width
+                     for dx, dy in offsets]
+            neighbourhoods.append(tuple(nodes))
+            # the offsets before (0, 0) hold one of every opposite pair
+            forward.append(tuple(nodes[:offsets.index((0, 0))]))
+    return Topology(width, height, neighbourhoods, forward)
+
+
+def moore(width, height, radius=1):
+    """
+    Every spot within 'radius' steps in x and in y.
+    :rtype: Topology
+    """
+    offsets = [(dx, dy)
+               for dy in range(-radius, radius + 1)
+               for dx in range(-radius, radius + 1)]
+    return lattice(width, height, lambda y: offsets)
+
+
+def von_neumann(width, height, radius=1):
+    """
+    Every spot within 'radius' steps in x and y together.
+    :rtype: Topology
+    """
+    offsets = [(dx, dy)
+               for dy in range(-radius, radius + 1)
+               for dx in range(-radius, radius + 1)
+               if abs(dx) + abs(dy) <= radius]
+    return lattice(width, height, lambda y: offsets)
+
+
+def hexagonal(width, height):
+    """
+    Hexagonal spots, every odd row shifted by half a spot.
+    :rtype: Topology
+    """
+    if height % 2 != 0:
+        raise ValueError("a hexagonal torus needs an even height")
+    even = [(-1, -1), (0, -1), (-1, 0), (0, 0), (1, 0), (-1, 1), (0, 1)]
+    odd = [(0, -1), (1, -1), (-1, 0), (0, 0), (1, 0), (0, 1), (1, 1)]
+    return lattice(width, height, lambda y: odd if y % 2 else even)
+
+
+def graph(width, height, edges):
+    """
+    Build a topology from the edges of a graph.
+    :param edges: Pairs of nodes
+    :type edges: set(tuple(int, int))
+    :rtype: Topology
+    """
+    adjacent = [set() for i in range(width * height)]
+    for a, b in edges:
+        adjacent[a].add(b)
+        adjacent[b].add(a)
+    neighbourhoods = [(i,) + tuple(sorted(a)) for i, a in enumerate(adjacent)]
+    forward = [tuple(n for n in sorted(a) if n > i) for i, a in enumerate(adjacent)]
+    return Topology(width, height, neighbourhoods, forward)
+
+
+def small_world(width, height, radius=1, rewire=0.1, seed=0):
+    """
+    A Moore lattice of 'radius' with every edge rewired to a
+    random node with probability 'rewire' (Watts and Strogatz).
+    :rtype: Topology
+    """
+    rng = random.Random(seed)
+    base = moore(width, height, radius)
+    edges = set()
+    for i, forward in enumerate(base.forward):
+        for j in forward:
+            if i != j:
+                edges.add((min(i, j), max(i, j)))
+
+    rewired = set()
+    for a, b in sorted(edges):
+        if rng.random() < rewire:
+            for attempt in range(16):
+                c = rng.randrange(base.size)
+                edge = (min(a, c), max(a, c))
+                if c != a and edge not in edges and edge not in rewired:
+                    b = c
+                    break
+        rewired.add((min(a, b), max(a, b)))
+    return graph(width, height, rewired)
+
+
+def scale_free(width, height, attachment=2, seed=0):
+    """
+    A graph grown by preferential attachment: every new node is joined
+    to 'attachment' nodes picked in proportion to their degree
+    (Barabasi and Albert).
+    :rtype: Topology
+    """
+    rng = random.Random(seed)
+    size = width * height
+    first = min(attachment + 1, size)
+    edges = set((a, b) for a in range(first) for b in range(a + 1, first))
+    # every node appears once per edge it has
+    ends = [n for edge in edges for n in edge]
+    for node in range(first, size):
+        targets = set()
+        while len(targets) < attachment:
+            targets.add(rng.choice(ends))
+        for t in targets:
+            edges.add((t, node))
+            ends += [t, node]
+    return graph(width, height, edges)
+
+
+def make_topology(width, height):
+    """
+    Build the topology chosen by the parameters.
+    :param width: The width of the Surface
+    :type width: int
+    :param height: The height of the Surface
+    :type height: int
+    :rtype: Topology
+    """
+    kind = p.params['topology']
+    radius = p.params['topology_radius']
+    seed = p.params['topology_seed']
+    if seed is None:
+        seed = p.params['random_seed']
+
+    if kind == 'moore':
+        return moore(width, height, radius)
+    if kind == 'von_neumann':
+        return von_neumann(width, height, radius)
+    if kind == 'hexagonal':
+        return hexagonal(width, height)
+    if kind == 'small_world':
+        return small_world(width, height, radius, p.params['rewire_probability'], seed)
+    if kind == 'scale_free':
+        return scale_free(width, height, p.params['attachment'], seed)
+    raise ValueError("unknown topology '{}'".format(kind))
@@ -1,5 +1,25 @@
-#!/usr/bin/env python2
+#!/usr/bin/env python3
+"""
+Play round-robin tournaments of the iterated prisoner's dilemma
+between Cells, and evolve them by letting the better half of every
+generation produce the next.
 
+Every pair of Cells plays 'number_of_iterations' rounds, each of
+which is two plays, as Cell.interact gives every Cell a turn to
+interact with every other Cell.  Rather than calling Cell.interact
+for every pair, the tournament turns every Gene into a decision
+table, indexed by the state of a memory, and plays all pairs at
+once with arrays.  A table holds the shallow states of a Gene, and
+the states of a deep memory are resolved from its nodes, so that
+the tables of SparseGenes do not double with every choice of
+memory.  Since a memory only concerns one pair, the order in which
+pairs play does not matter, and the result is the same as playing
+pair by pair.  Rows of the payoff matrix are computed in
+blocks by a pool of worker processes.
+
+Every tournament starts with empty memories, so that a Cell's score
+depends only on the Cells of its generation.
+"""
 import sys
 import json
 
@@ -9,50 +29,268 @@ params['random_seed'] = 0
 params['number_of_cells'] = 2
 params['number_of_iterations'] = 8
 params['number_of_generations'] = 1
+""" The number of worker processes, None for one per core """
+params['processes'] = None
+""" The number of rows of the payoff matrix given to a worker at once """
+params['block_size'] = 256
+""" The most states the decision table of a Gene holds, see DecisionTables """
+params['table_size'] = 2 ** 10
 
-# Load parameter file if 
-if len(sys.argv) == 2:
-    with open(sys.argv[1]) as f:
-        params.update(json.load(f))
+import random
+from multiprocessing import Pool
+from uuid import uuid4
 
-print("parameters: " + str(params))
+import numpy as np
 
-import random
-from uuid import uuid4 
-from copy import deepcopy
+import params as p
 from Cell import Cell
 from Position import Position
 
-random.seed(params['random_seed'])
 
 def create_cell(generation_index, cell_index, parent_a=None, parent_b=None):
     return Cell(uuid4().int, Position(generation_index, cell_index), parent_a, parent_b)
 
-generation = [[create_cell(0, i) for i in xrange(params['number_of_cells'])]]
 
-def tournament(cells):
-    neighbours = dict()
-    for cell in cells:
-        cell.reset_score()
-        neighbours[cell] = set([c for c in cells if c is not cell])
+def get_levels(states):
+    """
+    :param states: Memory states, as in DecisionTables, below 2^63
+    :type states: numpy.ndarray
+    :return: The level of every state in the decision tree, the
+             number of choices of its memory
+    :rtype: numpy.ndarray
+    """
+    levels = np.zeros(states.shape, np.int64)
+    for bits in [32, 16, 8, 4, 2, 1]:
+        levels += bits * ((states >> (levels + bits)) > 0)
+    return levels
+
+
+class DecisionTables():
+    """
+    The decision of every Gene in every state of its memory.  A
+    memory of 'l' choices 'bits', the oldest in the highest bit and
+    'd' being 1, is the state (1 << l) | bits, which is also the
+    position in the decision tree that the memory leads to.
+    Gene.get_decision stops at the deepest node along that path
+    which the gene defines, so a state takes the choice of its node,
+    or else that of its parent state.
+
+    Every Gene gets a table of its states down to its memory size,
+    filled one level at a time, but of 'table_size' states at most.
+    A deeper state is resolved by walking its ancestors up to the
+    last level of the table, looking them up among the nodes of the
+    Gene which are deeper than its table, so that a deep SparseGene
+    costs a table and its few deep nodes rather than 2^(m+1) states.
+    """
+
+    def __init__(self, genes, table_size=2 ** 10):
+        """
+        :param genes: The Genes of the Cells in the tournament
+        :type genes: list(Gene)
+        :param table_size: The most states a table holds, a power of 2
+        :type table_size: int
+        """
+        """ numpy.ndarray: The memory size of every Gene """
+        self.mem_size = np.array([g.get_mem_size() for g in genes], np.int64)
+        """ numpy.ndarray: The last level of the table of every Gene """
+        self.table_depth = np.minimum(self.mem_size, table_size.bit_length() - 2)
+        sizes = 2 ** (self.table_depth + 1)
+        """ numpy.ndarray: Where the table of every Gene starts in 'tables' """
+        self.offset = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        """ numpy.ndarray: The tables of all Genes, 1 being 'd' """
+        self.tables = np.zeros(int(sizes.sum()), np.uint8)
+
+        deep = []
+        for i, g in enumerate(genes):
+            size = int(sizes[i])
+            table = self.tables[self.offset[i]:self.offset[i] + size]
+            defined = np.zeros(size, bool)
+            for x, choice in g.get_nodes().items():
+                if x < size:
+                    table[x] = choice == 'd'
+                    defined[x] = True
+                else:
+                    deep.append((x, i, choice == 'd'))
+            # the empty memory, state 0, leads to the root
+            table[0] = table[1]
+            for level in range(1, int(self.table_depth[i]) + 1):
+                states = slice(2 ** level, 2 ** (level + 1))
+                parents = np.repeat(table[2 ** (level - 1):2 ** level], 2)
+                table[states] = np.where(defined[states], table[states], parents)
+
+        positions = np.array([d[0] for d in deep], np.int64)
+        """ numpy.ndarray: The positions of the nodes deeper than their table, sorted """
+        self.deep_positions = np.unique(positions)
+        # a deep node is known by the rank of its position and its Gene
+        keys = np.searchsorted(self.deep_positions, positions) * len(genes) \
+             + np.array([d[1] for d in deep], np.int64)
+        order = np.argsort(keys)
+        """ numpy.ndarray: The keys of the deep nodes, sorted """
+        self.deep_keys = keys[order]
+        """ numpy.ndarray: The choices of the deep nodes, in the order of their keys """
+        self.deep_choices = np.array([d[2] for d in deep], np.uint8)[order]
+        """ boolean: Whether every state of every Gene is in its table """
+        self.in_tables = bool((self.mem_size <= self.table_depth).all())
+
+    def decide(self, genes, states):
+        """
+        :param genes: The index of the Gene of every state
+        :type genes: numpy.ndarray
+        :param states: Memory states of the Genes
+        :type states: numpy.ndarray
+        :return: The decision of every Gene in its state, 1 being 'd'
+        :rtype: numpy.ndarray
+        """
+        if self.in_tables:
+            return self.tables[self.offset[genes] + states]
+        genes, states = np.broadcast_arrays(genes, states)
+        depth = self.table_depth[genes]
+        levels = get_levels(states)
+        below = levels - depth
+        decision = self.tables[self.offset[genes] + (states >> np.maximum(below, 0))]
+        if len(self.deep_keys) == 0:
+            return decision
+
+        # walk up from every state deeper than its table, keeping the
+        # choice of the first, and so deepest, node found
+        unresolved = below > 0
+        last = len(self.deep_positions) - 1
+        for k in range(int(below.max())):
+            unresolved &= below > k
+            if not unresolved.any():
+                break
+            ancestors = states >> k
+            rank = np.minimum(np.searchsorted(self.deep_positions, ancestors), last)
+            keys = rank * len(self.mem_size) + genes
+            found = np.minimum(np.searchsorted(self.deep_keys, keys), len(self.deep_keys) - 1)
+            hit = unresolved & (self.deep_positions[rank] == ancestors) \
+                             & (self.deep_keys[found] == keys)
+            decision = np.where(hit, self.deep_choices[found], decision)
+            unresolved &= ~hit
+        return decision
+
+
+def init_worker(decisions, payoff, plays):
+    """
+    Keep the tables of the tournament in a worker process.
+    """
+    global _decisions, _payoff, _plays
+    _decisions, _payoff, _plays = decisions, payoff, plays
+
+
+def play_block(bounds):
+    """
+    Play every Cell in the rows 'bounds' against all Cells.
+    :param bounds: The first row and the row after the last
+    :type bounds: tuple(int, int)
+    :return: The rows of the payoff matrix: what each row Cell
+             won against each column Cell over all plays
+    :rtype: numpy.ndarray
+    """
+    start, end = bounds
+    n = len(_decisions.mem_size)
+    payoff = _payoff.ravel()
+    rows = np.arange(start, end, dtype=np.int64)[:, None]
+    cols = np.arange(n, dtype=np.int64)[None, :]
 
-    for i in xrange(params['number_of_iterations']):
-        for cell in cells:
-            cell.clear_interactions()
+    # the state of my memory of them, and of their memory of me
+    mine_state = np.ones((end - start, n), np.int64)
+    their_state = np.ones((end - start, n), np.int64)
+    my_full = 1 << _decisions.mem_size[rows]
+    their_full = 1 << _decisions.mem_size[cols]
 
-        for cell in cells:
-            cell.interact(neighbours[cell])
+    won = np.zeros((end - start, n), np.float64)
+    for x in range(_plays):
+        mine = _decisions.decide(rows, mine_state)
+        theirs = _decisions.decide(cols, their_state)
+        won += payoff[2 * mine + theirs]
+
+        mine_state = remember(mine_state, theirs, my_full)
+        their_state = remember(their_state, mine, their_full)
+
+    won[rows[:, 0] - start, rows[:, 0]] = 0
+    return won
+
+
+def remember(state, choice, full):
+    """
+    Add a choice to memory states, forgetting the oldest
+    choice of a memory which is already full.
+    :param state: Memory states, as in DecisionTables
+    :type state: numpy.ndarray
+    :param choice: The choices to remember, 1 being 'd'
+    :type choice: numpy.ndarray
+    :param full: 1 << memory size, for every memory
+    :type full: numpy.ndarray
+    :return: The new memory states
+    :rtype: numpy.ndarray
+    """
+    state = (state << 1) | choice
+    overflow = state >= 2 * full
+    return np.where(overflow, (state & (full - 1)) | full, state)
+
+
+def payoff_matrix(cells, iterations, processes=None, block_size=256, table_size=2 ** 10):
+    """
+    Compute what every Cell wins against every other Cell
+    over 'iterations' rounds.
+    :param cells: The Cells in the tournament
+    :type cells: list(Cell)
+    :param iterations: The number of rounds every pair plays
+    :type iterations: int
+    :param processes: The number of worker processes, None for one per core
+    :type processes: int
+    :param block_size: The number of rows given to a worker at once
+    :type block_size: int
+    :param table_size: The most states the decision table of a Gene holds
+    :type table_size: int
+    :return: The payoff matrix, row Cell against column Cell
+    :rtype: numpy.ndarray
+    """
+    decisions = DecisionTables([c.get_gene() for c in cells], table_size)
+    sm = p.params['score_matrix']
+    payoff = np.array([[sm['c']['c'], sm['c']['d']],
+                       [sm['d']['c'], sm['d']['d']]], np.float64)
+    args = (decisions, payoff, 2 * iterations)
+
+    blocks = [(start, min(start + block_size, len(cells)))
+              for start in range(0, len(cells), block_size)]
+    if processes == 1 or len(blocks) == 1:
+        init_worker(*args)
+        return np.concatenate([play_block(b) for b in blocks])
+    with Pool(processes, init_worker, args) as pool:
+        return np.concatenate(pool.map(play_block, blocks))
+
+
+def tournament(cells):
+    """
+    Play a round-robin tournament and set every Cell's score
+    as if it had interacted with every other Cell.
+    :param cells: The Cells in the tournament
+    :type cells: list(Cell)
+    :return: The payoff matrix of the tournament
+    :rtype: numpy.ndarray
+    """
+    won = payoff_matrix(cells,
+                        params['number_of_iterations'],
+                        params['processes'],
+                        params['block_size'],
+                        params['table_size'])
+    plays = 2 * params['number_of_iterations'] * (len(cells) - 1)
+    for cell, total in zip(cells, won.sum(axis=1)):
+        cell.reset_score()
+        cell._score += total - plays * p.params['loss_per_tick']
+    return won
 
-tournament(generation[0])
 
 def next_generation(cells):
-    boundary = params['number_of_cells'] / 2
+    boundary = params['number_of_cells'] // 2
     survivors = cells[:boundary]
 
-    for i in xrange(boundary):
+    for i in range(boundary):
         survivors.append(create_cell(
                 1,
-                i, 
+                i,
                 survivors[random.randint(0, boundary - 1)],
                 survivors[random.randint(0, boundary - 1)]
             )
@@ -61,12 +299,23 @@ def next_generation(cells):
     return survivors
 
 
-for i in xrange(params['number_of_generations']):
+if __name__ == '__main__':
+    # Load parameter file if
+    if len(sys.argv) == 2:
+        with open(sys.argv[1]) as f:
+            params.update(json.load(f))
+
+    print("parameters: " + str(params))
+
+    random.seed(params['random_seed'])
+
+    generation = [[create_cell(0, i) for i in range(params['number_of_cells'])]]
+
+    for i in range(params['number_of_generations']):
         tournament(generation[i])
         generation[i].sort(key=lambda c: -c._score)
         generation.append(next_generation(generation[i]))
 
-generation[-2].sort(key=lambda c: c._score)
-for cell in generation[-2]:
-   print(cell)
-
+    generation[-2].sort(key=lambda c: c._score)
+    for cell in generation[-2]:
+        print(cell)
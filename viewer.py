@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Watch a running simulation in a pyglet window.
+
+The viewer attaches to the block of shared memory a simulation
+writes into (see shared_state), either by its name, as given by
+the 'shared_state' parameter of the run, or through the
+'sweep.json' of a sweep.  The simulation never waits for the
+viewer: the viewer polls the block, copies a consistent
+generation out of it, and uploads the whole grid as a single
+texture, so a 200x200 Surface costs one texture upload per frame.
+
+Press 'S' to switch between rule classes and scores.
+"""
+import json
+import time
+
+import numpy as np
+import pyglet
+from pyglet import gl
+
+import shared_state
+from Cell import rule_classes
+
+
+def make_palette():
+    """
+    Make the colour of every rule class, see Cell.rule_classes.
+    Empty spots are black, and Cells which cooperate first are
+    brighter than those which defect first.
+    :return: One RGBA colour per rule class
+    :rtype: numpy.ndarray
+    """
+    colours = {
+        'tft': (40, 200, 60),
+        't2t': (40, 190, 170),
+        'ftf': (150, 200, 40),
+        'ddd': (220, 30, 30),
+        'ddc': (220, 90, 40),
+        'dcd': (220, 150, 40),
+        'dcc': (200, 200, 50),
+        'cdd': (150, 110, 200),
+        'cdc': (110, 130, 220),
+        'ccd': (70, 150, 230),
+        'ccc': (40, 90, 240),
+    }
+    palette = np.zeros((len(rule_classes), 4), np.uint8)
+    for i, drawing in enumerate(rule_classes):
+        if drawing is None:
+            continue
+        brightness = 1.0 if drawing[0] == 'o' else 0.6
+        palette[i, :3] = [int(brightness * v) for v in colours[drawing[1:]]]
+        palette[i, 3] = 255
+    return palette
+
+
+def score_colours(classes, scores):
+    """
+    Colour every spot by its score, from dark for the lowest
+    score on the Surface to bright for the highest.
+    :rtype: numpy.ndarray
+    """
+    occupied = classes > 0
+    rgba = np.zeros(classes.shape + (4,), np.uint8)
+    if occupied.any():
+        low, high = scores[occupied].min(), scores[occupied].max()
+        level = np.clip((scores - low) / max(high - low, 1e-9), 0, 1)
+        rgba[..., 0] = 255 * level
+        rgba[..., 1] = 255 * np.sqrt(level)
+        rgba[..., 2] = 80
+        rgba[..., 3] = 255
+        rgba[~occupied] = 0
+    return rgba
+
+
+class Viewer():
+    """
+    A window showing the Surface of a simulation in shared memory.
+    """
+
+    def __init__(self, state, scale=4, fps=10):
+        """
+        :param state: The shared state of the simulation
+        :type state: SharedState
+        :param scale: The size of a spot in pixels
+        :type scale: int
+        :param fps: The number of times per second to poll the simulation
+        :type fps: float
+        """
+        self.state = state
+        self.scale = scale
+        self.palette = make_palette()
+        """ boolean: Whether to colour spots by score rather than by rule class """
+        self.show_scores = False
+        """ int: The sequence number of the generation on display """
+        self._sequence = -1
+        self._header = None
+
+        self.window = pyglet.window.Window(
+                width=state.width * scale,
+                height=state.height * scale)
+        self.texture = pyglet.image.Texture.create(state.width, state.height)
+        gl.glBindTexture(self.texture.target, self.texture.id)
+        gl.glTexParameteri(self.texture.target, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
+        gl.glTexParameteri(self.texture.target, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
+
+        self.window.push_handlers(
+                on_draw=self.on_draw,
+                on_key_press=self.on_key_press)
+        pyglet.clock.schedule_interval(self.update, 1.0 / fps)
+
+    def upload(self, classes, scores):
+        """
+        Upload a generation to the texture in a single call.
+        """
+        if self.show_scores:
+            rgba = score_colours(classes, scores)
+        else:
+            rgba = self.palette[classes]
+        # rows of a pyglet image go from the bottom up
+        data = np.ascontiguousarray(rgba[::-1]).tobytes()
+        image = pyglet.image.ImageData(
+                self.state.width, self.state.height, 'RGBA', data, self.state.width * 4)
+        self.texture.blit_into(image, 0, 0, 0)
+
+    def update(self, dt):
+        """
+        Upload the current generation, if it has changed.
+        """
+        sequence = self.state.get_field('sequence')
+        if sequence == self._sequence:
+            return
+        header, classes, scores = self.state.read()
+        self._sequence = int(header[shared_state.header_fields.index('sequence')])
+        self._header = header
+        self._classes, self._scores = classes, scores
+        self.upload(classes, scores)
+        self.window.set_caption("generation {}/{} | population {}{}".format(
+                header[shared_state.header_fields.index('generation')],
+                self.state.generations,
+                header[shared_state.header_fields.index('population')],
+                " | done" if header[shared_state.header_fields.index('done')] else ""))
+
+    def on_draw(self):
+        self.window.clear()
+        self.texture.blit(0, 0, width=self.window.width, height=self.window.height)
+
+    def on_key_press(self, symbol, modifiers):
+        if symbol == pyglet.window.key.S:
+            self.show_scores = not self.show_scores
+            if self._header is not None:
+                self.upload(self._classes, self._scores)
+
+
+def wait_for(name, timeout):
+    """
+    Attach to a block of shared memory, waiting for the
+    simulation to create it if it does not exist yet.
+    :param name: The name of the block
+    :type name: str
+    :param timeout: The number of seconds to wait
+    :type timeout: float
+    :rtype: SharedState
+    """
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return shared_state.attach(name)
+        except FileNotFoundError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def get_arguments():
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+
+    parser.add_argument('name', type=str,
+                        help="the name of the shared state, or a sweep.json")
+    parser.add_argument('-r', '--run', type=int, default=0,
+                        help="the index of the run to watch in a sweep.json")
+    parser.add_argument('-s', '--scale', type=int, default=4)
+    parser.add_argument('-f', '--fps', type=float, default=10)
+    parser.add_argument('-w', '--wait', type=float, default=60,
+                        help="the number of seconds to wait for the simulation")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+
+    name = args.name
+    if name.endswith('.json'):
+        with open(name) as f:
+            name = json.load(f)[args.run]['shm']
+
+    state = wait_for(name, args.wait)
+    viewer = Viewer(state, args.scale, args.fps)
+    pyglet.app.run()
+    state.close()